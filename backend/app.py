@@ -1,98 +1,333 @@
-from flask import Flask, request, jsonify, make_response, send_from_directory
+from flask import Flask, request, jsonify, make_response, g, send_file, url_for
 from flask_cors import CORS
 import os
-import uuid
+import time
 import json
-import hashlib
-import secrets
-from datetime import datetime, timedelta
-from PIL import Image
-import requests
-from io import BytesIO
+import asyncio
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import base64
+import hmac
 import sqlite3
-import traceback
-
-# Import the detector with error handling
-try:
-    from model.pothole_detector import PotholeDetector
-    detector = PotholeDetector('model/best.pt')
-    MODEL_LOADED = True
-except Exception as e:
-    print(f"⚠️  YOLO model not loaded: {e}")
-    print("💡 Using mock detection mode")
-    MODEL_LOADED = False
+import logging
+
+from services.metrics import (
+    metrics, HTTP_REQUESTS, HTTP_LATENCY, DETECT_STAGE_SECONDS, DETECTIONS,
+    SQLITE_QUERY_SECONDS
+)
+from services.admission import (
+    AdmissionController, AdmissionRejected, DeadlineExceeded, check_deadline, remaining, request_deadline
+)
+from services.profiling import Profiler, parse_modes
+from utils.structured_logging import get_logger
+
+logger = get_logger('api')
+
+# Mock detector class for fallback
+class MockDetector:
+    def get_stats(self):
+        return {
+            'model_loaded': False,
+            'detector_type': 'mock',
+            'total_detections': 0,
+            'model_path': 'N/A'
+        }
     
-    # Mock detector class for fallback
-    class MockDetector:
-        def get_stats(self):
-            return {
-                'model_loaded': False,
-                'detector_type': 'mock',
-                'total_detections': 0,
-                'model_path': 'N/A'
-            }
-        
-        def detect(self, image_path):
-            # Mock detection for testing
-            return {
-                'detections': [
-                    {
-                        'bbox': [100, 100, 150, 150],
-                        'confidence': 0.85,
-                        'class': 'pothole',
-                        'class_name': 'pothole'
-                    }
-                ],
-                'image_size': [640, 480],
-                'processing_time': 0.1,
-                'model_used': 'mock_detector',
-                'total_detections': 1
-            }
+    def detect(self, image_path):
+        # Mock detection for testing
+        from model.detection_result import DetectionResult
+        return {
+            'detections': DetectionResult.from_xywh([[100, 100, 150, 150]], [0.85]),
+            'image_size': [640, 480],
+            'processing_time': 0.1,
+            'model_used': 'mock_detector',
+            'total_detections': 1
+        }
+
+# Fallback map service
+class FallbackMapService:
+    def get_or_create_user(self, request):
+        return "fallback_user_123"
     
-    detector = MockDetector()
-
-# Import map_service with error handling
-try:
-    from services.map_service import map_service
-    MAP_SERVICE_LOADED = True
-except Exception as e:
-    print(f"❌ Map service failed to load: {e}")
-    print("💡 Creating fallback map service")
-    MAP_SERVICE_LOADED = False
+    def save_pothole_data(self, data, user_id, request):
+        return "fallback_session"
     
-    # Fallback map service
-    class FallbackMapService:
-        def get_or_create_user(self, request):
-            return "fallback_user_123"
-        
-        def save_pothole_data(self, data, user_id, request):
-            return "fallback_session"
-        
-        def get_user_potholes(self, user_id):
-            return []
-        
-        def get_potholes_by_area(self, ne_lat, ne_lng, sw_lat, sw_lng):
-            return []
-        
-        def get_recent_potholes(self, limit=50):
-            return []
-        
-        def get_heatmap_data(self):
-            return []
-        
-        def get_statistics(self):
-            return {
-                'total_potholes': 0,
-                'avg_severity': 0,
-                'high_severity': 0,
-                'medium_severity': 0,
-                'low_severity': 0,
-                'total_users': 0,
-                'total_reports': 0
-            }
+    def get_user_potholes(self, user_id):
+        return []
+    
+    def get_potholes_by_area(self, ne_lat, ne_lng, sw_lat, sw_lng):
+        return []
+    
+    def get_recent_potholes(self, limit=50):
+        return []
+    
+    def get_heatmap_data(self):
+        return []
+    
+    def get_statistics(self):
+        return {
+            'total_potholes': 0,
+            'avg_severity': 0,
+            'high_severity': 0,
+            'medium_severity': 0,
+            'low_severity': 0,
+            'total_users': 0,
+            'total_reports': 0
+        }
+
+# Services are built once by create_app(), not at import time, so a
+# preloading server (gunicorn --preload) loads the model a single time in the
+# master and every forked worker shares it. With PRELOAD_MODEL=0 the detector
+# (and torch with it) is only loaded by the first detection request, so a
+# process serving map/auth traffic never pays for it.
+PRELOAD_MODEL = os.environ.get('PRELOAD_MODEL', '1') != '0'
+detector = None
+MODEL_LOADED = False
+map_service = None
+MAP_SERVICE_LOADED = False
+
+# Optional pool of inference worker processes (INFERENCE_WORKERS > 0). The
+# workers are forked from this process so they share the loaded model weights.
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '0'))
+INFERENCE_THREADS_PER_WORKER = int(os.environ.get('INFERENCE_THREADS_PER_WORKER', '0')) or None
+# Longest a request waits on the pool when the client sent no deadline, so a
+# wedged pool fails the request instead of holding its thread forever
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', '60'))
+inference_pool = None
+# This process's slot when several web workers each run a pool: (index, count).
+# Set by gunicorn's post_fork so that both the eager and the lazy pool start
+# use the same share of the workers and a disjoint range of cores.
+inference_share = None
+
+# Severity engine, imported on first use (see get_severity_engine)
+severity_engine = None
+
+# Background cleanup of expired login sessions, one per serving process
+session_reaper = None
+
+# PDF report render queue, created on first use (see get_report_queue)
+report_queue = None
+
+# Pooled HTTP downloader for image URLs, created on first use (see get_image_downloader)
+image_downloader = None
+
+# IP geolocation for /api/user/location, loaded on first use (see get_geoip)
+geoip = None
+
+# Content-addressed store of uploaded originals, opened on first use (see get_image_store)
+image_store = None
+
+# In-flight limit, per-client rate limits and deadlines for detection requests
+admission = AdmissionController()
+
+# Opt-in request profiling and the stack sampler, per serving process
+profiler = Profiler()
+
+# How long /api/generate-report waits for its render before giving up
+REPORT_WAIT_SECONDS = float(os.environ.get('REPORT_WAIT_SECONDS', '60'))
+
+_services_lock = threading.Lock()
+
+# Shared executor for blocking I/O awaited by the async routes. Flask runs each
+# async view in its own short-lived event loop, so the loop's default executor
+# would be rebuilt on every request.
+_io_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('IO_THREADS', '16')),
+    thread_name_prefix='io'
+)
+
+def run_io(func, *args):
+    """Await a blocking call on the shared I/O executor"""
+    return asyncio.get_running_loop().run_in_executor(_io_executor, profiler.propagate(func), *args)
+
+def load_detector():
+    """Load the YOLO detector, falling back to mock detection"""
+    global detector, MODEL_LOADED
+    
+    if detector is not None:
+        return detector
+    
+    try:
+        from model.pothole_detector import PotholeDetector
+        loaded_detector = PotholeDetector('model/best.pt')
+        if not loaded_detector.model_loaded:
+            raise RuntimeError("no model could be loaded from model/best.pt")
+        detector = loaded_detector
+        MODEL_LOADED = True
+    except Exception as e:
+        logger.warning("YOLO model not loaded, using mock detection mode: %s", e)
+        MODEL_LOADED = False
+        detector = MockDetector()
+    
+    return detector
+
+def load_map_service():
+    """Load the map service, falling back to an empty in-memory service"""
+    global map_service, MAP_SERVICE_LOADED
+    
+    if map_service is not None:
+        return map_service
+    
+    try:
+        from services.map_service import get_map_service
+        map_service = get_map_service()
+        MAP_SERVICE_LOADED = True
+    except Exception as e:
+        logger.error("Map service failed to load, using fallback map service: %s", e)
+        MAP_SERVICE_LOADED = False
+        map_service = FallbackMapService()
+    
+    return map_service
+
+def set_inference_share(index, count):
+    """Make this process run pool ``index`` of ``count``, splitting INFERENCE_WORKERS and the cores"""
+    global inference_share
+    inference_share = (index % count, count) if count > 1 else None
+
+def start_inference_pool(num_workers=None):
+    """Start the inference worker pool for this process if one is configured"""
+    global inference_pool
+    
+    if num_workers is None:
+        num_workers = INFERENCE_WORKERS
+        if inference_share and num_workers > 0:
+            num_workers = max(1, num_workers // inference_share[1])
+    if inference_pool is not None or not MODEL_LOADED or num_workers <= 0:
+        return inference_pool
+    
+    try:
+        from services.inference_pool import InferencePool, core_share
+        inference_pool = InferencePool(
+            detector,
+            num_workers=num_workers,
+            threads_per_worker=INFERENCE_THREADS_PER_WORKER,
+            cores=core_share(*inference_share) if inference_share else None
+        )
+        inference_pool.start()
+    except Exception as e:
+        logger.warning("Inference pool not started, running detection in the web process: %s", e)
+        inference_pool = None
+    
+    return inference_pool
+
+def start_session_reaper():
+    """Start this process's expired-session reaper"""
+    global session_reaper
+    
+    if session_reaper is not None or not MAP_SERVICE_LOADED:
+        return session_reaper
+    
+    from services.session_reaper import SessionReaper
+    session_reaper = SessionReaper(map_service.db_path)
+    session_reaper.start()
+    return session_reaper
+
+def get_report_queue():
+    """Get the report queue, creating it (and its render threads) on first use"""
+    global report_queue
+    if report_queue is None:
+        with _services_lock:
+            if report_queue is None:
+                from services.report_queue import ReportQueue
+                report_queue = ReportQueue()
+    return report_queue
+
+def get_image_downloader():
+    """Get the image downloader, opening its HTTP connection pool on first use"""
+    global image_downloader
+    if image_downloader is None:
+        with _services_lock:
+            if image_downloader is None:
+                from services.image_downloader import ImageDownloader
+                image_downloader = ImageDownloader()
+    return image_downloader
+
+def get_geoip():
+    """Get the GeoIP locator, mapping its range table on first use"""
+    global geoip
+    if geoip is None:
+        with _services_lock:
+            if geoip is None:
+                from services.geoip import GeoIPLocator
+                geoip = GeoIPLocator()
+    return geoip
+
+def get_image_store():
+    """Get the image store, creating its directory on first use"""
+    global image_store
+    if image_store is None:
+        with _services_lock:
+            if image_store is None:
+                from services.image_store import ImageStore
+                image_store = ImageStore(map_service.db_path)
+    return image_store
+
+def get_detector():
+    """Get the detector, loading it (and starting the pool) on first use"""
+    if detector is None:
+        with _services_lock:
+            load_detector()
+            start_inference_pool()
+    return detector
+
+def detector_stats():
+    """Detector statistics without forcing the model to load"""
+    if detector is None:
+        return {
+            'model_loaded': False,
+            'detector_type': 'not_loaded',
+            'total_detections': 0,
+            'model_path': 'N/A'
+        }
+    return detector.get_stats()
+
+def get_severity_engine():
+    """Get the severity engine, importing it (and numpy) on first use"""
+    global severity_engine
+    if severity_engine is None:
+        with _services_lock:
+            if severity_engine is None:
+                from services.severity import severity_engine as loaded_engine
+                loaded_engine.add_listener(schedule_severity_rescore)
+                severity_engine = loaded_engine
+    return severity_engine
+
+def rescore_stored_potholes(engine):
+    """Rescore stored potholes with the engine's current config"""
+    if not MAP_SERVICE_LOADED:
+        return 0
+    try:
+        return engine.rescore_database(map_service.db_path)
+    except Exception:
+        logger.exception("Severity rescore failed")
+        return 0
+
+def schedule_severity_rescore(engine):
+    """Rescore stored potholes in the background after a severity config change"""
+    _io_executor.submit(rescore_stored_potholes, engine)
+
+def create_app(start_pool=True, preload_model=None):
+    """Application factory: build the detector, map service, inference pool and session reaper once.
+    
+    Calling it again returns the same app. Pass ``start_pool=False`` when the
+    pool and reaper have to be started after forking (see gunicorn.conf.py), and
+    ``preload_model=False`` to defer the detector to the first detection.
+    """
+    if preload_model is None:
+        preload_model = PRELOAD_MODEL
     
-    map_service = FallbackMapService()
+    with _services_lock:
+        load_map_service()
+        if preload_model:
+            load_detector()
+            if start_pool:
+                start_inference_pool()
+        if start_pool:
+            start_session_reaper()
+    return app
 
 app = Flask(__name__)
 
@@ -101,19 +336,74 @@ CORS(app,
      origins=["http://localhost:3000", "http://127.0.0.1:3000"],
      supports_credentials=True,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"])
+     allow_headers=["Content-Type", "Authorization", "X-Requested-With",
+                    "X-Request-Timeout", "X-Request-Deadline"],
+     expose_headers=["Retry-After", "X-Profile-Id"])
+
+@app.before_request
+def ensure_services_loaded():
+    """Build the services on first use when the app was imported without create_app()"""
+    if map_service is None:
+        create_app()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count every request and observe its latency per route"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=route, method=request.method)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.before_request
+def start_profiling():
+    """Profile this request if an admin asked for it with X-Profile, its route is armed or the sampler runs"""
+    header = request.environ.get('HTTP_X_PROFILE')
+    if not (header or profiler.active) or request.path.startswith('/api/admin/profiling'):
+        return
+    modes = parse_modes(header) if header and require_admin() is None else ()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    profiler.begin_request(request.method, request.path, route, modes)
+
+@app.after_request
+def finish_profiling(response):
+    capture = profiler.current_capture()
+    if capture is not None:
+        capture.finish(response.status_code)
+        response.headers['X-Profile-Id'] = capture.id
+    return response
+
+@app.teardown_request
+def end_profiling(error=None):
+    profiler.end_request(500 if error else None)
+
+_flask_async_to_sync = app.async_to_sync
+
+def async_to_sync(func):
+    """Flask's runner for async views, carrying the request's profiling onto the event loop thread"""
+    return _flask_async_to_sync(profiler.propagate(func))
 
-# Configuration
-UPLOAD_FOLDER = 'uploads'
-ANNOTATED_FOLDER = 'annotated'
+app.async_to_sync = async_to_sync
+
+metrics.gauge(
+    'inference_queue_depth', 'Images waiting in or being processed by the inference pool',
+    lambda: inference_pool.queue_depth() if inference_pool else 0
+)
+metrics.gauge(
+    'admission_in_flight', 'Detection requests admitted and not yet finished',
+    lambda: admission.in_flight
+)
+
+# Configuration; uploaded images are kept in the image store (services/image_store.py)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['ANNOTATED_FOLDER'] = ANNOTATED_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 # Create necessary directories
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(ANNOTATED_FOLDER, exist_ok=True)
 os.makedirs('reports', exist_ok=True)
 
 # =============================================================================
@@ -132,7 +422,7 @@ def register_user():
         username = data.get('username')
         password = data.get('password')
         
-        print(f"📝 Registration attempt: {email}, {username}")
+        logger.debug("Registration attempt: %s, %s", email, username)
         
         if not all([email, username, password]):
             return jsonify({'error': 'Email, username, and password required'}), 400
@@ -150,10 +440,10 @@ def register_user():
         )
         
         if error:
-            print(f"❌ Registration failed: {error}")
+            logger.info("Registration failed: %s", error)
             return jsonify({'error': error}), 400
         
-        print(f"✅ User registered: {user_id}")
+        logger.info("User registered: %s", user_id)
         
         return jsonify({
             'success': True,
@@ -162,27 +452,26 @@ def register_user():
         })
         
     except Exception as e:
-        print(f"💥 Registration exception: {str(e)}")
+        logger.exception("Registration failed")
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
 def login_user():
     """User login"""
     try:
-        print("🔐 Login endpoint called")
         
         if not request.is_json:
-            print("❌ No JSON data received")
+            logger.debug("Login without JSON body")
             return jsonify({'error': 'JSON data required'}), 400
             
         data = request.get_json()
         email = data.get('email')
         password = data.get('password')
         
-        print(f"📧 Login attempt for: {email}")
+        logger.debug("Login attempt for: %s", email)
         
         if not all([email, password]):
-            print("❌ Missing email or password")
+            logger.debug("Login without email or password")
             return jsonify({'error': 'Email and password required'}), 400
         
         if not MAP_SERVICE_LOADED:
@@ -224,10 +513,10 @@ def login_user():
         )
         
         if error:
-            print(f"❌ Authentication failed: {error}")
+            logger.info("Authentication failed for %s: %s", email, error)
             return jsonify({'error': error}), 401
         
-        print(f"✅ Login successful for: {user_data['username']}")
+        logger.info("Login successful for: %s", user_data['username'])
         
         response = make_response(jsonify({
             'success': True,
@@ -248,7 +537,7 @@ def login_user():
         return response
         
     except Exception as e:
-        print(f"💥 Login exception: {str(e)}")
+        logger.exception("Login failed")
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
 @app.route('/api/auth/logout', methods=['POST'])
@@ -274,7 +563,6 @@ def get_current_user():
     """Get current user profile"""
     try:
         session_token = request.cookies.get('session_token')
-        print(f"🔍 Checking session: {session_token}")
         
         if not session_token:
             return jsonify({'user': None})
@@ -296,19 +584,19 @@ def get_current_user():
         
         user = map_service.validate_session(session_token)
         if not user:
-            print("❌ Invalid session")
+            logger.debug("Invalid session")
             response = make_response(jsonify({'user': None}))
             response.set_cookie('session_token', '', expires=0)
             return response
         
-        print(f"✅ Valid session for: {user['username']}")
+        logger.debug("Valid session for: %s", user['username'])
         
         # Get full user profile
         user_profile = map_service.get_user_profile(user['user_id'])
         return jsonify({'user': user_profile})
         
     except Exception as e:
-        print(f"💥 Get user exception: {str(e)}")
+        logger.exception("Failed to get current user")
         return jsonify({'error': f'Failed to get user: {str(e)}'}), 500
 
 # =============================================================================
@@ -330,16 +618,30 @@ def test_endpoint():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    stats = detector.get_stats()
+    stats = detector_stats()
     return jsonify({
         'status': 'healthy', 
         'timestamp': datetime.now().isoformat(),
         'model_loaded': stats['model_loaded'],
         'model_type': stats['detector_type'],
         'total_detections': stats['total_detections'],
-        'map_service_loaded': MAP_SERVICE_LOADED
+        'map_service_loaded': MAP_SERVICE_LOADED,
+        'inference_pool': inference_pool.get_stats() if inference_pool else None,
+        'session_reaper': session_reaper.get_stats() if session_reaper else None,
+        'report_queue': report_queue.get_stats() if report_queue else None,
+        'geoip': geoip.get_stats() if geoip else None,
+        'image_store': image_store.get_stats() if image_store else None,
+        'admission': admission.get_stats(),
+        'profiling': profiler.get_stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this process"""
+    response = make_response(metrics.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
 # =============================================================================
 # DETECTION UTILITY FUNCTIONS
 # =============================================================================
@@ -359,114 +661,269 @@ def is_valid_url(url):
         return False
 
 def download_image_from_url(image_url):
-    """Download image from URL"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(image_url, timeout=30, headers=headers)
-        response.raise_for_status()
-        
-        # Check if it's an image
-        content_type = response.headers.get('content-type', '')
-        if not content_type.startswith('image/'):
-            raise ValueError("URL does not point to an image")
-        
-        return BytesIO(response.content)
-    except Exception as e:
-        raise ValueError(f"Failed to download image from URL: {str(e)}")
+    """Download an image URL into memory; raises ValueError if it is not a usable image"""
+    return get_image_downloader().fetch(image_url)
 
 def handle_base64_image(base64_string):
-    """Handle base64 encoded images"""
-    try:
-        # Handle data URL format: data:image/png;base64,...
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        image_data = base64.b64decode(base64_string)
-        return BytesIO(image_data)
-    except Exception as e:
-        raise ValueError(f"Invalid base64 image: {str(e)}")
+    """Decode a base64 image or data URL into memory, in chunks; raises ValueError"""
+    from utils.upload_stream import decode_base64_image
+    
+    return decode_base64_image(base64_string)
 
-def save_image_from_stream(image_stream, filename):
-    """Save image from stream to file"""
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+def read_uploaded_file(file):
+    """Read a multipart file upload into memory; raises ValueError"""
+    from utils.upload_stream import read_image_body
     
-    with open(filepath, 'wb') as f:
-        f.write(image_stream.getvalue())
+    return read_image_body(file.stream, file.content_length or None)
+
+def read_raw_image_body():
+    """Stream an image/* (raw) or text/plain (base64) request body into memory; raises ValueError"""
+    from utils.upload_stream import read_image_body
     
-    return filepath
+    return read_image_body(request.stream, request.content_length,
+                           base64_encoded=request.mimetype == 'text/plain')
 
-def calculate_severity(detection):
-    """Calculate pothole severity based on size and confidence"""
+def upload_error(error):
+    """400 for a bad upload, 413 for one over MAX_IMAGE_BYTES"""
+    from utils.upload_stream import UploadTooLarge
+    
+    return jsonify({'error': str(error)}), 413 if isinstance(error, UploadTooLarge) else 400
+
+def session_user():
+    """The logged-in user of this request (validated once per request), or None"""
+    if 'session_user' not in g:
+        session_token = request.cookies.get('session_token')
+        g.session_user = (map_service.validate_session(session_token)
+                          if session_token and MAP_SERVICE_LOADED else None)
+    return g.session_user
+
+def admission_key():
+    """Rate limit key: the logged-in user, else the client address (user_id cookies are easy to forge)"""
+    user = session_user()
+    return f"user:{user['user_id']}" if user else f"ip:{request.remote_addr}"
+
+def admission_error(error):
+    """429 or 503 with Retry-After for a request refused by admission control"""
+    response = jsonify({'error': str(error), 'reason': error.reason, 'success': False})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+def admission_controlled(view):
+    """
+    Run a detection view only once admission control lets it in.
+
+    Requests are refused before their body is read. The client deadline
+    is kept in ``g.deadline`` for the pipeline to check before inference.
+    """
+    def admit():
+        return admission.admit(admission_key(), request_deadline(request.headers))
+
+    if inspect.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                ticket = admit()
+            except AdmissionRejected as e:
+                return admission_error(e)
+            with ticket:
+                g.deadline = ticket.deadline
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            ticket = admit()
+        except AdmissionRejected as e:
+            return admission_error(e)
+        with ticket:
+            g.deadline = ticket.deadline
+            return view(*args, **kwargs)
+    return wrapper
+
+def probe_upload(image_data):
+    """Format and size of uploaded image bytes, read from the header; raises ValueError"""
+    from utils.image_ingest import probe_image
+    
+    return probe_image(image_data)
+
+def parse_client_location(value):
+    """{'latitude', 'longitude'} from a location dict or JSON string sent by the client, else None"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(value, dict):
+        return None
     try:
-        bbox = detection['bbox']
-        confidence = detection['confidence']
-        
-        # Calculate area
-        area = bbox[2] * bbox[3]  # width * height
-        
-        # Severity scoring
-        size_score = min(area / 10000, 1.0)  # Normalize area (max 100x100px = 1.0)
-        confidence_score = confidence
-        
-        # Combined score (weighted)
-        severity_score = (size_score * 0.7) + (confidence_score * 0.3)
-        
-        # Categorize severity
-        if severity_score > 0.7:
-            return {
-                'level': 'high', 
-                'score': round(severity_score, 3), 
-                'description': 'Large pothole - immediate attention needed'
-            }
-        elif severity_score > 0.4:
-            return {
-                'level': 'medium', 
-                'score': round(severity_score, 3), 
-                'description': 'Medium pothole - schedule repair'
-            }
-        else:
-            return {
-                'level': 'low', 
-                'score': round(severity_score, 3), 
-                'description': 'Small pothole - monitor condition'
-            }
-    except Exception as e:
-        # Fallback severity calculation
-        return {
-            'level': 'medium', 
-            'score': 0.5, 
-            'description': 'Standard pothole - requires inspection'
-        }
+        latitude, longitude = float(value['latitude']), float(value['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    location = {'latitude': latitude, 'longitude': longitude}
+    if isinstance(value.get('accuracy'), (int, float)):
+        location['accuracy'] = value['accuracy']
+    return location
+
+def parse_client_timestamp(value):
+    """Datetime from an ISO 8601 string sent by the client, else None"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def resolve_location_and_time(image_data, client_location=None, client_timestamp=None):
+    """
+    Where and when a photo was taken: (location, location_source, timestamp).
+
+    The photo's own Exif GPS fix wins over the position the client sent,
+    which is where the device was at upload time; without either the
+    location is None and no pothole is stored. The timestamp is the
+    client's, else the Exif capture time, else now.
+    """
+    from utils.exif import read_photo_metadata
+
+    with DETECT_STAGE_SECONDS.time(stage='exif'):
+        metadata = read_photo_metadata(image_data)
+
+    if 'latitude' in metadata:
+        location = {'latitude': metadata['latitude'], 'longitude': metadata['longitude']}
+        source = 'exif'
+    else:
+        location = parse_client_location(client_location)
+        source = 'client' if location else None
+    timestamp = parse_client_timestamp(client_timestamp) or metadata.get('captured_at') or datetime.now()
+    return location, source, timestamp
+
+def run_detection(image_data, image_info=None, deadline=None):
+    """
+    Run detection on encoded image bytes, in the worker pool when one is running.
+
+    Raises DeadlineExceeded instead of starting inference once ``deadline``
+    (epoch seconds) has passed.
+    """
+    from utils.image_ingest import decode_for_model, scale_to_original
+
+    active_detector = get_detector()
+    check_deadline(deadline, 'inference')
+    if inference_pool is not None:
+        # Workers decode at model resolution themselves and skip expired jobs
+        deadline = deadline or time.time() + INFERENCE_TIMEOUT
+        with DETECT_STAGE_SECONDS.time(stage='inference'):
+            try:
+                future = inference_pool.submit_bytes(image_data, timeout=remaining(deadline), deadline=deadline)
+                result = future.result(timeout=remaining(deadline))
+            except TimeoutError:
+                check_deadline(deadline, 'inference finished')
+                raise
+    else:
+        with DETECT_STAGE_SECONDS.time(stage='decode'):
+            image, image_info = decode_for_model(image_data, image_info)
+        check_deadline(deadline, 'inference')
+        with DETECT_STAGE_SECONDS.time(stage='inference'):
+            result = scale_to_original(active_detector.detect(image), image, image_info)
+    DETECTIONS.inc(result.get('total_detections', 0))
+    return result
+
+async def run_detection_async(image_data, image_info=None, deadline=None):
+    """Await detection without holding the event loop; see run_detection for ``deadline``"""
+    from utils.image_ingest import decode_for_model, scale_to_original
+
+    active_detector = get_detector()
+    check_deadline(deadline, 'inference')
+    if inference_pool is not None:
+        deadline = deadline or time.time() + INFERENCE_TIMEOUT
+        with DETECT_STAGE_SECONDS.time(stage='inference'):
+            try:
+                future = inference_pool.submit_bytes(image_data, timeout=remaining(deadline), deadline=deadline)
+                result = await asyncio.wait_for(asyncio.wrap_future(future), remaining(deadline))
+            except (TimeoutError, asyncio.TimeoutError):
+                check_deadline(deadline, 'inference finished')
+                raise
+    else:
+        with DETECT_STAGE_SECONDS.time(stage='decode'):
+            image, image_info = await run_io(decode_for_model, image_data, image_info)
+        check_deadline(deadline, 'inference')
+        with DETECT_STAGE_SECONDS.time(stage='inference'):
+            result = scale_to_original(await run_io(active_detector.detect, image), image, image_info)
+    DETECTIONS.inc(result.get('total_detections', 0))
+    return result
+
+def store_image(image_data, image_info):
+    """
+    Keep an uploaded image and its renditions in the image store; returns
+    the response's ``image`` entry, or None if it could not be stored.
+    """
+    try:
+        with DETECT_STAGE_SECONDS.time(stage='store'):
+            stored = get_image_store().put(image_data, image_info)
+    except Exception:
+        logger.exception("Could not store uploaded image")
+        return None
+    
+    return {
+        **stored.as_dict(),
+        'urls': {rendition: url_for('get_stored_image', digest=stored.digest, rendition=rendition)
+                 for rendition in ('original', 'preview', 'thumbnail')}
+    }
+
+def annotation_requested(data=None):
+    """Whether the client asked for an annotated preview (``annotate`` query, form or JSON field)"""
+    value = request.args.get('annotate') or request.form.get('annotate')
+    if value is None and data:
+        value = data.get('annotate')
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def render_annotated_preview(image_data, detections, image_size):
+    """Base64 annotated preview of encoded image bytes, drawn with the shared OpenCV annotator"""
+    from utils.image_annotator import annotator
+
+    with DETECT_STAGE_SECONDS.time(stage='annotate'):
+        preview = annotator.render_preview_from_bytes(image_data, detections, image_size)
+    return base64.b64encode(preview).decode('ascii')
+
+def as_detection_result(detections):
+    """Columnar detections; also accepts a list of dicts with top-left [x, y, w, h] bboxes"""
+    from model.detection_result import DetectionResult
+
+    if isinstance(detections, DetectionResult):
+        return detections
+    return DetectionResult.from_xywh(
+        [d['bbox'] for d in detections], [d['confidence'] for d in detections])
+
+def serialize_detections(detections, image_size, **common):
+    """Response dicts with severity for a detector result; ``common`` is added to each"""
+    detections = as_detection_result(detections)
+    severities = get_severity_engine().score_detections(detections, image_size)
+    return detections.to_dicts(extra_columns={'severity': severities}, **common)
 
 # =============================================================================
 # DETECTION ENDPOINTS
 # =============================================================================
 
 @app.route('/api/detect', methods=['POST'])
+@admission_controlled
 def detect_potholes():
     """Main detection endpoint with user tracking"""
     try:
-        print("🎯 Detection endpoint called")
         
         # Get or create user
-        session_token = request.cookies.get('session_token')
-        user_info = None
-        
-        if session_token:
-            user_info = map_service.validate_session(session_token)
+        user_info = session_user()
         
         if user_info:
             user_id = user_info['user_id']
-            print(f"✅ Authenticated user: {user_id}")
+            logger.debug("Detection for authenticated user: %s", user_id)
         else:
             user_id = map_service.get_or_create_user(request)
-            print(f"✅ Anonymous user: {user_id}")
+            logger.debug("Detection for anonymous user: %s", user_id)
         
-        filepath = None
-        location_data = None
-        timestamp = None
+        image_data = None
+        client_location = None
+        client_timestamp = None
         
         # Check for file upload
         if 'image' in request.files:
@@ -475,40 +932,24 @@ def detect_potholes():
                 if not allowed_file(file.filename):
                     return jsonify({'error': 'Invalid file type. Supported: PNG, JPG, JPEG, GIF, WebP'}), 400
                 
-                # Get location data from form
-                location_json = request.form.get('location')
-                timestamp_str = request.form.get('timestamp')
+                # Location and timestamp sent with the file, if any
+                client_location = request.form.get('location')
+                client_timestamp = request.form.get('timestamp')
                 
-                if location_json:
-                    try:
-                        location_data = json.loads(location_json)
-                        print(f"✅ Location data: {location_data}")
-                    except json.JSONDecodeError:
-                        print("⚠️  Invalid location JSON format")
-                        # Get default location
-                        location_data = {'latitude': 40.7128, 'longitude': -74.0060}
-                else:
-                    # Use default location if not provided
-                    location_data = {'latitude': 40.7128, 'longitude': -74.0060}
-                
-                if timestamp_str:
-                    try:
-                        timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    except ValueError:
-                        timestamp = datetime.now()
-                else:
-                    timestamp = datetime.now()
-                
-                # Generate unique filename and save
-                file_extension = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"{uuid.uuid4()}.{file_extension}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                print(f"✅ File saved: {filepath}")
+                # Read into memory; the image is never written to disk
+                try:
+                    with DETECT_STAGE_SECONDS.time(stage='upload_save'):
+                        image_data = read_uploaded_file(file)
+                    logger.debug("File read: %d bytes", len(image_data))
+                except ValueError as e:
+                    return upload_error(e)
         
         # Check for JSON data with URL or base64
         elif request.is_json:
             data = request.get_json()
+            if data:
+                client_location = data.get('location')
+                client_timestamp = data.get('timestamp')
             
             if data and 'image_url' in data:
                 # Handle URL-based detection
@@ -517,110 +958,131 @@ def detect_potholes():
                     return jsonify({'error': 'Invalid image URL'}), 400
                 
                 try:
-                    image_stream = download_image_from_url(image_url)
-                    filename = f"{uuid.uuid4()}.jpg"
-                    filepath = save_image_from_stream(image_stream, filename)
-                    print(f"✅ URL image saved: {filepath}")
+                    # Kept in memory and handed straight to the detector
+                    with DETECT_STAGE_SECONDS.time(stage='download'):
+                        image_data = download_image_from_url(image_url)
+                    logger.debug("URL image downloaded: %d bytes", len(image_data))
                 except ValueError as e:
-                    return jsonify({'error': str(e)}), 400
+                    return upload_error(e)
             
             elif data and 'image_base64' in data:
-                # Handle base64 image
-                base64_data = data['image_base64']
+                # Handle base64 image, decoded in memory
                 try:
-                    image_stream = handle_base64_image(base64_data)
-                    filename = f"{uuid.uuid4()}.jpg"
-                    filepath = save_image_from_stream(image_stream, filename)
-                    print(f"✅ Base64 image saved: {filepath}")
+                    with DETECT_STAGE_SECONDS.time(stage='upload_save'):
+                        image_data = handle_base64_image(data['image_base64'])
+                    logger.debug("Base64 image decoded: %d bytes", len(image_data))
                 except ValueError as e:
-                    return jsonify({'error': str(e)}), 400
+                    return upload_error(e)
             else:
                 return jsonify({'error': 'No image data provided in JSON'}), 400
         
+        # Raw image body, or base64 as text/plain, read as it arrives
+        elif request.mimetype.startswith('image/') or request.mimetype == 'text/plain':
+            client_location = request.args.get('location')
+            client_timestamp = request.args.get('timestamp')
+            try:
+                with DETECT_STAGE_SECONDS.time(stage='upload_save'):
+                    image_data = read_raw_image_body()
+                logger.debug("Image body read: %d bytes", len(image_data))
+            except ValueError as e:
+                return upload_error(e)
+        
         else:
             return jsonify({
-                'error': 'No image provided. Use file upload or JSON with image_url/image_base64.'
+                'error': 'No image provided. Use file upload, an image/* body, '
+                         'or JSON with image_url/image_base64.'
             }), 400
         
-        # Process detection if we have a valid file
-        if filepath and os.path.exists(filepath):
+        # Process detection if we have an image
+        if image_data is not None:
+            # Format, dimensions and decompression bombs are checked from the
+            # header, before any pixels are decoded
+            try:
+                image_info = probe_upload(image_data)
+            except ValueError as e:
+                return upload_error(e)
+            
+            # GPS fix and capture time from the photo's Exif block, read
+            # without decoding pixels; there is no made-up default location
+            location_data, location_source, timestamp = resolve_location_and_time(
+                image_data, client_location, client_timestamp)
+            if location_data is None:
+                logger.info("Detection without a location; potholes will not be mapped")
+            
             try:
-                print(f"🔄 Processing image: {filepath}")
                 
-                # Run detection
-                result = detector.detect(filepath)
-                print(f"✅ Detection completed: {result['total_detections']} potholes found")
+                # Run detection, unless the client has given up meanwhile
+                result = run_detection(image_data, image_info, g.deadline)
+                logger.info("Detection completed: %d potholes found", result['total_detections'])
                 
                 # Enhance detections with severity and location data
-                enhanced_detections = []
-                for detection in result['detections']:
-                    enhanced_detection = {
-                        'bbox': detection['bbox'],
-                        'confidence': float(detection['confidence']),
-                        'class': detection.get('class', 'pothole'),
-                        'class_name': detection.get('class_name', 'pothole'),
-                        'severity': calculate_severity(detection),
-                        'location': location_data,
-                        'timestamp': timestamp.isoformat() if timestamp else datetime.now().isoformat(),
-                        'user_id': user_id
-                    }
-                    enhanced_detections.append(enhanced_detection)
+                with DETECT_STAGE_SECONDS.time(stage='severity'):
+                    enhanced_detections = serialize_detections(
+                        result['detections'],
+                        result['image_size'],
+                        location=location_data,
+                        timestamp=timestamp.isoformat(),
+                        user_id=user_id
+                    )
                 
                 # Prepare response
                 response_data = {
                     'success': True,
                     'detections': enhanced_detections,
+                    'bbox_format': 'xywh',
+                    'severity_version': get_severity_engine().version,
                     'image_size': result['image_size'],
                     'processing_time': result['processing_time'],
                     'model_used': result['model_used'],
                     'total_detections': result['total_detections'],
                     'location': location_data,
-                    'timestamp': timestamp.isoformat() if timestamp else datetime.now().isoformat(),
+                    'location_source': location_source,
+                    'timestamp': timestamp.isoformat(),
                     'user_id': user_id
                 }
                 
-                # Include annotated image in response if available
+                # Keep the original when its potholes will be mapped; the stored
+                # potholes reference it by digest
+                if location_data and result['total_detections']:
+                    response_data['image'] = store_image(image_data, image_info)
+                
+                # Include annotated image in response if available or requested
                 if 'annotated_image' in result:
                     response_data['annotated_image'] = result['annotated_image']
+                elif annotation_requested(request.get_json(silent=True)):
+                    response_data['annotated_image'] = render_annotated_preview(
+                        image_data, enhanced_detections, result['image_size'])
                 
                 # Save to database with user tracking
                 try:
-                    session_id = map_service.save_pothole_data(response_data, user_id, request)
-                    print(f"✅ Data saved to database: {session_id}")
+                    with DETECT_STAGE_SECONDS.time(stage='db_write'):
+                        session_id = map_service.save_pothole_data(response_data, user_id, request)
+                    logger.debug("Detection saved to database: %s", session_id)
                     response_data['session_id'] = session_id
                 except Exception as db_error:
-                    print(f"⚠️  Database save failed: {db_error}")
-                    print(f"🔍 Traceback: {traceback.format_exc()}")
+                    logger.exception("Database save failed")
                     # Continue even if database save fails - still return detection results
                 
-                # Clean up uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                    print("✅ Temporary file cleaned up")
-                
                 # Create response with user cookie
                 response = make_response(jsonify(response_data))
                 response.set_cookie('user_id', user_id, max_age=365*24*60*60, secure=False, samesite='Lax')
-                print("✅ Detection response sent successfully")
                 return response
                 
+            except DeadlineExceeded as e:
+                return admission_error(e)
             except Exception as e:
-                # Clean up on error
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                print(f"❌ Error processing image: {str(e)}")
-                print(f"🔍 Traceback: {traceback.format_exc()}")
+                logger.exception("Error processing image")
                 return jsonify({'error': f'Error processing image: {str(e)}', 'success': False}), 500
         
         return jsonify({'error': 'Failed to process image', 'success': False}), 500
         
     except Exception as e:
-        print(f"💥 Server error in detection: {str(e)}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("Server error in detection")
         return jsonify({'error': f'Server error: {str(e)}', 'success': False}), 500
 
 @app.route('/api/detect/url', methods=['POST'])
-def detect_from_url():
+@admission_controlled
+async def detect_from_url():
     """Direct endpoint for URL-based detection"""
     try:
         # Get or create user for URL detection too
@@ -637,50 +1099,58 @@ def detect_from_url():
         if not is_valid_url(image_url):
             return jsonify({'error': 'Invalid URL'}), 400
         
-        # Download and process image
-        image_stream = download_image_from_url(image_url)
-        filename = f"{uuid.uuid4()}.jpg"
-        filepath = save_image_from_stream(image_stream, filename)
+        # Download into memory and hand the image straight to the detector
+        try:
+            with DETECT_STAGE_SECONDS.time(stage='download'):
+                image_data = await run_io(download_image_from_url, image_url)
+            image_info = probe_upload(image_data)
+        except ValueError as e:
+            return upload_error(e)
+        
+        location_data, location_source, timestamp = resolve_location_and_time(
+            image_data, data.get('location'), data.get('timestamp'))
         
         try:
-            result = detector.detect(filepath)
+            result = await run_detection_async(image_data, image_info, g.deadline)
             
-            # Enhance detections with user ID
-            enhanced_detections = []
-            for detection in result['detections']:
-                enhanced_detection = {
-                    **detection,
-                    'severity': calculate_severity(detection),
-                    'user_id': user_id
-                }
-                enhanced_detections.append(enhanced_detection)
+            # Enhance detections with severity, location and user ID
+            enhanced_detections = serialize_detections(
+                result['detections'], result['image_size'], location=location_data,
+                timestamp=timestamp.isoformat(), user_id=user_id)
             
             response_data = {
                 'success': True,
                 'detections': enhanced_detections,
+                'bbox_format': 'xywh',
+                'severity_version': get_severity_engine().version,
                 'image_size': result['image_size'],
                 'processing_time': result['processing_time'],
                 'model_used': result['model_used'],
                 'source': 'url',
-                'timestamp': datetime.now().isoformat(),
+                'location': location_data,
+                'location_source': location_source,
+                'timestamp': timestamp.isoformat(),
                 'user_id': user_id
             }
             
+            if location_data and result['total_detections']:
+                response_data['image'] = await run_io(store_image, image_data, image_info)
+            
+            if annotation_requested(data):
+                response_data['annotated_image'] = await run_io(
+                    render_annotated_preview, image_data, enhanced_detections, result['image_size'])
+            
             # Save to database
             map_service.save_pothole_data(response_data, user_id, request)
             
-            # Clean up
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
             # Return with user cookie
             response = make_response(jsonify(response_data))
             response.set_cookie('user_id', user_id, max_age=365*24*60*60)
             return response
             
+        except DeadlineExceeded as e:
+            return admission_error(e)
         except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({'error': f'Error processing image: {str(e)}'}), 500
             
     except Exception as e:
@@ -690,31 +1160,38 @@ def detect_from_url():
 # SIMPLIFIED OTHER ENDPOINTS
 # =============================================================================
 
+@app.route('/api/images/<digest>/<rendition>', methods=['GET'])
+def get_stored_image(digest, rendition):
+    """Serve a stored original, preview or thumbnail; the URL names immutable bytes"""
+    from services.image_store import MIMETYPES, RENDITIONS, is_image_digest
+    from utils.upload_stream import SNIFF_BYTES, sniff_image_format
+    
+    if not is_image_digest(digest) or rendition not in RENDITIONS:
+        return jsonify({'error': 'Image not found'}), 404
+    path = get_image_store().path_for(digest, rendition)
+    try:
+        if rendition == 'original':
+            with open(path, 'rb') as f:
+                mimetype = MIMETYPES.get(sniff_image_format(f.read(SNIFF_BYTES)), 'application/octet-stream')
+        else:
+            mimetype = 'image/jpeg'
+        # A file path lets the WSGI server's file_wrapper use sendfile (gunicorn does)
+        response = send_file(path, mimetype=mimetype, conditional=True,
+                             etag=f'{digest}-{rendition}', max_age=31536000)
+    except FileNotFoundError:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    # Content-addressed: the bytes behind this URL never change
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/api/user/location', methods=['GET'])
 def get_user_location():
-    """Get user location from IP geolocation"""
+    """Get user location from the offline GeoIP table"""
     try:
-        # Try to get user IP
-        user_ip = request.remote_addr
-        
-        # Try to use IP geolocation service (free service)
-        if user_ip and user_ip != '127.0.0.1':
-            try:
-                geo_response = requests.get(
-                    f'https://ipapi.co/{user_ip}/json/',
-                    timeout=5
-                )
-                if geo_response.status_code == 200:
-                    geo_data = geo_response.json()
-                    return jsonify({
-                        'latitude': geo_data.get('latitude', 40.7128),
-                        'longitude': geo_data.get('longitude', -74.0060),
-                        'city': geo_data.get('city', 'Unknown'),
-                        'country': geo_data.get('country_name', 'Unknown'),
-                        'source': 'ip_geolocation'
-                    })
-            except Exception as e:
-                print(f"⚠️  Geolocation API error: {str(e)}")
+        location = get_geoip().lookup(request.remote_addr) if request.remote_addr else None
+        if location:
+            return jsonify(location)
         
         # Default location (New York City)
         return jsonify({
@@ -725,7 +1202,7 @@ def get_user_location():
             'source': 'default'
         })
     except Exception as e:
-        print(f"❌ Location endpoint error: {str(e)}")
+        logger.exception("Location endpoint error")
         return jsonify({
             'latitude': 40.7128,
             'longitude': -74.0060,
@@ -751,14 +1228,9 @@ def get_user_potholes():
 @app.route('/api/debug/cookies', methods=['GET', 'POST', 'OPTIONS'])
 def debug_cookies():
     """Debug endpoint to check what cookies Flask receives"""
-    print("\n" + "=" * 60)
-    print("🔍 DEBUG COOKIES ENDPOINT")
-    print("=" * 60)
-    print(f"Request method: {request.method}")
-    print(f"Request headers: {dict(request.headers)}")
-    print(f"Request cookies: {dict(request.cookies)}")
-    print(f"REQUEST.ENVIRON: {dict(request.environ)}")
-    print("=" * 60 + "\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Debug cookies: %s %s", request.method, request.path,
+                     extra={'cookie_names': sorted(request.cookies), 'origin': request.origin})
     
     return jsonify({
         'method': request.method,
@@ -773,11 +1245,9 @@ def get_user_stats():
     """Get statistics for the current user"""
     try:
         session_token = request.cookies.get('session_token')
-        print(f"🔍 Session token from cookie: {session_token[:16] if session_token else 'NONE'}...")
-        print(f"🔍 All cookies: {dict(request.cookies)}")
         
         if not session_token:
-            print("❌ No session token found")
+            logger.debug("User stats requested without session token")
             return jsonify({
                 'total_reports': 0,
                 'high_severity_reports': 0,
@@ -790,7 +1260,7 @@ def get_user_stats():
         # Get user from session
         user = map_service.validate_session(session_token)
         if not user:
-            print(f"❌ Invalid session: {session_token[:16]}...")
+            logger.debug("User stats requested with invalid session")
             return jsonify({
                 'total_reports': 0,
                 'high_severity_reports': 0,
@@ -801,31 +1271,24 @@ def get_user_stats():
             })
         
         user_id = user['user_id']
-        print(f"✅ Valid session for: {user['username']}")
+        logger.debug("Valid session for: %s", user['username'])
         
         # Query potholes for this user
-        conn = sqlite3.connect(map_service.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN severity = 'high' THEN 1 ELSE 0 END) as high,
-                SUM(CASE WHEN severity = 'medium' THEN 1 ELSE 0 END) as medium,
-                SUM(CASE WHEN severity = 'low' THEN 1 ELSE 0 END) as low
-            FROM potholes
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        from services.map_service import USER_SEVERITY_COUNTS_SQL
+        with SQLITE_QUERY_SECONDS.time(query='user_stats'):
+            conn = sqlite3.connect(map_service.db_path)
+            cursor = conn.cursor()
+        
+            cursor.execute(USER_SEVERITY_COUNTS_SQL, (user_id,))
+        
+            result = cursor.fetchone()
+            conn.close()
         
         total = result[0] or 0
         high = result[1] or 0
         medium = result[2] or 0
         low = result[3] or 0
         
-        print(f"✅ User {user['username']} stats: {total} potholes ({high}H, {medium}M, {low}L)")
         
         return jsonify({
             'total_reports': total,
@@ -836,9 +1299,7 @@ def get_user_stats():
             'user_id': user_id
         })
     except Exception as e:
-        print(f"❌ Error getting user stats: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting user stats")
         return jsonify({
             'error': str(e),
             'total_reports': 0
@@ -883,7 +1344,7 @@ def get_heatmap():
             'total_points': len(heatmap_data)
         }), 200
     except Exception as e:
-        print(f"❌ Heatmap error: {str(e)}")
+        logger.exception("Heatmap error")
         return jsonify({'error': str(e), 'success': False}), 500
 
 @app.route('/api/map/clusters', methods=['GET'])
@@ -913,7 +1374,7 @@ def get_pothole_clusters():
             'total_potholes': sum(len(v) for v in clusters.values())
         }), 200
     except Exception as e:
-        print(f"❌ Clusters error: {str(e)}")
+        logger.exception("Clusters error")
         return jsonify({'error': str(e), 'success': False}), 500
 
 @app.route('/api/map/bounds', methods=['GET'])
@@ -949,16 +1410,19 @@ def get_potholes_in_bounds():
             }
         }), 200
     except Exception as e:
-        print(f"❌ Bounds error: {str(e)}")
+        logger.exception("Bounds error")
         return jsonify({'error': str(e), 'success': False}), 500
 
 @app.route('/api/map/summary', methods=['GET'])
-def get_map_summary():
+async def get_map_summary():
     """Get comprehensive map summary with all data"""
     try:
-        stats = map_service.get_statistics()
-        recent_potholes = map_service.get_recent_potholes(50)
-        heatmap_data = map_service.get_heatmap_data()
+        # The three reads are independent, run them concurrently
+        stats, recent_potholes, heatmap_data = await asyncio.gather(
+            run_io(map_service.get_statistics),
+            run_io(map_service.get_recent_potholes, 50),
+            run_io(map_service.get_heatmap_data)
+        )
         
         return jsonify({
             'success': True,
@@ -976,7 +1440,7 @@ def get_map_summary():
             }
         }), 200
     except Exception as e:
-        print(f"❌ Summary error: {str(e)}")
+        logger.exception("Summary error")
         return jsonify({'error': str(e), 'success': False}), 500
 
 @app.route('/api/map/geojson', methods=['GET'])
@@ -1010,10 +1474,47 @@ def get_geojson():
             'features': features
         }), 200
     except Exception as e:
-        print(f"❌ GeoJSON error: {str(e)}")
+        logger.exception("GeoJSON error")
         return jsonify({'error': str(e), 'type': 'FeatureCollection', 'features': []}), 500
 
 
+@app.route('/api/export', methods=['GET'])
+def export_potholes():
+    """Stream potholes as CSV, newline-delimited GeoJSON or Parquet (admin only)
+    
+    Query parameters: format (csv, geojsonseq, parquet), bbox
+    (min_lng,min_lat,max_lng,max_lat), start, end (ISO 8601) and severity
+    (comma-separated).
+    """
+    error = require_admin()
+    if error:
+        return error
+    if not MAP_SERVICE_LOADED:
+        return jsonify({'error': 'Map service not available'}), 503
+    
+    from services.exporter import EXPORT_FORMATS, FORMAT_ALIASES, ExportFilters, export_potholes as stream_export
+    
+    export_format = request.args.get('format', 'csv').lower()
+    export_format = FORMAT_ALIASES.get(export_format, export_format)
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    try:
+        filters = ExportFilters.parse(
+            bbox=request.args.get('bbox'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            severity=request.args.get('severity')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"potholes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    response = app.response_class(stream_export(map_service.db_path, export_format, filters), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @app.route('/api/map/save-detection', methods=['POST'])
 def save_detection():
     """Save a detection payload to the database (used by frontend Save button)"""
@@ -1041,14 +1542,13 @@ def save_detection():
 
         return jsonify({'success': True, 'session_id': session_id}), 200
     except Exception as e:
-        print(f"❌ Save detection error: {str(e)}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("Save detection error")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
-    stats = detector.get_stats()
+    stats = detector_stats()
     return jsonify({
         'model_loaded': stats['model_loaded'],
         'model_path': stats.get('model_path', 'N/A'),
@@ -1056,48 +1556,321 @@ def model_info():
         'detector_type': stats['detector_type']
     })
 
+def report_urls(job):
+    return {
+        'status_url': url_for('get_report_status', report_id=job.id),
+        'download_url': url_for('download_report', report_id=job.id)
+    }
+
+@app.route('/api/reports', methods=['POST'])
+def create_report():
+    """Queue a PDF report; identical payloads share one content-addressed PDF"""
+    data = request.get_json(silent=True)
+    if not data or 'detection_data' not in data:
+        return jsonify({'error': 'Detection data required'}), 400
+    
+    job = get_report_queue().submit(data['detection_data'], data.get('annotated_image'))
+    status_code = 200 if job.status == 'done' else 202
+    response = jsonify({'success': True, **job.as_dict(), **report_urls(job)})
+    if status_code == 202:
+        response.headers['Location'] = url_for('get_report_status', report_id=job.id)
+    return response, status_code
+
+@app.route('/api/reports/area', methods=['POST'])
+def create_area_report():
+    """Queue a report over all stored potholes in an area and time range (admin only)
+    
+    JSON body: bbox (min_lng,min_lat,max_lng,max_lat), start, end (ISO 8601),
+    severity (comma-separated), top_n (worst potholes listed, default 50) and
+    details (list every pothole, default true).
+    """
+    error = require_admin()
+    if error:
+        return error
+    if not MAP_SERVICE_LOADED:
+        return jsonify({'error': 'Map service not available'}), 503
+    
+    from services.exporter import ExportFilters
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        filters = ExportFilters.parse(
+            bbox=data.get('bbox'),
+            start=data.get('start'),
+            end=data.get('end'),
+            severity=data.get('severity')
+        )
+        top_n = min(max(int(data.get('top_n', 50)), 0), 1000)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job = get_report_queue().submit_area(map_service.db_path, filters, top_n=top_n,
+                                         include_details=bool(data.get('details', True)))
+    status_code = 200 if job.status == 'done' else 202
+    response = jsonify({'success': True, **job.as_dict(), **report_urls(job)})
+    if status_code == 202:
+        response.headers['Location'] = url_for('get_report_status', report_id=job.id)
+    return response, status_code
+
+@app.route('/api/reports/<report_id>', methods=['GET'])
+def get_report_status(report_id):
+    """Status of a queued report"""
+    job = get_report_queue().get(report_id)
+    if job is None:
+        return jsonify({'error': 'Report not found'}), 404
+    return jsonify({**job.as_dict(), **report_urls(job)})
+
+@app.route('/api/reports/<report_id>/pdf', methods=['GET'])
+def download_report(report_id):
+    """Stream a finished report, with conditional and range request support"""
+    queue = get_report_queue()
+    job = queue.get(report_id)
+    if job is None:
+        return jsonify({'error': 'Report not found'}), 404
+    if job.status != 'done':
+        response = jsonify({**job.as_dict(), **report_urls(job)})
+        if job.status == 'failed':
+            return response, 500
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    
+    response = send_file(
+        queue.path_for(report_id),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'pothole_report_{report_id[:12]}.pdf',
+        conditional=True,
+        etag=report_id,
+        max_age=31536000
+    )
+    # Content-addressed: the bytes behind this URL never change
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 @app.route('/api/generate-report', methods=['POST'])
 def generate_report():
-    """Generate PDF report from detection data"""
+    """Generate PDF report from detection data.
+    
+    Kept for older clients that expect the PDF inline as base64; new clients
+    should POST /api/reports and download the PDF from its download_url.
+    """
     try:
-        from services.pdf_generator import PDFReportGenerator
-        
         data = request.json
         if not data or 'detection_data' not in data:
             return jsonify({'error': 'Detection data required'}), 400
         
-        detection_data = data['detection_data']
-        annotated_image = data.get('annotated_image')
-        
-        # Generate PDF
-        pdf_generator = PDFReportGenerator()
-        pdf_path = pdf_generator.generate_report(
-            detection_data=detection_data,
-            annotated_image_data=annotated_image
-        )
+        queue = get_report_queue()
+        job = queue.submit(data['detection_data'], data.get('annotated_image'))
+        pdf_path = queue.wait(job, timeout=REPORT_WAIT_SECONDS)
         
         # Read PDF file
         with open(pdf_path, 'rb') as f:
             pdf_data = base64.b64encode(f.read()).decode('utf-8')
         
-        filename = os.path.basename(pdf_path)
-        
         return jsonify({
             'success': True,
             'message': 'PDF report generated successfully',
             'pdf_data': f'data:application/pdf;base64,{pdf_data}',
-            'filename': filename
+            'filename': f'pothole_report_{job.id[:12]}.pdf',
+            'report_id': job.id,
+            **report_urls(job)
         }), 200
         
     except Exception as e:
-        print(f"❌ Report generation error: {str(e)}")
-        print(f"🔍 Traceback: {traceback.format_exc()}")
+        logger.exception("Report generation error")
         return jsonify({'error': f'Report generation failed: {str(e)}', 'success': False}), 500
 
+# =============================================================================
+# ADMIN ENDPOINTS
+# =============================================================================
+
+def require_admin():
+    """Return an error response unless the caller is an admin.
+    
+    Admins are users with role 'admin', or callers sending an X-Admin-Token
+    header equal to the ADMIN_TOKEN environment variable.
+    """
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    supplied_token = request.headers.get('X-Admin-Token')
+    if admin_token and supplied_token and hmac.compare_digest(admin_token, supplied_token):
+        return None
+    
+    session_token = request.cookies.get('session_token')
+    user = map_service.validate_session(session_token) if session_token and MAP_SERVICE_LOADED else None
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    if user.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    return None
+
+@app.route('/api/admin/severity', methods=['GET'])
+def get_severity_config():
+    """Current severity scoring config"""
+    error = require_admin()
+    if error:
+        return error
+    
+    engine = get_severity_engine()
+    return jsonify({
+        'success': True,
+        'version': engine.version,
+        'config_path': engine.config_path,
+        'config': engine.config
+    })
+
+@app.route('/api/admin/severity/reload', methods=['POST'])
+def reload_severity_config():
+    """Re-read the severity config; a changed config rescores stored potholes in the background"""
+    error = require_admin()
+    if error:
+        return error
+    
+    engine = get_severity_engine()
+    changed = engine.reload(force=True)
+    return jsonify({'success': True, 'changed': changed, 'version': engine.version})
+
+@app.route('/api/admin/severity/rescore', methods=['POST'])
+def rescore_severity():
+    """Rescore stored potholes with the current config (``?wait=1`` to block until done)"""
+    error = require_admin()
+    if error:
+        return error
+    
+    engine = get_severity_engine()
+    if request.args.get('wait') in ('1', 'true'):
+        updated = rescore_stored_potholes(engine)
+        return jsonify({'success': True, 'version': engine.version, 'updated': updated})
+    
+    schedule_severity_rescore(engine)
+    return jsonify({'success': True, 'version': engine.version, 'status': 'scheduled'}), 202
+
+@app.route('/api/admin/images/gc', methods=['POST'])
+def collect_images():
+    """Delete stored images no pothole references any more (``?orphans=1`` also sweeps stray files)"""
+    error = require_admin()
+    if error:
+        return error
+    
+    store = get_image_store()
+    removed = store.collect_garbage()
+    orphans = store.remove_orphans() if request.args.get('orphans') in ('1', 'true') else 0
+    return jsonify({'success': True, 'images_removed': removed, 'orphan_files_removed': orphans,
+                    **store.get_stats()})
+
+@app.route('/api/admin/profiling', methods=['GET'])
+def get_profiling():
+    """Stack sampler state, armed routes and the recent request captures of this process"""
+    error = require_admin()
+    if error:
+        return error
+
+    return jsonify({'success': True, **profiler.get_stats(),
+                    'recent_captures': [capture.as_dict() for capture in reversed(profiler.captures)]})
+
+@app.route('/api/admin/profiling/capture', methods=['POST'])
+def arm_profiling():
+    """Profile the next requests to a route
+
+    JSON body: route (a rule such as /api/map/summary, omit for any route),
+    count (requests to capture, default 1, 0 disarms) and modes (list of
+    cpu and memory, default cpu).
+    """
+    error = require_admin()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    route = data.get('route') or None
+    modes = data.get('modes', ['cpu'])
+    try:
+        count = min(max(int(data.get('count', 1)), 0), 100)
+        modes = parse_modes(','.join(modes) if isinstance(modes, list) else modes)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if count and not modes:
+        return jsonify({'error': 'modes must be cpu and/or memory'}), 400
+    if route is not None and route not in {rule.rule for rule in app.url_map.iter_rules()}:
+        return jsonify({'error': f'Unknown route: {route}'}), 400
+
+    profiler.arm(route, count, modes)
+    return jsonify({'success': True, **profiler.get_stats()})
+
+@app.route('/api/admin/profiling/captures/<capture_id>', methods=['GET'])
+def get_profile_capture(capture_id):
+    """One request capture; ``?format=pstats`` downloads its cProfile data for pstats or snakeviz"""
+    error = require_admin()
+    if error:
+        return error
+
+    capture = profiler.get_capture(capture_id)
+    if capture is None:
+        return jsonify({'error': 'Capture not found'}), 404
+
+    if request.args.get('format') == 'pstats':
+        data = capture.pstats_bytes()
+        if data is None:
+            return jsonify({'error': 'Capture has no cpu profile'}), 404
+        response = make_response(data)
+        response.headers['Content-Type'] = 'application/octet-stream'
+        response.headers['Content-Disposition'] = f'attachment; filename={capture.id}.prof'
+        return response
+    return jsonify({'success': True, **capture.as_dict(detail=True)})
+
+@app.route('/api/admin/profiling/sampler/start', methods=['POST'])
+def start_sampler():
+    """Start the stack sampler
+
+    JSON body: interval_ms (default 10), seconds to run (default 60),
+    all_threads (sample idle and background threads too, default false)
+    and reset (drop stacks sampled before, default true).
+    """
+    error = require_admin()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    try:
+        interval = min(max(float(data.get('interval_ms', 10)), 1.0), 1000.0) / 1000
+        seconds = max(float(data.get('seconds', 60)), 1.0)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    if data.get('reset', True):
+        profiler.sampler.reset()
+    profiler.sampler.start(interval, seconds, all_threads=bool(data.get('all_threads', False)))
+    return jsonify({'success': True, **profiler.sampler.get_stats()})
+
+@app.route('/api/admin/profiling/sampler/stop', methods=['POST'])
+def stop_sampler():
+    """Stop the stack sampler; its stacks stay readable from /flamegraph"""
+    error = require_admin()
+    if error:
+        return error
+
+    profiler.sampler.stop()
+    return jsonify({'success': True, **profiler.sampler.get_stats()})
+
+@app.route('/api/admin/profiling/flamegraph', methods=['GET'])
+def get_flamegraph():
+    """Sampled stacks in collapsed format for flamegraph.pl or speedscope
+
+    ``?route=/api/map/summary`` keeps one route's stacks, ``?reset=1``
+    clears the stacks once read.
+    """
+    error = require_admin()
+    if error:
+        return error
+
+    response = make_response(profiler.sampler.collapsed(request.args.get('route')))
+    if request.args.get('reset') in ('1', 'true'):
+        profiler.sampler.reset()
+    response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+    return response
+
 @app.route('/')
 def home():
     """API information endpoint"""
-    stats = detector.get_stats()
+    stats = detector_stats()
     
     return jsonify({
         'message': 'Pothole Detection API',
@@ -1108,6 +1881,7 @@ def home():
         'map_service_loaded': MAP_SERVICE_LOADED,
         'endpoints': {
             'health': '/api/health (GET)',
+            'metrics': '/api/metrics (GET)',
             'detect': '/api/detect (POST)',
             'detect_url': '/api/detect/url (POST)',
             'auth_register': '/api/auth/register (POST)',
@@ -1120,7 +1894,15 @@ def home():
             'model_info': '/api/model/info (GET)',
             'map_potholes': '/api/map/potholes (GET)',
             'map_statistics': '/api/map/statistics (GET)',
-            'generate_report': '/api/generate-report (POST)'
+            'generate_report': '/api/generate-report (POST)',
+            'reports': '/api/reports (POST), /api/reports/<id> (GET), /api/reports/<id>/pdf (GET)',
+            'area_reports': '/api/reports/area (POST, admin)',
+            'export': '/api/export (GET, admin)',
+            'images': '/api/images/<digest>/<original|preview|thumbnail> (GET)',
+            'admin_images_gc': '/api/admin/images/gc (POST)',
+            'admin_profiling': '/api/admin/profiling (GET), /capture (POST), /captures/<id> (GET), '
+                               '/sampler/start (POST), /sampler/stop (POST), /flamegraph (GET)',
+            'admin_severity': '/api/admin/severity (GET), /reload (POST), /rescore (POST)'
         }
     })
 
@@ -1129,6 +1911,8 @@ def home():
 # =============================================================================
 
 if __name__ == '__main__':
+    create_app()
+    
     print("🚀 Starting Pothole Detection API v2.0...")
     print("📡 Server: http://localhost:5000")
     print("🔗 Health: http://localhost:5000/api/health")
@@ -1139,6 +1923,9 @@ if __name__ == '__main__':
     else:
         print("⚠️  Using mock detection mode")
     
+    if inference_pool:
+        print(f"✅ Inference pool running with {inference_pool.num_workers} workers")
+    
     if MAP_SERVICE_LOADED:
         print("✅ Map service loaded successfully!")
     else:
@@ -1160,5 +1947,7 @@ if __name__ == '__main__':
     print("   test@test.com / test123")
     print("   admin@example.com / admin123")
     
+    print("\n🏭 Production: gunicorn -c gunicorn.conf.py wsgi:application")
+    
     # Disable debug mode and auto-reload to prevent restart on file uploads
     app.run(debug=False, use_reloader=False, host='0.0.0.0', port=5000)
\ No newline at end of file
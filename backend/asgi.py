@@ -0,0 +1,14 @@
+"""ASGI entry point for production serving.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+uvicorn starts every worker from scratch, so each one builds its own detector
+and inference pool. Prefer gunicorn (see gunicorn.conf.py) when the model is
+large and memory matters.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+application = WsgiToAsgi(create_app())
@@ -17,6 +17,9 @@ pothole_ids = [row[0] for row in cur.fetchall()]
 placeholders = ','.join('?' * len(pothole_ids))
 cur.execute(f"UPDATE potholes SET user_id = ? WHERE id IN ({placeholders})", [demo_user_id] + pothole_ids)
 updated = cur.rowcount
+# Per-user history and stats are read from the report attribution
+cur.execute(f"UPDATE pothole_reports SET user_id = ? WHERE pothole_id IN ({placeholders})",
+            [demo_user_id] + pothole_ids)
 print(f"✅ Updated {updated} potholes to demo user")
 
 # Verify
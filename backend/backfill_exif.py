@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Backfill pothole coordinates from the Exif GPS of stored original photos.
+
+Rows saved before /api/detect read Exif carry the New York coordinate it
+used to fill in for uploads without a location. Each such row's original
+is read from the image store, or looked up by file name in the image
+directory for rows saved before the store existed, and when the photo has
+a GPS fix the row is moved there. Only the Exif block of each file is read.
+
+    python backfill_exif.py --images uploads --dry-run
+    python backfill_exif.py --images /srv/originals --delete-unlocated
+
+Restart the server (or wait for its caches to expire) to see the new positions.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from services.exif_backfill import DEFAULT_BATCH_SIZE, backfill_locations
+from services.image_store import IMAGE_STORE_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='pothole_data.db', help='SQLite database file')
+    parser.add_argument('--images', default='uploads', help='directory holding older original photos')
+    parser.add_argument('--store', default=IMAGE_STORE_DIR, help='image store directory')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='also replace coordinates of rows not at the old default')
+    parser.add_argument('--delete-unlocated', action='store_true',
+                        help='delete default-location rows whose photo has no GPS fix')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rows read per query')
+    parser.add_argument('--dry-run', action='store_true', help='report only, write nothing')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ Database not found: {args.db}")
+    if not os.path.isdir(args.images) and not os.path.isdir(args.store):
+        sys.exit(f"❌ Neither {args.images} nor {args.store} is a directory")
+
+    report = backfill_locations(args.db, args.images, overwrite=args.overwrite,
+                                delete_unlocated=args.delete_unlocated, dry_run=args.dry_run,
+                                batch_size=args.batch_size, store_dir=args.store)
+    summary = report.as_dict()
+    action = 'Would relocate' if args.dry_run else 'Relocated'
+    print(f"✅ {action} {summary['updated']:,} of {summary['scanned']:,} rows in {summary['seconds']}s")
+    if summary['missing_file'] or summary['no_gps']:
+        print(f"⚠️  No GPS fix: {json.dumps({k: summary[k] for k in ('missing_file', 'no_gps')})}")
+    if summary['unlocated']:
+        print(f"⚠️  {summary['unlocated']:,} rows remain at the old default location "
+              f"(--delete-unlocated removes them)")
+    if summary['deleted']:
+        print(f"🗑️  {'Would delete' if args.dry_run else 'Deleted'} {summary['deleted']:,} unlocated rows")
+
+
+if __name__ == '__main__':
+    main()
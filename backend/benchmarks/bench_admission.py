@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Admission control benchmark: a detection-like pipeline driven at twice
+its capacity, with and without services/admission.py in front.
+
+Each request needs --service-ms of exclusive work on one of --capacity
+workers and its client gives up after --timeout-ms. Without admission
+control every request queues, so latency grows without bound and the
+server spends work on answers nobody waits for. With it, excess requests
+are refused at once and admitted ones stay within their deadline.
+
+    python benchmarks/bench_admission.py
+    python benchmarks/bench_admission.py --requests 400 --overload 3
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.admission import AdmissionController, AdmissionRejected, check_deadline
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(args, controller):
+    workers = threading.BoundedSemaphore(args.capacity)
+    service = args.service_ms / 1000
+    results = []
+    lock = threading.Lock()
+
+    def request(index):
+        arrived = time.time()
+        deadline = arrived + args.timeout_ms / 1000
+        outcome = 'served'
+        try:
+            ticket = controller.admit(f'client-{index % 50}', deadline) if controller else nullcontext()
+            with ticket, workers:
+                if controller:
+                    check_deadline(deadline, 'inference')
+                time.sleep(service)
+            if time.time() > deadline:
+                outcome = 'late'
+        except AdmissionRejected as e:
+            outcome = e.reason
+        with lock:
+            results.append((outcome, time.time() - arrived))
+
+    interval = service / args.capacity / args.overload
+    threads = []
+    start = time.perf_counter()
+    for index in range(args.requests):
+        thread = threading.Thread(target=request, args=(index,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(max(0.0, start + (index + 1) * interval - time.perf_counter()))
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(name, results):
+    served = [latency for outcome, latency in results if outcome == 'served']
+    late = sum(1 for outcome, _ in results if outcome == 'late')
+    refused = [latency for outcome, latency in results if outcome not in ('served', 'late')]
+    print(f"   {name:<20} {len(served):>6} {late:>6} {len(refused):>8} "
+          f"{percentile(served, 0.5) * 1e3:>8.0f} {percentile(served, 0.99) * 1e3:>8.0f} "
+          f"{percentile(refused, 0.99) * 1e3:>11.0f}")
+    return served, late
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--capacity', type=int, default=4, help='requests processed at once')
+    parser.add_argument('--service-ms', type=float, default=50)
+    parser.add_argument('--timeout-ms', type=float, default=1000, help='client deadline')
+    parser.add_argument('--overload', type=float, default=2, help='arrival rate / capacity')
+    args = parser.parse_args()
+
+    print(f"🚀 Admission benchmark ({args.requests} requests at {args.overload:g}x capacity, "
+          f"{args.service_ms:g} ms each, {args.timeout_ms:g} ms client timeout)\n")
+    print(f"   {'':<20} {'in time':>6} {'late':>6} {'refused':>8} {'p50 ms':>8} {'p99 ms':>8} {'refuse p99':>11}")
+
+    _, late_without = report('no admission', run(args, None))
+    controller = AdmissionController(max_in_flight=args.capacity * 2, queue_wait=args.service_ms / 1000 * 2,
+                                     rate=0)
+    served, late_with = report('admission control', run(args, controller))
+
+    if late_with > late_without or not served or percentile(served, 0.99) * 1e3 > args.timeout_ms:
+        sys.exit("❌ Admission control did not bound latency")
+    print("\n✅ Admission benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Area report benchmark: render time and peak memory for a citywide report.
+
+Fills a temporary database with potholes spread over a month, then renders
+the area report (summary, per-day tables, worst potholes and every pothole
+in paginated detail tables).
+
+    python benchmarks/bench_area_report.py
+    python benchmarks/bench_area_report.py --potholes 100000 --keep report.pdf
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.migrations import run_migrations
+from services.exporter import ExportFilters
+from services.pdf_generator import PDFReportGenerator
+
+
+def fill_database(path, count, seed=0):
+    run_migrations(path)
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        reported = f'2025-06-{1 + i % 30:02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00'
+        rows.append((f'user{rng.randrange(200)}', 40.7 + rng.uniform(-0.1, 0.1), -74.0 + rng.uniform(-0.1, 0.1),
+                     round(rng.uniform(0.25, 1.0), 4), round(rng.uniform(100, 9000), 2), reported,
+                     rng.choice(('low', 'medium', 'high')), round(rng.random(), 3), rng.randint(1, 5), reported))
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO potholes (user_id, latitude, longitude, confidence, size, timestamp,
+                              severity, severity_score, report_count, last_reported)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--potholes', type=int, default=50000)
+    parser.add_argument('--keep', metavar='PDF', help='Copy the rendered report here')
+    args = parser.parse_args()
+
+    print(f"🚀 Area report benchmark ({args.potholes:,} potholes)\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'potholes.db')
+        fill_database(db_path, args.potholes)
+        filters = ExportFilters.parse(start='2025-06-01T00:00:00', end='2025-06-30T23:59:59')
+
+        start = time.perf_counter()
+        path = PDFReportGenerator(tmp).generate_area_report(db_path, filters, output_path=os.path.join(tmp, 'area.pdf'))
+        seconds = time.perf_counter() - start
+
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"   render:   {seconds:.2f} s")
+        print(f"   pdf size: {os.path.getsize(path) / 1e6:.2f} MB")
+        print(f"   peak RSS: {peak_mb:.1f} MB")
+        if args.keep:
+            shutil.copy(path, args.keep)
+            print(f"   saved to {args.keep}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+detection_data storage benchmark: JSON text vs the compact codec.
+
+Builds a potholes table of typical detection rows once per encoding and
+reports bytes per value, database file size and encode/decode time.
+
+    python benchmarks/bench_detection_storage.py
+    python benchmarks/bench_detection_storage.py --rows 200000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.detection_codec import decode_detection, encode_detection
+from services.severity import DEFAULT_CONFIG
+
+
+def make_rows(count, seed=0):
+    """(row columns, detection dict) pairs shaped like /api/detect output"""
+    rng = random.Random(seed)
+    descriptions = DEFAULT_CONFIG['descriptions']
+    rows = []
+    for i in range(count):
+        level = rng.choice(('low', 'medium', 'high'))
+        w, h = round(rng.uniform(10, 300), 2), round(rng.uniform(10, 300), 2)
+        confidence = round(rng.uniform(0.25, 1.0), 4)
+        row = {
+            'latitude': 40.7 + rng.uniform(-0.1, 0.1),
+            'longitude': -74.0 + rng.uniform(-0.1, 0.1),
+            'confidence': confidence,
+            'size': round(w * h, 2),
+            'timestamp': f'2025-06-01T12:{i % 60:02d}:00',
+            'user_id': f'{rng.getrandbits(128):032x}'
+        }
+        detection = {
+            'bbox': [round(rng.uniform(0, 1600), 2), round(rng.uniform(0, 900), 2), w, h],
+            'confidence': confidence,
+            'class_id': 0,
+            'area': row['size'],
+            'severity': {'level': level, 'score': round(rng.random(), 3), 'description': descriptions[level]},
+            'class': 'pothole',
+            'class_name': 'pothole',
+            'location': {'latitude': row['latitude'], 'longitude': row['longitude']},
+            'timestamp': row['timestamp'],
+            'user_id': row['user_id']
+        }
+        rows.append((row, detection))
+    return rows
+
+
+def build_database(path, rows, encode):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE potholes (
+            id INTEGER PRIMARY KEY, user_id TEXT, latitude REAL, longitude REAL,
+            confidence REAL, size REAL, timestamp TEXT, detection_data TEXT
+        )
+    ''')
+    start = time.perf_counter()
+    values = [(row['user_id'], row['latitude'], row['longitude'], row['confidence'], row['size'],
+               row['timestamp'], encode(detection, row)) for row, detection in rows]
+    encode_seconds = time.perf_counter() - start
+    conn.executemany('INSERT INTO potholes (user_id, latitude, longitude, confidence, size, timestamp, detection_data) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', values)
+    conn.commit()
+    value_bytes = conn.execute('SELECT SUM(length(CAST(detection_data AS BLOB))) FROM potholes').fetchone()[0]
+    conn.close()
+    return encode_seconds, value_bytes, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    descriptions = DEFAULT_CONFIG['descriptions']
+    encodings = {
+        'json': (lambda detection, row: json.dumps(detection), lambda value, row: json.loads(value)),
+        'packed': (lambda detection, row: encode_detection(detection, row, compression='none'),
+                   lambda value, row: decode_detection(value, row, descriptions)),
+        'packed+zstd': (lambda detection, row: encode_detection(detection, row, compression='zstd'),
+                        lambda value, row: decode_detection(value, row, descriptions))
+    }
+
+    print(f"🚀 detection_data storage benchmark ({args.rows:,} rows)\n")
+    print(f"{'encoding':>12} {'bytes/row':>10} {'db MB':>8} {'encode us':>10} {'decode us':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (encode, decode) in encodings.items():
+            encode_seconds, value_bytes, db_bytes = build_database(os.path.join(tmp, f'{name}.db'), rows, encode)
+            encoded = [(encode(detection, row), row) for row, detection in rows[:5000]]
+            start = time.perf_counter()
+            for value, row in encoded:
+                decode(value, row)
+            decode_us = (time.perf_counter() - start) / len(encoded) * 1e6
+            print(f"{name:>12} {value_bytes / args.rows:>10.1f} {db_bytes / 1e6:>8.2f} "
+                  f"{encode_seconds / args.rows * 1e6:>10.2f} {decode_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Exif benchmark: GPS and capture time from a photo's APP1 segment vs PIL.
+
+Encodes a phone-sized JPEG with a GPS fix and capture time, then times
+utils/exif.py (APP1 segment only) against PIL's Image.open + getexif.
+Also checks southern/western fixes, big-endian Exif, a 0,0 fix and
+photos without Exif.
+
+    python benchmarks/bench_exif.py
+    python benchmarks/bench_exif.py --runs 5000
+"""
+
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils.exif import read_photo_metadata
+
+
+def dms(value):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60, 4)
+    return (degrees, minutes, seconds)
+
+
+def make_photo(latitude, longitude, width=4032, height=3024, big_endian=False):
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    pixels = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    image = Image.fromarray(pixels[:, :, ::-1])
+
+    exif = Image.Exif()
+    exif.endian = '>' if big_endian else '<'
+    exif[0x010F] = 'BenchCam'
+    exif[0x0132] = '2025:06:01 09:00:00'
+    exif.get_ifd(0x8769).update({0x9003: '2025:06:01 08:15:30', 0x9011: '-04:00'})
+    if latitude is not None:
+        exif.get_ifd(0x8825).update({
+            1: 'N' if latitude >= 0 else 'S', 2: dms(latitude),
+            3: 'E' if longitude >= 0 else 'W', 4: dms(longitude),
+        })
+    out = BytesIO()
+    image.save(out, 'JPEG', quality=90, exif=exif)
+    return out.getvalue()
+
+
+def pil_metadata(data):
+    with Image.open(BytesIO(data)) as image:
+        exif = image.getexif()
+        gps = exif.get_ifd(0x8825)
+        captured = exif.get_ifd(0x8769).get(0x9003)
+        return gps, captured
+
+
+def timed(func, data, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func(data)
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    data = make_photo(40.689247, -74.044502)
+    print(f"🚀 Exif benchmark (4032x3024 JPEG, {len(data) / 1e6:.1f} MB)\n")
+
+    metadata = read_photo_metadata(data)
+    expected_time = datetime(2025, 6, 1, 8, 15, 30, tzinfo=timezone(timedelta(hours=-4)))
+    if (abs(metadata.get('latitude', 0) - 40.689247) > 1e-5 or abs(metadata.get('longitude', 0) + 74.044502) > 1e-5
+            or metadata.get('captured_at') != expected_time):
+        sys.exit(f"❌ Wrong metadata: {metadata}")
+    print(f"   read: {metadata['latitude']}, {metadata['longitude']} at {metadata['captured_at'].isoformat()}")
+
+    ours = timed(read_photo_metadata, data, args.runs)
+    pil = timed(pil_metadata, data, max(args.runs // 10, 1))
+    print(f"   APP1 parser:        {ours * 1e6:8.1f} µs")
+    print(f"   PIL open + getexif: {pil * 1e6:8.1f} µs  ({pil / ours:.0f}x slower)")
+
+    cases = (
+        ('south/east, big-endian', make_photo(-33.856784, 151.215297, 640, 480, big_endian=True), -33.856784),
+        ('0,0 fix', make_photo(0.0, 0.0, 640, 480), None),
+        ('no GPS', make_photo(None, None, 640, 480), None),
+        ('no Exif', cv2.imencode('.jpg', np.zeros((480, 640, 3), np.uint8))[1].tobytes(), None),
+        ('PNG', cv2.imencode('.png', np.zeros((48, 64, 3), np.uint8))[1].tobytes(), None),
+        ('truncated Exif', data[:60], None),
+    )
+    for name, photo, latitude in cases:
+        result = read_photo_metadata(photo)
+        got = result.get('latitude')
+        if (got is None) != (latitude is None) or (latitude is not None and abs(got - latitude) > 1e-5):
+            sys.exit(f"❌ {name}: {result}")
+        print(f"   {name:<24} {'lat ' + str(got) if got is not None else 'no location'}")
+
+    print("\n✅ Exif benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+GeoIP lookup benchmark: builds a synthetic range table and times uncached
+and cached lookups through GeoIPLocator.
+
+    python benchmarks/bench_geoip.py
+    python benchmarks/bench_geoip.py --ranges 3000000 --lookups 100000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import ipaddress
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.geoip import GeoIPLocator, write_database
+
+
+def synthetic_ranges(count, seed=0):
+    """Contiguous IPv4 ranges covering the public address space"""
+    rng = random.Random(seed)
+    step = (2 ** 32) // count
+    for i in range(count):
+        first = i * step
+        yield (ipaddress.IPv4Address(first), ipaddress.IPv4Address(first + step - 1),
+               rng.uniform(-60, 70), rng.uniform(-180, 180), f'City {i % 5000}', 'US')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ranges', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"🚀 GeoIP benchmark ({args.ranges:,} ranges, {args.lookups:,} lookups)\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'geoip.bin')
+        start = time.perf_counter()
+        write_database(synthetic_ranges(args.ranges), path)
+        print(f"   build:    {time.perf_counter() - start:.2f} s, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        rng = random.Random(1)
+        ips = []
+        while len(ips) < args.lookups:
+            address = ipaddress.IPv4Address(rng.getrandbits(32))
+            if address.is_global:
+                ips.append(str(address))
+
+        start = time.perf_counter()
+        locator = GeoIPLocator(path, cache_size=0, remote_url='')
+        print(f"   open:     {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        start = time.perf_counter()
+        found = sum(1 for ip in ips if locator.lookup(ip))
+        uncached = (time.perf_counter() - start) / len(ips)
+        print(f"   uncached: {uncached * 1e6:.1f} us/lookup ({found:,} located)")
+
+        locator = GeoIPLocator(path, cache_size=len(ips), remote_url='')
+        for ip in ips:
+            locator.lookup(ip)
+        start = time.perf_counter()
+        for ip in ips:
+            locator.lookup(ip)
+        print(f"   cached:   {(time.perf_counter() - start) / len(ips) * 1e6:.1f} us/lookup")
+
+    if uncached > 1e-3:
+        sys.exit("❌ Uncached lookups are slower than 1 ms")
+    print("\n✅ GeoIP benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
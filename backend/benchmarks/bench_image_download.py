@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Image downloader benchmark against a local HTTP stand-in.
+
+Serves generated JPEGs (with a simulated per-request latency) from a
+thread-per-request server on localhost and compares one-off requests.get
+calls with the pooled ImageDownloader, sequentially and with fetch_many.
+Also checks that non-images and oversized bodies, with and without a
+Content-Length, are rejected before being buffered whole.
+
+    python benchmarks/bench_image_download.py
+    python benchmarks/bench_image_download.py --images 200 --latency-ms 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import requests
+
+from services.image_downloader import DownloadError, ImageDownloader
+
+MAX_BYTES = 1024 * 1024
+
+
+def make_jpeg(width=1280, height=720, seed=0):
+    rng = np.random.default_rng(seed)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    jpeg = b''
+    latency = 0.0
+    streamed = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type, length=True):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if length:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except OSError:
+                pass
+        else:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            sent = 0
+            try:
+                for start in range(0, len(body), 64 * 1024):
+                    chunk = body[start:start + 64 * 1024]
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                    sent += len(chunk)
+                self.wfile.write(b'0\r\n\r\n')
+            except OSError:
+                pass
+            StandIn.streamed[self.path] = sent
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith('/img/'):
+            self._send(self.jpeg, 'image/jpeg')
+        elif self.path == '/page.jpg':
+            self._send(b'<html></html>', 'text/html')
+        elif self.path == '/huge.jpg':
+            self._send(b'\0' * (8 * MAX_BYTES), 'image/jpeg')
+        elif self.path == '/huge-chunked.jpg':
+            self._send(b'\0' * (64 * MAX_BYTES), 'image/jpeg', length=False)
+        else:
+            self.send_error(404)
+
+
+def expect_rejected(downloader, url, reason):
+    try:
+        downloader.fetch(url)
+    except DownloadError as e:
+        if e.reason != reason:
+            sys.exit(f"❌ {url}: rejected as {e.reason}, expected {reason}")
+        return
+    sys.exit(f"❌ {url} was not rejected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    StandIn.jpeg = make_jpeg()
+    StandIn.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    urls = [f'{base}/img/{i}.jpg' for i in range(args.images)]
+
+    print(f"🚀 Image download benchmark ({args.images} x {len(StandIn.jpeg) / 1024:.0f} KB, "
+          f"{args.latency_ms:.0f} ms latency)\n")
+
+    start = time.perf_counter()
+    for url in urls:
+        requests.get(url, timeout=30).content
+    print(f"   requests.get per URL:   {time.perf_counter() - start:.2f} s")
+
+    downloader = ImageDownloader(max_bytes=MAX_BYTES, workers=args.workers)
+    start = time.perf_counter()
+    for url in urls:
+        downloader.fetch(url)
+    print(f"   pooled, sequential:     {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    fetched = [image for _, image, error in downloader.fetch_many(urls, decode=True) if error is None]
+    print(f"   fetch_many + decode:    {time.perf_counter() - start:.2f} s ({args.workers} workers)")
+    if len(fetched) != len(urls) or fetched[0].shape != (720, 1280, 3):
+        sys.exit("❌ fetch_many did not return every decoded image")
+
+    expect_rejected(downloader, f'{base}/page.jpg', 'not_image')
+    expect_rejected(downloader, f'{base}/huge.jpg', 'too_large')
+    expect_rejected(downloader, f'{base}/huge-chunked.jpg', 'too_large')
+    expect_rejected(downloader, f'{base}/missing.jpg', 'error')
+    time.sleep(0.2)
+    streamed = StandIn.streamed.get('/huge-chunked.jpg', 0)
+    print(f"   chunked 64 MB body cut off after {streamed / 1e6:.1f} MB sent")
+    downloader.close()
+    server.shutdown()
+
+    print("\n✅ Image download benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Image store benchmark: cost of storing an upload (with its renditions) vs
+a deduplicated repeat, bytes saved by serving renditions, and garbage
+collection of unreferenced images.
+
+Works on a throwaway database and store directory.
+
+    python benchmarks/bench_image_store.py
+    python benchmarks/bench_image_store.py --images 200 --width 4032 --height 3024
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from services.image_store import ImageStore
+from services.migrations import run_migrations
+
+
+def make_photo(width, height, seed):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_image_store_')
+    try:
+        db_path = os.path.join(workdir, 'bench.db')
+        run_migrations(db_path)
+        store = ImageStore(db_path, root=os.path.join(workdir, 'images'))
+        photos = [make_photo(args.width, args.height, seed) for seed in range(args.images)]
+        print(f"🚀 Image store benchmark ({args.images} x {args.width}x{args.height} JPEG, "
+              f"{sum(map(len, photos)) / len(photos) / 1e6:.1f} MB each)\n")
+
+        start = time.perf_counter()
+        stored = [store.put(photo) for photo in photos]
+        first = (time.perf_counter() - start) / len(photos)
+        start = time.perf_counter()
+        repeats = [store.put(photo) for photo in photos]
+        repeat = (time.perf_counter() - start) / len(photos)
+        if any(s.digest != r.digest or r.created for s, r in zip(stored, repeats)):
+            sys.exit("❌ Repeat uploads were stored again")
+        print(f"   first upload:    {first * 1e3:8.1f} ms  (original + preview + thumbnail)")
+        print(f"   repeat upload:   {repeat * 1e3:8.2f} ms  (deduplicated)")
+
+        sizes = {rendition: os.path.getsize(store.path_for(stored[0].digest, rendition))
+                 for rendition in ('original', 'preview', 'thumbnail')}
+        for rendition, size in sizes.items():
+            print(f"   {rendition + ':':<16} {size / 1024:8.0f} KB  ({sizes['original'] / size:.0f}x smaller)")
+
+        # Reference half the images, then collect the rest
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO users (user_id, email, username, password_hash, salt) "
+                     "VALUES ('bench', 'bench@example.com', 'bench', '', '')")
+        conn.executemany('''
+            INSERT INTO potholes (user_id, latitude, longitude, severity, confidence, size, image_digest)
+            VALUES ('bench', 0, 0, 'low', 0.5, 1, ?)
+        ''', [(s.digest,) for s in stored[::2]])
+        conn.commit()
+        start = time.perf_counter()
+        removed = store.collect_garbage(grace_seconds=0)
+        gc_ms = (time.perf_counter() - start) * 1e3
+        kept = len(stored[::2])
+        if removed != len(stored) - kept or any(not os.path.exists(store.path_for(s.digest)) for s in stored[::2]):
+            sys.exit(f"❌ Garbage collection removed {removed} images, expected {len(stored) - kept}")
+        print(f"   gc:              {gc_ms:8.1f} ms  ({removed} unreferenced removed, {kept} kept)")
+
+        conn.execute('DELETE FROM potholes')
+        conn.commit()
+        conn.close()
+        if store.collect_garbage(grace_seconds=0) != kept or store.get_stats()['images']:
+            sys.exit("❌ Deleting the potholes did not release their images")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n✅ Image store benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Image ingest benchmark: full decode vs decode at model resolution.
+
+Encodes a large synthetic phone photo (40 MP by default), then compares
+cv2.imdecode at full size with the ingest stage (header probe plus
+reduced decode), by time and peak memory. Also checks that a crafted
+decompression bomb is refused from its header alone.
+
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --width 4032 --height 3024
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from utils.image_ingest import decode_for_model, probe_image
+from utils.upload_stream import UploadTooLarge
+
+
+def make_photo(width, height):
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def png_bomb(width, height):
+    """A tiny PNG whose header claims width x height pixels"""
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b'\0' * 1024)) + chunk(b'IEND', b''))
+
+
+def measure(func, runs=3):
+    best = None
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = min(best or (seconds, peak), (seconds, peak))
+        del result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=7296)
+    parser.add_argument('--height', type=int, default=5472)
+    args = parser.parse_args()
+
+    data = make_photo(args.width, args.height)
+    print(f"🚀 Ingest benchmark ({args.width}x{args.height} JPEG, {len(data) / 1e6:.1f} MB)\n")
+
+    info = probe_image(data)
+    probe_seconds, _ = measure(lambda: probe_image(data), runs=20)
+    image, _ = decode_for_model(data, info)
+    print(f"   probe:          {probe_seconds * 1e3:8.2f} ms  ({info.format}, {info.width}x{info.height})")
+
+    full_seconds, full_peak = measure(lambda: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+    print(f"   full decode:    {full_seconds * 1e3:8.1f} ms  {full_peak / 1e6:7.1f} MB peak")
+    model_seconds, model_peak = measure(lambda: decode_for_model(data, info))
+    print(f"   model decode:   {model_seconds * 1e3:8.1f} ms  {model_peak / 1e6:7.1f} MB peak  "
+          f"({image.shape[1]}x{image.shape[0]})")
+    print(f"   speedup:        {full_seconds / model_seconds:8.1f}x time, {full_peak / max(model_peak, 1):.1f}x memory")
+
+    for width, height in ((12000, 10000), (30000, 30000)):
+        start = time.perf_counter()
+        try:
+            probe_image(png_bomb(width, height))
+            sys.exit(f"❌ {width}x{height} PNG bomb was accepted")
+        except UploadTooLarge as e:
+            print(f"   {width}x{height} PNG bomb refused in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    print("\n✅ Ingest benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Preprocessing benchmark: batched letterbox vs the old per-image function.
+
+Feeds the same set of randomly sized BGR images through the previous
+PIL resize + float64 ``/ 255.0`` path (one image at a time) and through
+``preprocess_images_for_model`` (one float32 NCHW batch), reporting latency
+and the memory each call allocates as traced by tracemalloc.
+
+    python benchmarks/bench_preprocessing.py
+    python benchmarks/bench_preprocessing.py --batch 16 --size 640
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.image_processing import preprocess_images_for_model
+
+
+def legacy_preprocess(image, target_size):
+    """The previous implementation, kept here as the baseline"""
+    img = Image.fromarray(image[:, :, ::-1])
+    img_resized = img.resize(target_size)
+    img_array = np.array(img_resized) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def legacy_batch(images, target_size):
+    return [legacy_preprocess(image, target_size) for image in images]
+
+
+def make_images(count, seed=0):
+    rng = np.random.default_rng(seed)
+    shapes = [(480, 640), (720, 1280), (1080, 1920), (1200, 1600), (640, 480)]
+    return [rng.integers(0, 256, size=shapes[i % len(shapes)] + (3,), dtype=np.uint8)
+            for i in range(count)]
+
+
+def time_calls(func, runs):
+    func()  # warm up buffers and caches
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def traced_allocation(func):
+    """Peak bytes allocated during one warmed-up call"""
+    func()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', type=int, default=8, help='images per batch')
+    parser.add_argument('--size', type=int, default=640, help='square model input size')
+    parser.add_argument('--runs', type=int, default=10, help='timed runs per implementation')
+    args = parser.parse_args()
+
+    target_size = (args.size, args.size)
+    images = make_images(args.batch)
+
+    def run_legacy():
+        return legacy_batch(images, target_size)
+
+    def run_batched():
+        return preprocess_images_for_model(images, target_size)
+
+    print(f"🚀 Preprocessing benchmark ({args.batch} images -> {args.size}x{args.size}, {args.runs} runs)")
+
+    rows = []
+    for name, func in (('legacy (PIL, float64)', run_legacy), ('batched (letterbox, float32)', run_batched)):
+        seconds = time_calls(func, args.runs)
+        allocated = traced_allocation(func)
+        rows.append((name, seconds, allocated))
+
+    print(f"\n{'implementation':<30} {'ms/batch':>10} {'img/s':>8} {'MB allocated':>13}")
+    for name, seconds, allocated in rows:
+        print(f"{name:<30} {seconds * 1000:>10.1f} {args.batch / seconds:>8.1f} "
+              f"{allocated / (1024 * 1024):>13.1f}")
+
+    (_, legacy_s, legacy_bytes), (_, batched_s, batched_bytes) = rows
+    print(f"\n⏱️  Speedup: {legacy_s / batched_s:.2f}x")
+    print(f"💾 Allocation: {legacy_bytes / max(batched_bytes, 1):.1f}x less with the reused buffer")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Request profiling overhead benchmark (services/profiling.py).
+
+Serves /api/test and /api/map/summary through the Flask test client with
+profiling disabled, with the stack sampler running and with every request
+captured by cProfile and tracemalloc, and reports the cost of each per
+request. It also times the profiling hooks on their own while disabled,
+which is all an unprofiled request pays.
+
+    python benchmarks/bench_profiling.py
+    python benchmarks/bench_profiling.py --requests 2000 --potholes 5000
+"""
+
+import os
+import sys
+import time
+import random
+import timeit
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_TOKEN = 'bench-profiling'
+
+
+def seed_potholes(db_path, count, seed=0):
+    import sqlite3
+
+    from services.spatial_index import grid_cell
+
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        latitude, longitude = 40.7 + rng.uniform(-0.1, 0.1), -74.0 + rng.uniform(-0.1, 0.1)
+        rows.append((f'user{rng.randrange(200)}', latitude, longitude, grid_cell(latitude, longitude),
+                     round(rng.uniform(0.25, 1.0), 4), round(rng.uniform(100, 9000), 2),
+                     rng.choice(('low', 'medium', 'high')), round(rng.random(), 3)))
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO potholes (user_id, latitude, longitude, grid_cell, confidence, size, severity, severity_score)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def time_requests(client, path, requests, headers=None):
+    client.get(path, headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per route and mode')
+    parser.add_argument('--potholes', type=int, default=2000, help='Potholes stored for /api/map/summary')
+    parser.add_argument('--interval-ms', type=float, default=10, help='Sampler interval')
+    args = parser.parse_args()
+
+    os.environ['ADMIN_TOKEN'] = ADMIN_TOKEN
+    workdir = tempfile.mkdtemp(prefix='bench_profiling_')
+    os.chdir(workdir)
+
+    import app as appmod
+
+    flask_app = appmod.create_app(start_pool=False, preload_model=False)
+    seed_potholes(appmod.map_service.db_path, args.potholes)
+    client = flask_app.test_client()
+    profiler = appmod.profiler
+
+    print(f"🔬 Profiling overhead: {args.requests} requests per route and mode, "
+          f"{args.potholes} potholes stored")
+
+    def hooks():
+        appmod.start_profiling()
+        appmod.finish_profiling(response)
+        appmod.end_profiling()
+
+    with flask_app.test_request_context('/api/map/summary'):
+        response = flask_app.response_class()
+        calls = 100000
+        hook_seconds = timeit.timeit(hooks, number=calls) / calls
+    print(f"\n   Disabled hooks: {hook_seconds * 1e9:.0f} ns per request")
+
+    admin = {'X-Admin-Token': ADMIN_TOKEN}
+    modes = [
+        ('disabled', None, None),
+        ('sampler', None, 'sampler'),
+        ('cpu capture', {**admin, 'X-Profile': 'cpu'}, None),
+        ('cpu+memory capture', {**admin, 'X-Profile': 'cpu,memory'}, None),
+    ]
+
+    print(f"\n   {'route':<18} {'mode':<20} {'µs/request':>11} {'overhead':>9}")
+    for path in ('/api/test', '/api/map/summary'):
+        baseline = None
+        for name, headers, extra in modes:
+            if extra == 'sampler':
+                profiler.sampler.reset()
+                profiler.sampler.start(args.interval_ms / 1000, seconds=600)
+            try:
+                seconds = time_requests(client, path, args.requests, headers)
+            finally:
+                if extra == 'sampler':
+                    profiler.sampler.stop()
+            baseline = baseline or seconds
+            print(f"   {path:<18} {name:<20} {seconds * 1e6:>11.0f} {(seconds / baseline - 1) * 100:>8.1f}%")
+
+    stats = profiler.sampler.get_stats()
+    print(f"\n   Sampler: {stats['samples']} samples in {stats['stacks']} stacks, "
+          f"{stats['sampling_seconds'] * 1000:.1f} ms spent sampling")
+    print(f"   Captures kept: {len(profiler.captures)}")
+    print("✅ Done")
+
+
+if __name__ == '__main__':
+    main()
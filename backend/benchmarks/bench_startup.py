@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Startup time and memory benchmark for the backend.
+
+Imports the app in a fresh interpreter under ``python -X importtime`` and
+reports wall time, the slowest imports and resident memory. In the default
+map/auth-only mode (PRELOAD_MODEL=0) it fails if any heavy dependency was
+imported, which guards the lazy-loading of torch, cv2, PIL and friends.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --preload --runs 3
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a process that only serves map/auth endpoints must never load
+HEAVY_MODULES = ['torch', 'ultralytics', 'cv2', 'PIL', 'numpy', 'reportlab', 'requests', 'onnxruntime']
+
+CHILD_SCRIPT = r'''
+import sys, json, time
+start = time.perf_counter()
+import app
+app.create_app(preload_model=%(preload)r)
+elapsed = time.perf_counter() - start
+
+rss = None
+try:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1]) * 1024
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+heavy = [m for m in %(heavy)r if m in sys.modules]
+print(json.dumps({'seconds': elapsed, 'rss': rss, 'heavy_modules': heavy}))
+'''
+
+
+def parse_importtime(stderr, top):
+    """Return the ``top`` slowest imports as (cumulative_us, module) pairs"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, cumulative_us, name = line.split('|', 2)
+            rows.append((int(cumulative_us), name.rstrip()))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def run_once(preload):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env['PRELOAD_MODEL'] = '1' if preload else '0'
+    env.setdefault('LOG_LEVEL', 'WARNING')
+
+    # Run in a scratch directory so the benchmark never touches the real database
+    with tempfile.TemporaryDirectory() as workdir:
+        script = CHILD_SCRIPT % {'preload': preload, 'heavy': HEAVY_MODULES}
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+
+    if proc.returncode != 0:
+        print(proc.stderr[-4000:])
+        raise SystemExit(f"❌ App import failed with exit code {proc.returncode}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['importtime'] = proc.stderr
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='interpreter starts to average over')
+    parser.add_argument('--preload', action='store_true', help='also load the detector (PRELOAD_MODEL=1)')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--max-seconds', type=float, help='fail if median startup exceeds this')
+    parser.add_argument('--max-rss-mb', type=float, help='fail if median RSS exceeds this')
+    args = parser.parse_args()
+
+    mode = 'preloaded detector' if args.preload else 'map/auth only'
+    print(f"🚀 Startup benchmark ({mode}, {args.runs} runs)")
+
+    results = [run_once(args.preload) for _ in range(args.runs)]
+    seconds = statistics.median(r['seconds'] for r in results)
+    rss_mb = statistics.median(r['rss'] for r in results) / (1024 * 1024)
+
+    print(f"\n⏱️  Startup: median {seconds * 1000:.1f} ms "
+          f"(min {min(r['seconds'] for r in results) * 1000:.1f} ms)")
+    print(f"💾 RSS:     median {rss_mb:.1f} MB")
+
+    print(f"\n🐢 Slowest imports (cumulative, last run):")
+    for cumulative_us, name in parse_importtime(results[-1]['importtime'], args.top):
+        print(f"   {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    heavy = results[-1]['heavy_modules']
+    if not args.preload and heavy:
+        print(f"\n❌ Heavy modules imported without a detector: {', '.join(heavy)}")
+        failed = True
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        print(f"\n❌ Startup {seconds:.3f}s exceeds limit {args.max_seconds:.3f}s")
+        failed = True
+    if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+        print(f"\n❌ RSS {rss_mb:.1f} MB exceeds limit {args.max_rss_mb:.1f} MB")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Startup benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Upload decode benchmark: peak extra memory and time to turn a base64
+upload into image bytes.
+
+Compares the old path (split the data URL, b64decode, BytesIO, getvalue)
+with the chunked decoders in utils/upload_stream.py, for a base64 string
+already in memory and for a body streamed in 64 KB reads.
+
+    python benchmarks/bench_upload_decode.py
+    python benchmarks/bench_upload_decode.py --mb 12
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.upload_stream import UploadTooLarge, decode_base64_image, read_image_body
+
+
+def old_path(text):
+    if ',' in text:
+        text = text.split(',')[1]
+    stream = io.BytesIO(base64.b64decode(text))
+    return stream.getvalue()
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=8, help='decoded image size')
+    args = parser.parse_args()
+
+    image = b'\xff\xd8\xff\xe0' + os.urandom(int(args.mb * 1024 * 1024) - 4)
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(image).decode('ascii')
+    body = data_url.encode('ascii')
+    image_mb = len(image) / 1e6
+
+    print(f"🚀 Upload decode benchmark ({image_mb:.1f} MB image, {len(data_url) / 1e6:.1f} MB base64)\n")
+    print(f"{'path':>28} {'peak MB':>9} {'x image':>8} {'ms':>8}")
+    runs = {
+        'split + b64decode + BytesIO': (old_path, data_url),
+        'decode_base64_image': (decode_base64_image, data_url),
+        'streamed text/plain body': (lambda: read_image_body(io.BytesIO(body), len(body), base64_encoded=True),),
+        'streamed image/* body': (lambda: read_image_body(io.BytesIO(image), len(image)),),
+    }
+    for name, (func, *func_args) in runs.items():
+        result, seconds, peak = measure(func, *func_args)
+        if bytes(result) != image:
+            sys.exit(f"❌ {name} decoded the wrong bytes")
+        print(f"{name:>28} {peak / 1e6:>9.1f} {peak / len(image):>8.2f} {seconds * 1e3:>8.1f}")
+
+    # Oversized and non-image uploads are refused before decoding the rest
+    small_limit = len(image) // 2
+    not_image = base64.b64encode(b'<html>' + image).decode('ascii')
+    for name, func in (
+        ('oversized string', lambda: decode_base64_image(data_url, max_bytes=small_limit)),
+        ('oversized stream', lambda: read_image_body(io.BytesIO(body), None, small_limit, base64_encoded=True)),
+        ('non-image', lambda: decode_base64_image(not_image)),
+    ):
+        start = time.perf_counter()
+        try:
+            func()
+            sys.exit(f"❌ {name} upload was accepted")
+        except (UploadTooLarge, ValueError) as e:
+            print(f"   {name} rejected in {(time.perf_counter() - start) * 1e3:.1f} ms: {e}")
+
+    print("\n✅ Upload decode benchmark passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Build the offline GeoIP table used by /api/user/location from CSV files of
+IP ranges (start_ip,end_ip or network, latitude, longitude, city, country).
+
+    python build_geoip_db.py ranges.csv
+    python build_geoip_db.py GeoLite2-City-Blocks-IPv4.csv GeoLite2-City-Blocks-IPv6.csv \\
+        --locations GeoLite2-City-Locations-en.csv -o geoip.bin
+
+Restart the server to pick up a new table.
+"""
+
+import os
+import sys
+import argparse
+import itertools
+
+from services.geoip import GEOIP_DB, read_locations, read_ranges, write_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv', nargs='+', help='CSV files of IP ranges')
+    parser.add_argument('--locations', help='GeoLite2 City locations CSV with names for geoname_id')
+    parser.add_argument('-o', '--output', default=GEOIP_DB, help=f'table file to write (default: {GEOIP_DB})')
+    args = parser.parse_args()
+
+    for path in args.csv + ([args.locations] if args.locations else []):
+        if not os.path.exists(path):
+            sys.exit(f"❌ File not found: {path}")
+
+    locations = read_locations(args.locations) if args.locations else None
+    try:
+        v4, v6, dropped = write_database(
+            itertools.chain.from_iterable(read_ranges(path, locations) for path in args.csv),
+            args.output
+        )
+    except (KeyError, ValueError) as e:
+        sys.exit(f"❌ Bad range data: {e}")
+
+    print(f"✅ Wrote {args.output}: {v4:,} IPv4 and {v6:,} IPv6 ranges "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+    if dropped:
+        print(f"⚠️  Dropped {dropped:,} overlapping ranges")
+
+
+if __name__ == '__main__':
+    main()
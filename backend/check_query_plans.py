@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Check that the hot queries are answered from indexes.
+
+Migrates a scratch database (or a copy of --db) to the latest schema, runs
+EXPLAIN QUERY PLAN for every query in HOT_QUERIES and fails if any of them
+scans a whole table or sorts its results in a temporary b-tree.
+
+    python check_query_plans.py
+    python check_query_plans.py --db pothole_data.db
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+from services.migrations import run_migrations
+from services.map_service import (
+    RECENT_POTHOLES_SQL, USER_POTHOLES_SQL, USER_SEVERITY_COUNTS_SQL, VALIDATE_SESSION_SQL
+)
+
+# name -> (sql, sample parameters)
+HOT_QUERIES = {
+    'user_stats': (USER_SEVERITY_COUNTS_SQL, ('user-1',)),
+    'get_user_potholes': (USER_POTHOLES_SQL, ('user-1',)),
+    'get_recent_potholes': (RECENT_POTHOLES_SQL, (50,)),
+    'validate_session': (VALIDATE_SESSION_SQL, ('token', '2025-01-01 00:00:00'))
+}
+
+
+def plan_problems(plan):
+    """Full scans and temp sorts in EXPLAIN QUERY PLAN detail strings"""
+    problems = []
+    for detail in plan:
+        # "SCAN p USING INDEX ..." walks an index in order and is fine;
+        # a bare "SCAN potholes" reads every row
+        if detail.startswith('SCAN') and 'USING' not in detail:
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def check(db_path):
+    conn = sqlite3.connect(db_path)
+    failures = 0
+    try:
+        for name, (sql, params) in HOT_QUERIES.items():
+            plan = [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+            problems = plan_problems(plan)
+            status = '❌' if problems else '✅'
+            print(f"{status} {name}")
+            for detail in plan:
+                print(f"     {detail}")
+            failures += bool(problems)
+    finally:
+        conn.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='check against a copy of this database (its statistics affect the plans)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+        version = run_migrations(db_path)
+        print(f"Schema version {version}\n")
+        failures = check(db_path)
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} not using an index")
+        sys.exit(1)
+    print("\nAll hot queries use indexes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Export potholes from the SQLite database as CSV, newline-delimited GeoJSON
+or Parquet, streaming in chunks so memory stays flat for any table size.
+
+    python export_potholes.py --format parquet -o potholes.parquet
+    python export_potholes.py --format geojsonseq --severity high --start 2025-01-01 > high.geojsonl
+    python export_potholes.py --bbox=-74.1,40.6,-73.9,40.8
+"""
+
+import os
+import sys
+import argparse
+
+from services.exporter import (
+    DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, FORMAT_ALIASES, ExportFilters, export_potholes
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='pothole_data.db', help='SQLite database file')
+    parser.add_argument('--format', default='csv', choices=sorted(set(EXPORT_FORMATS) | set(FORMAT_ALIASES)))
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--bbox', help='min_lng,min_lat,max_lng,max_lat')
+    parser.add_argument('--start', help='only potholes reported at or after this ISO 8601 time')
+    parser.add_argument('--end', help='only potholes reported before this ISO 8601 time')
+    parser.add_argument('--severity', help='comma-separated severities, e.g. high,medium')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows read per query')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ Database not found: {args.db}")
+
+    try:
+        filters = ExportFilters.parse(args.bbox, args.start, args.end, args.severity)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for data in export_potholes(args.db, args.format, filters, args.chunk_size):
+            output.write(data)
+            written += len(data)
+    finally:
+        if args.output:
+            output.close()
+
+    if args.output:
+        print(f"✅ Exported {written / 1024:.1f} KB to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Garbage-collect the image store: delete stored originals and renditions
+that no pothole has referenced for the grace period.
+
+    python gc_images.py
+    python gc_images.py --grace 0 --orphans --recount
+
+Safe to run while the server is up, e.g. hourly from cron.
+"""
+
+import os
+import sys
+import argparse
+
+from services.image_store import IMAGE_GC_GRACE, IMAGE_STORE_DIR, ImageStore
+from services.migrations import run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='pothole_data.db', help='SQLite database file')
+    parser.add_argument('--store', default=IMAGE_STORE_DIR, help='image store directory')
+    parser.add_argument('--grace', type=int, default=IMAGE_GC_GRACE,
+                        help='seconds an image must have been unreferenced')
+    parser.add_argument('--orphans', action='store_true', help='also delete stray files with no images row')
+    parser.add_argument('--recount', action='store_true', help='recompute refcounts from the potholes table first')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ Database not found: {args.db}")
+    run_migrations(args.db)
+
+    store = ImageStore(args.db, root=args.store)
+    if args.recount:
+        print(f"🔢 Corrected {store.recount():,} refcounts")
+    removed = store.collect_garbage(grace_seconds=args.grace)
+    orphans = store.remove_orphans(grace_seconds=args.grace) if args.orphans else 0
+
+    stats = store.get_stats()
+    print(f"✅ Removed {removed:,} unreferenced images and {orphans:,} orphan files; "
+          f"{stats['images']:,} images ({stats['original_bytes'] / 1e6:.1f} MB of originals) remain")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+The app is preloaded in the master (model weights loaded once) and forked into
+WEB_WORKERS threaded workers. Inference runs in a process pool that each web
+worker forks after it starts, splitting INFERENCE_WORKERS and the machine's
+cores between them.
+"""
+
+import os
+import multiprocessing
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Build the app, detector and map service once in the master before forking
+preload_app = True
+
+# The web tier mostly waits on uploads, downloads, SQLite and the inference
+# pool, so a few processes with many threads each go a long way
+workers = int(os.environ.get('WEB_WORKERS', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '8'))
+
+# Leave room for inference on large images before the worker is recycled
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+# Stored images and reports are sent with sendfile(2), straight from the page cache
+sendfile = True
+
+# Recycle workers now and then to bound slow memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '5000'))
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    """Give the new worker a share of the inference workers and cores no live worker holds"""
+    # Runs in the master, which has already reaped exited workers, so their
+    # shares are free again for their replacements
+    held = {getattr(w, 'inference_share', None) for w in server.WORKERS.values()}
+    free = [share for share in range(server.num_workers) if share not in held]
+    # Only while old and new workers overlap (a HUP reload) is no share free;
+    # the split is best-effort for that short window
+    worker.inference_share = free[0] if free else worker.age % server.num_workers
+
+
+def post_fork(server, worker):
+    """Start this worker's share of the inference pool and its session reaper"""
+    import app
+
+    # With PRELOAD_MODEL=0 the pool starts with the first detection instead,
+    # using the same share
+    app.set_inference_share(worker.inference_share, server.num_workers)
+    app.start_inference_pool()
+    app.start_session_reaper()
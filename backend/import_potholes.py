@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Bulk import pothole datasets (CSV, GeoJSON or Parquet) into the database.
+
+Common field names are recognised (lat/latitude, lon/lng/longitude,
+severity, confidence, size/area, timestamp/date/reported_at, address).
+Rows are validated in chunks and loaded in large transactions, safely next
+to a running app. With --offline the database is locked for the whole
+import, the potholes indexes are dropped and rebuilt once at the end and
+writes are not synced: stop the app and back up the database first.
+
+    python import_potholes.py city_potholes.csv --user-id city-dot
+    python import_potholes.py reports.parquet --dry-run
+    python import_potholes.py statewide.csv --offline
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+from services.importer import DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, PotholeImporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='dataset to import')
+    parser.add_argument('--db', default='pothole_data.db', help='SQLite database file')
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='input format (default: from the extension)')
+    parser.add_argument('--user-id', default='import', help='user the imported potholes are attributed to')
+    parser.add_argument('--source', help='source name stored with each row (default: file name)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows validated per chunk')
+    parser.add_argument('--dry-run', action='store_true', help='validate only, write nothing')
+    parser.add_argument('--offline', action='store_true',
+                        help='lock the database and rebuild its indexes after the load (app stopped)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        sys.exit(f"❌ File not found: {args.path}")
+    if not args.dry_run and not os.path.exists(args.db):
+        sys.exit(f"❌ Database not found: {args.db} (run init_database.py to create it)")
+
+    importer = PotholeImporter(args.db, user_id=args.user_id, source=args.source,
+                               chunk_size=args.chunk_size, offline=args.offline)
+    try:
+        report = importer.import_file(args.path, args.format, dry_run=args.dry_run)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    except sqlite3.OperationalError as e:
+        sys.exit(f"❌ {e} (is the app still using {args.db}?)")
+
+    summary = report.as_dict()
+    action = 'Validated' if args.dry_run else 'Imported'
+    print(f"✅ {action} {summary['imported']:,} of {summary['read']:,} rows in {summary['seconds']}s")
+    if summary['rejected']:
+        print(f"⚠️  Rejected {summary['rejected']:,} rows: {json.dumps(summary['rejected_by_reason'])}")
+
+
+if __name__ == '__main__':
+    main()
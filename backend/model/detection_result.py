@@ -0,0 +1,101 @@
+import numpy as np
+
+# Box layout used internally: corner coordinates in original image pixels
+BOX_FORMAT = 'xyxy'
+
+# Box layout at the JSON boundary: top-left corner plus size, which is what
+# the frontend, the annotator and the database have always assumed
+JSON_BBOX_FORMAT = 'xywh'
+
+
+class DetectionResult:
+    """
+    Columnar detections for one image.
+
+    ``boxes`` is an (N, 4) float32 array in BOX_FORMAT, ``confidences`` and
+    ``class_ids`` are length-N arrays. Thresholding, areas and severity work
+    on whole arrays; per-detection dicts are only built by ``to_dicts`` when
+    the response is serialized.
+    """
+
+    __slots__ = ('boxes', 'confidences', 'class_ids')
+
+    def __init__(self, boxes, confidences, class_ids=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        if class_ids is None:
+            self.class_ids = np.zeros(len(self.confidences), dtype=np.int32)
+        else:
+            self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def from_xywh(cls, boxes, confidences, class_ids=None):
+        """Build from top-left [x, y, w, h] boxes"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, 2:] += boxes[:, :2]
+        return cls(boxes, confidences, class_ids)
+
+    @classmethod
+    def from_yolo(cls, results):
+        """Collect the boxes of Ultralytics results without per-box Python work"""
+        parts = [cls(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy())
+                 for r in results if r.boxes is not None]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(np.concatenate([p.boxes for p in parts]),
+                   np.concatenate([p.confidences for p in parts]),
+                   np.concatenate([p.class_ids for p in parts]))
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def select(self, mask):
+        """Subset by boolean mask or index array"""
+        return DetectionResult(self.boxes[mask], self.confidences[mask], self.class_ids[mask])
+
+    def filter(self, min_confidence):
+        """Keep detections strictly above ``min_confidence``"""
+        return self.select(self.confidences > min_confidence)
+
+    def widths(self):
+        return self.boxes[:, 2] - self.boxes[:, 0]
+
+    def heights(self):
+        return self.boxes[:, 3] - self.boxes[:, 1]
+
+    def areas(self):
+        """Box areas in square pixels"""
+        return self.widths() * self.heights()
+
+    def as_xywh(self):
+        """Boxes as top-left [x, y, w, h]"""
+        xywh = self.boxes.copy()
+        xywh[:, 2:] -= xywh[:, :2]
+        return xywh
+
+    def to_dicts(self, class_name='pothole', extra_columns=None, **common):
+        """
+        Per-detection dicts for JSON, with bbox in JSON_BBOX_FORMAT.
+
+        ``extra_columns`` maps keys to length-N sequences (e.g. severity
+        dicts); ``common`` keys are copied onto every detection.
+        """
+        # One bulk conversion to Python numbers instead of one per value
+        columns = {
+            'bbox': np.round(self.as_xywh(), 2).tolist(),
+            'confidence': np.round(self.confidences.astype(np.float64), 4).tolist(),
+            'class_id': self.class_ids.tolist(),
+            'area': np.round(self.areas().astype(np.float64), 2).tolist()
+        }
+        if extra_columns:
+            columns.update(extra_columns)
+        common = {'class': class_name, 'class_name': class_name, **common}
+
+        keys = list(columns)
+        return [{**dict(zip(keys, values)), **common} for values in zip(*columns.values())]
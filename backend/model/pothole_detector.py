@@ -1,11 +1,11 @@
 import os
-import cv2
-import numpy as np
-from PIL import Image
-import torch
-import json
 from datetime import datetime
 
+from model.detection_result import DetectionResult
+from utils.structured_logging import get_logger
+
+logger = get_logger('detector')
+
 class PotholeDetector:
     def __init__(self, model_path=None):
         self.model = None
@@ -14,6 +14,7 @@ class PotholeDetector:
         self.model_path = model_path
         self.available_models = self._discover_models()
         self.total_detections = 0
+        self.confidence_threshold = 0.25
         
         # Try to load the specified model or default
         if model_path:
@@ -54,13 +55,13 @@ class PotholeDetector:
                     self.model = YOLO(model_path)
                     self.detector_type = f"yolo_{os.path.basename(model_path)}"
                     self.model_loaded = True
-                    print(f"✅ Loaded YOLO model: {model_path}")
+                    logger.info("Loaded YOLO model: %s", model_path)
                     return True
                 except ImportError:
-                    print("❌ Ultralytics YOLO not available")
+                    logger.error("Ultralytics YOLO not available")
                     return False
                 except Exception as e:
-                    print(f"❌ Error loading YOLO model: {e}")
+                    logger.exception("Error loading YOLO model")
                     return False
             
             elif model_path.endswith('.onnx'):
@@ -70,27 +71,31 @@ class PotholeDetector:
                     self.model = ort.InferenceSession(model_path)
                     self.detector_type = f"onnx_{os.path.basename(model_path)}"
                     self.model_loaded = True
-                    print(f"✅ Loaded ONNX model: {model_path}")
+                    logger.info("Loaded ONNX model: %s", model_path)
                     return True
                 except ImportError:
-                    print("❌ ONNX Runtime not available")
+                    logger.error("ONNX Runtime not available")
                     return False
                 except Exception as e:
-                    print(f"❌ Error loading ONNX model: {e}")
+                    logger.exception("Error loading ONNX model")
                     return False
             
             return False
             
         except Exception as e:
-            print(f"❌ Error loading model {model_path}: {e}")
+            logger.exception("Error loading model %s", model_path)
             self.model_loaded = False
             return False
     
     def detect(self, image_path):
-        """Perform detection with the currently loaded model - NO MOCK DETECTIONS"""
+        """Perform detection with the currently loaded model - NO MOCK DETECTIONS
+
+        ``image_path`` may also be an already decoded BGR image array, which is
+        what the inference worker pool hands over from shared memory.
+        """
         if not self.model_loaded:
             return {
-                'detections': [],
+                'detections': DetectionResult.empty(),
                 'image_size': {'width': 0, 'height': 0},
                 'processing_time': 0,
                 'model_used': 'no_model_loaded',
@@ -105,7 +110,7 @@ class PotholeDetector:
                 return self._detect_onnx(image_path)
             else:
                 return {
-                    'detections': [],
+                    'detections': DetectionResult.empty(),
                     'image_size': {'width': 0, 'height': 0},
                     'processing_time': 0,
                     'model_used': 'unknown_model',
@@ -114,9 +119,9 @@ class PotholeDetector:
                 }
                 
         except Exception as e:
-            print(f"❌ Detection error with {self.detector_type}: {e}")
+            logger.exception("Detection error with %s", self.detector_type)
             return {
-                'detections': [],
+                'detections': DetectionResult.empty(),
                 'image_size': {'width': 0, 'height': 0},
                 'processing_time': 0,
                 'model_used': self.detector_type,
@@ -129,28 +134,18 @@ class PotholeDetector:
         import time
         start_time = time.time()
         
-        results = self.model(image_path)
+        results = self.model(image_path, conf=self.confidence_threshold, verbose=False)
         processing_time = time.time() - start_time
         
-        detections = []
-        for result in results:
-            for box in result.boxes:
-                confidence = float(box.conf[0])
-                if confidence > 0.25:  # Confidence threshold
-                    bbox = box.xywh[0].tolist()
-                    detection = {
-                        'bbox': bbox,  # [x_center, y_center, width, height]
-                        'confidence': confidence,
-                        'class': 'pothole',
-                        'class_id': int(box.cls[0])
-                    }
-                    detections.append(detection)
-        
+        # Columnar boxes (xyxy, original pixels); dicts are built at the JSON boundary
+        detections = DetectionResult.from_yolo(results).filter(self.confidence_threshold)
         self.total_detections += len(detections)
         
-        # Get image dimensions
-        image = Image.open(image_path)
-        width, height = image.size
+        # Image dimensions, without opening the file a second time
+        if hasattr(image_path, 'shape'):
+            height, width = image_path.shape[:2]
+        else:
+            height, width = results[0].orig_shape[:2]
         
         return {
             'detections': detections,
@@ -165,7 +160,7 @@ class PotholeDetector:
         # This would contain your actual ONNX inference logic
         # For now, return empty if no ONNX implementation
         return {
-            'detections': [],
+            'detections': DetectionResult.empty(),
             'image_size': {'width': 0, 'height': 0},
             'processing_time': 0,
             'model_used': self.detector_type,
@@ -185,10 +180,10 @@ class PotholeDetector:
     
     def switch_model(self, model_path):
         """Switch to a different model"""
-        print(f"🔄 Switching to model: {model_path}")
+        logger.info("Switching to model: %s", model_path)
         success = self.load_model(model_path)
         if success:
-            print(f"✅ Successfully switched to: {model_path}")
+            logger.info("Switched to model: %s", model_path)
         else:
-            print(f"❌ Failed to switch to: {model_path}")
+            logger.error("Failed to switch to model: %s", model_path)
         return success
\ No newline at end of file
@@ -0,0 +1,233 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+
+from services.metrics import ADMISSION_DECISIONS
+
+# Detection requests processed at once by one serving process; 0 disables the limit
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', '8'))
+# Seconds a request may wait for a free slot before it is shed with a 503
+ADMISSION_QUEUE_WAIT = float(os.environ.get('ADMISSION_QUEUE_WAIT', '1.0'))
+# Sustained detection requests per second per client, and the burst allowed
+# on top; a rate of 0 disables rate limiting
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', '1.0'))
+ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', '10'))
+# Clients whose buckets are remembered; the least recently seen are dropped
+ADMISSION_MAX_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', '10000'))
+
+# Weight of the newest request in the service time average behind Retry-After
+_SERVICE_TIME_WEIGHT = 0.2
+
+
+class AdmissionRejected(Exception):
+    """A request refused before doing any work; carries the HTTP status and Retry-After"""
+
+    status = 503
+    reason = 'overloaded'
+
+    def __init__(self, message, retry_after=1, status=None, reason=None):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.status = status or self.status
+        self.reason = reason or self.reason
+
+
+class DeadlineExceeded(AdmissionRejected):
+    """The client's deadline passed before the work could be done"""
+
+    reason = 'deadline_exceeded'
+
+
+def _epoch_seconds(value):
+    """Epoch time in seconds from seconds, milliseconds or microseconds"""
+    value = float(value)
+    if value > 1e14:
+        return value / 1e6
+    if value > 1e11:
+        return value / 1e3
+    return value
+
+
+def request_deadline(headers, now=None):
+    """
+    Absolute deadline (epoch seconds) of a request, or None.
+
+    ``X-Request-Deadline`` is an epoch time in milliseconds, for callers
+    sharing our clock. ``X-Request-Timeout`` is a budget in milliseconds,
+    counted from ``X-Request-Start`` (``t=<epoch>``) when a proxy in front
+    sets it, so time spent queued before the app is included, else from now.
+    """
+    now = time.time() if now is None else now
+    try:
+        deadline = headers.get('X-Request-Deadline')
+        if deadline:
+            return _epoch_seconds(deadline)
+
+        timeout = headers.get('X-Request-Timeout')
+        if not timeout:
+            return None
+        start = now
+        request_start = headers.get('X-Request-Start')
+        if request_start:
+            start = min(now, _epoch_seconds(request_start.strip().removeprefix('t=')))
+        return start + float(timeout) / 1000
+    except ValueError:
+        return None
+
+
+def check_deadline(deadline, stage):
+    """Raise DeadlineExceeded when ``deadline`` has passed"""
+    if deadline is not None and time.time() >= deadline:
+        ADMISSION_DECISIONS.inc(result='deadline_exceeded')
+        raise DeadlineExceeded(f"Request deadline passed before {stage}")
+
+
+def remaining(deadline):
+    """Seconds left until ``deadline`` (None for no deadline)"""
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+class TokenBuckets:
+    """Per-client token buckets, refilled lazily on each take()"""
+
+    def __init__(self, rate=ADMISSION_RATE, burst=ADMISSION_BURST, max_clients=ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key):
+        """Give back a token taken for a request that was shed anyway"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionTicket:
+    """An admitted request; leaving the ``with`` block frees its slot"""
+
+    __slots__ = ('controller', 'deadline', 'started')
+
+    def __init__(self, controller, deadline):
+        self.controller = controller
+        self.deadline = deadline
+        self.started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.controller._release(time.monotonic() - self.started)
+        return False
+
+
+class AdmissionController:
+    """
+    Admission control in front of the detection pipeline.
+
+    A request is admitted only if its client deadline has not passed, its
+    client (user or IP) has a token left in its bucket and one of
+    ``max_in_flight`` slots frees up within ``queue_wait`` seconds (or the
+    time left to its deadline, if shorter). Everything else is refused at
+    once with AdmissionRejected, so the requests that are admitted keep a
+    bounded latency instead of queueing behind work nobody waits for.
+    """
+
+    def __init__(self, max_in_flight=ADMISSION_MAX_IN_FLIGHT, queue_wait=ADMISSION_QUEUE_WAIT,
+                 rate=ADMISSION_RATE, burst=ADMISSION_BURST, max_clients=ADMISSION_MAX_CLIENTS):
+        self.max_in_flight = max_in_flight
+        self.queue_wait = queue_wait
+        self.buckets = TokenBuckets(rate, burst, max_clients)
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._lock = threading.Lock()
+        self._service_time = 1.0
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.expired = 0
+
+    def admit(self, client_key, deadline=None):
+        """AdmissionTicket for a request, or raise AdmissionRejected"""
+        if deadline is not None and time.time() >= deadline:
+            self._count('expired', 'deadline_exceeded')
+            raise DeadlineExceeded("Request deadline already passed", self._service_time)
+
+        wait = self.buckets.take(client_key)
+        if wait:
+            self._count('rate_limited', 'rate_limited')
+            raise AdmissionRejected("Too many detection requests, slow down",
+                                    retry_after=wait, status=429, reason='rate_limited')
+
+        if self._slots is not None:
+            timeout = self.queue_wait
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.time()))
+            if not self._slots.acquire(timeout=timeout):
+                self.buckets.refund(client_key)
+                if deadline is not None and time.time() >= deadline:
+                    self._count('expired', 'deadline_exceeded')
+                    raise DeadlineExceeded("Request deadline passed while waiting", self._service_time)
+                self._count('overloaded', 'overloaded')
+                raise AdmissionRejected("Server is busy, try again shortly", retry_after=self._service_time)
+
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        ADMISSION_DECISIONS.inc(result='admitted')
+        return AdmissionTicket(self, deadline)
+
+    def _release(self, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self._service_time += _SERVICE_TIME_WEIGHT * (seconds - self._service_time)
+        if self._slots is not None:
+            self._slots.release()
+
+    def _count(self, attribute, result):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+        ADMISSION_DECISIONS.inc(result=result)
+
+    def get_stats(self):
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self.in_flight,
+            'queue_wait_seconds': self.queue_wait,
+            'rate_per_client': self.buckets.rate,
+            'burst_per_client': self.buckets.burst,
+            'clients_tracked': len(self.buckets),
+            'avg_service_seconds': round(self._service_time, 3),
+            'admitted': self.admitted,
+            'rate_limited': self.rate_limited,
+            'overloaded': self.overloaded,
+            'deadline_exceeded': self.expired
+        }
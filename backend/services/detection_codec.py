@@ -0,0 +1,196 @@
+import os
+import json
+import struct
+
+# Compress stored detections with zstd when it makes them smaller ('zstd'),
+# or never ('none'). Reading handles both either way.
+DETECTION_DATA_COMPRESSION = os.environ.get('DETECTION_DATA_COMPRESSION', 'none').lower()
+
+# First byte of an encoded value. Rows written before the codec hold JSON
+# text, which never starts with these bytes.
+FORMAT_PACKED = 0x01
+FORMAT_PACKED_ZSTD = 0x02
+
+SEVERITY_CODES = {'low': 0, 'medium': 1, 'high': 2}
+SEVERITY_NAMES = {code: level for level, code in SEVERITY_CODES.items()}
+
+DEFAULT_CLASS_NAME = 'pothole'
+
+# Detection keys that duplicate a potholes column, and the column
+COLUMN_FIELDS = {
+    'confidence': 'confidence',
+    'area': 'size',
+    'timestamp': 'timestamp',
+    'user_id': 'user_id'
+}
+
+# Flag bits of the packed header
+_HAS_BBOX = 0x01
+_HAS_CLASS_ID = 0x02
+_HAS_SEVERITY = 0x04
+_HAS_SCORE = 0x08
+_DEFAULT_CLASS = 0x10
+_HAS_EXTRAS = 0x20
+
+_BBOX = struct.Struct('<4f')
+_CLASS_ID = struct.Struct('<h')
+_SEVERITY = struct.Struct('<B')
+_SCORE = struct.Struct('<f')
+
+_zstd_compressor = None
+_zstd_decompressor = None
+
+
+def _zstd():
+    global _zstd_compressor, _zstd_decompressor
+    if _zstd_compressor is None:
+        import zstandard
+        _zstd_compressor = zstandard.ZstdCompressor(level=9)
+        _zstd_decompressor = zstandard.ZstdDecompressor()
+    return _zstd_compressor, _zstd_decompressor
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _location_rest(location, row):
+    """Location fields besides the row's coordinates, or None when the coordinates differ"""
+    if (isinstance(location, dict) and location.get('latitude') == row.get('latitude')
+            and location.get('longitude') == row.get('longitude') and 'latitude' in row):
+        return {k: v for k, v in location.items() if k not in ('latitude', 'longitude')}
+    return None
+
+
+def encode_detection(detection, row=None, compression=None):
+    """
+    Compact bytes for one detection dict stored in potholes.detection_data.
+
+    Fields equal to the row's own columns (``row`` maps column names to
+    the values being stored) are dropped, the bbox is packed as four
+    float32 and the severity level as a one-byte code; its description is
+    derived from the level when decoding. Whatever is left is kept as
+    compact JSON. With ``compression='zstd'`` the result is compressed when
+    that makes it smaller.
+    """
+    row = row or {}
+    compression = compression or DETECTION_DATA_COMPRESSION
+    remaining = dict(detection)
+    flags = 0
+    parts = []
+
+    bbox = remaining.get('bbox')
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4 and all(_is_number(v) for v in bbox):
+        del remaining['bbox']
+        flags |= _HAS_BBOX
+        parts.append(_BBOX.pack(*bbox))
+
+    class_id = remaining.get('class_id')
+    if isinstance(class_id, int) and not isinstance(class_id, bool) and -32768 <= class_id <= 32767:
+        del remaining['class_id']
+        flags |= _HAS_CLASS_ID
+        parts.append(_CLASS_ID.pack(class_id))
+
+    severity = remaining.get('severity')
+    if isinstance(severity, dict) and severity.get('level') in SEVERITY_CODES \
+            and set(severity) <= {'level', 'score', 'description'}:
+        del remaining['severity']
+        flags |= _HAS_SEVERITY
+        parts.append(_SEVERITY.pack(SEVERITY_CODES[severity['level']]))
+        score = severity.get('score')
+        if _is_number(score):
+            flags |= _HAS_SCORE
+            parts.append(_SCORE.pack(score))
+
+    if remaining.get('class') == DEFAULT_CLASS_NAME and remaining.get('class_name') == DEFAULT_CLASS_NAME:
+        del remaining['class'], remaining['class_name']
+        flags |= _DEFAULT_CLASS
+
+    for key, column in COLUMN_FIELDS.items():
+        if key in remaining and column in row and remaining[key] == row[column]:
+            del remaining[key]
+    location_rest = _location_rest(remaining.get('location'), row)
+    if location_rest is not None:
+        if location_rest:
+            remaining['location'] = location_rest
+        else:
+            del remaining['location']
+
+    if remaining:
+        flags |= _HAS_EXTRAS
+        parts.append(json.dumps(remaining, separators=(',', ':'), default=str).encode('utf-8'))
+
+    body = bytes([flags]) + b''.join(parts)
+    if compression == 'zstd':
+        try:
+            compressed = _zstd()[0].compress(body)
+        except ImportError:
+            compressed = None
+        if compressed is not None and len(compressed) < len(body):
+            return bytes([FORMAT_PACKED_ZSTD]) + compressed
+    return bytes([FORMAT_PACKED]) + body
+
+
+def decode_detection(value, row=None, descriptions=None):
+    """
+    Rebuild the detection dict from a stored detection_data value.
+
+    ``row`` supplies the dropped columns (latitude, longitude, confidence,
+    size, timestamp, user_id) and ``descriptions`` maps
+    severity levels to text, defaulting to the severity engine's config.
+    Legacy JSON text is returned as parsed.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+
+    value = bytes(value)
+    if value[0] == FORMAT_PACKED_ZSTD:
+        body = _zstd()[1].decompress(value[1:])
+    elif value[0] == FORMAT_PACKED:
+        body = value[1:]
+    else:
+        return json.loads(value.decode('utf-8'))
+
+    row = row or {}
+    flags = body[0]
+    offset = 1
+    detection = {}
+
+    if flags & _HAS_BBOX:
+        detection['bbox'] = [round(v, 2) for v in _BBOX.unpack_from(body, offset)]
+        offset += _BBOX.size
+    if flags & _HAS_CLASS_ID:
+        detection['class_id'] = _CLASS_ID.unpack_from(body, offset)[0]
+        offset += _CLASS_ID.size
+
+    for key, column in COLUMN_FIELDS.items():
+        if row.get(column) is not None:
+            detection[key] = row[column]
+
+    if flags & _HAS_SEVERITY:
+        level = SEVERITY_NAMES[_SEVERITY.unpack_from(body, offset)[0]]
+        offset += _SEVERITY.size
+        severity = {'level': level}
+        if flags & _HAS_SCORE:
+            severity['score'] = round(_SCORE.unpack_from(body, offset)[0], 3)
+            offset += _SCORE.size
+        if descriptions is None:
+            from services.severity import severity_engine
+            descriptions = severity_engine.config['descriptions']
+        if level in descriptions:
+            severity['description'] = descriptions[level]
+        detection['severity'] = severity
+
+    if flags & _DEFAULT_CLASS:
+        detection['class'] = detection['class_name'] = DEFAULT_CLASS_NAME
+    if row.get('latitude') is not None and row.get('longitude') is not None:
+        detection['location'] = {'latitude': row['latitude'], 'longitude': row['longitude']}
+
+    if flags & _HAS_EXTRAS:
+        extras = json.loads(body[offset:].decode('utf-8'))
+        if isinstance(extras.get('location'), dict) and 'location' in detection:
+            detection['location'].update(extras.pop('location'))
+        detection.update(extras)
+    return detection
@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import time
+
+from services.image_store import IMAGE_STORE_DIR, image_relative_path
+from services.migrations import run_migrations
+from services.spatial_index import grid_cell
+from utils.exif import EXIF_SCAN_BYTES, read_photo_metadata
+from utils.structured_logging import get_logger
+
+logger = get_logger('exif_backfill')
+
+# Coordinate /api/detect used to store for uploads without a location
+LEGACY_DEFAULT_LOCATION = (40.7128, -74.0060)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class BackfillReport:
+    """Counts from one backfill run"""
+
+    def __init__(self):
+        self.scanned = 0
+        self.missing_file = 0
+        self.no_gps = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unlocated = 0
+        self.started = time.monotonic()
+
+    def as_dict(self):
+        return {
+            'scanned': self.scanned,
+            'missing_file': self.missing_file,
+            'no_gps': self.no_gps,
+            'updated': self.updated,
+            'deleted': self.deleted,
+            'unlocated': self.unlocated,
+            'seconds': round(time.monotonic() - self.started, 2)
+        }
+
+
+def read_file_metadata(path):
+    """GPS and capture time of a stored original, reading only its first EXIF_SCAN_BYTES"""
+    with open(path, 'rb') as f:
+        return read_photo_metadata(f.read(EXIF_SCAN_BYTES))
+
+
+def _at_legacy_default(latitude, longitude):
+    return (round(latitude, 4), round(longitude, 4)) == LEGACY_DEFAULT_LOCATION
+
+
+def backfill_locations(db_path, image_dir, overwrite=False, delete_unlocated=False,
+                       dry_run=False, batch_size=DEFAULT_BATCH_SIZE, store_dir=IMAGE_STORE_DIR):
+    """
+    Take pothole coordinates from the Exif GPS of their stored originals.
+
+    Rows are walked by id in batches. Originals are read from the image
+    store (``store_dir``) for rows with an image_digest, otherwise each
+    uploaded (not imported) row's image_path is looked up by file name in
+    ``image_dir``. Rows still at the old New York default get the photo's
+    GPS fix (every row with ``overwrite``). Default rows with no
+    recoverable fix are counted as unlocated, and removed with
+    ``delete_unlocated``. Returns a BackfillReport.
+    """
+    report = BackfillReport()
+    if not dry_run:
+        run_migrations(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute('''
+                SELECT id, image_path, image_digest, latitude, longitude FROM potholes
+                WHERE id > ? AND image_path IS NOT NULL AND image_path NOT LIKE 'import:%'
+                ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates, deletions = [], []
+            for pothole_id, image_path, digest, latitude, longitude in rows:
+                is_default = _at_legacy_default(latitude, longitude)
+                if not (overwrite or is_default):
+                    continue
+                report.scanned += 1
+
+                if digest:
+                    path = os.path.join(store_dir, image_relative_path(digest))
+                else:
+                    path = os.path.join(image_dir, os.path.basename(image_path))
+                try:
+                    metadata = read_file_metadata(path)
+                except OSError:
+                    report.missing_file += 1
+                    metadata = {}
+                else:
+                    if 'latitude' not in metadata:
+                        report.no_gps += 1
+
+                if 'latitude' in metadata:
+                    new_latitude, new_longitude = metadata['latitude'], metadata['longitude']
+                    updates.append((new_latitude, new_longitude, grid_cell(new_latitude, new_longitude),
+                                    pothole_id))
+                elif is_default:
+                    deletions.append((pothole_id,))
+
+            report.updated += len(updates)
+            if delete_unlocated:
+                report.deleted += len(deletions)
+            else:
+                report.unlocated += len(deletions)
+            if dry_run:
+                continue
+
+            with conn:
+                conn.executemany(
+                    'UPDATE potholes SET latitude = ?, longitude = ?, grid_cell = ? WHERE id = ?', updates)
+                if delete_unlocated:
+                    conn.executemany('DELETE FROM potholes WHERE id = ?', deletions)
+                if updates:
+                    # Invalidates cached area reports (report_aggregates.data_fingerprint)
+                    conn.execute("UPDATE data_generations SET value = value + 1 WHERE name = 'locations'")
+    finally:
+        conn.close()
+
+    logger.info("Exif backfill: %d rows relocated, %d unlocated, %d deleted of %d scanned",
+                report.updated, report.unlocated, report.deleted, report.scanned)
+    return report
@@ -0,0 +1,233 @@
+import io
+import csv
+import json
+import sqlite3
+from datetime import datetime
+
+# Exported pothole columns, in output order
+EXPORT_COLUMNS = (
+    'id', 'latitude', 'longitude', 'severity', 'severity_score', 'confidence',
+    'size', 'report_count', 'timestamp', 'last_reported', 'user_id'
+)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'geojsonseq': ('application/geo+json-seq', 'geojsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# Other names clients use for the formats
+FORMAT_ALIASES = {'ndjson': 'geojsonseq', 'geojsonl': 'geojsonseq', 'geojsons': 'geojsonseq'}
+
+SEVERITY_VALUES = ('low', 'medium', 'high')
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class ExportFilters:
+    """Row filters for an export: bounding box, time range and severities"""
+
+    def __init__(self, bbox=None, start=None, end=None, severities=None):
+        self.bbox = bbox
+        self.start = start
+        self.end = end
+        self.severities = severities
+
+    @classmethod
+    def parse(cls, bbox=None, start=None, end=None, severity=None):
+        """
+        Build filters from query-string style values.
+
+        ``bbox`` is "min_lng,min_lat,max_lng,max_lat" (GeoJSON order),
+        ``start``/``end`` are ISO 8601 timestamps and ``severity`` is a
+        comma-separated list. ``bbox`` and ``severity`` may also be given as
+        lists, as JSON bodies do. Raises ValueError on malformed input.
+        """
+        if bbox:
+            if isinstance(bbox, str):
+                bbox = bbox.split(',')
+            try:
+                if not isinstance(bbox, (list, tuple)):
+                    raise TypeError
+                min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox)
+            except (TypeError, ValueError):
+                raise ValueError("bbox must be 'min_lng,min_lat,max_lng,max_lat'")
+            if min_lat > max_lat or min_lng > max_lng:
+                raise ValueError("bbox minimums must not exceed maximums")
+            bbox = (min_lng, min_lat, max_lng, max_lat)
+
+        def parse_time(value, name):
+            if not value:
+                return None
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be an ISO 8601 timestamp")
+            try:
+                parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f"{name} must be an ISO 8601 timestamp")
+            return parsed.replace(tzinfo=None).isoformat(sep=' ')
+
+        severities = None
+        if severity:
+            if isinstance(severity, str):
+                severity = severity.split(',')
+            elif not isinstance(severity, (list, tuple)) or not all(isinstance(s, str) for s in severity):
+                raise ValueError("severity must be a comma-separated list of low, medium and high")
+            severities = [s.strip().lower() for s in severity if s.strip()]
+            unknown = set(severities) - set(SEVERITY_VALUES)
+            if unknown:
+                raise ValueError(f"Unknown severity: {', '.join(sorted(unknown))}")
+
+        return cls(bbox, parse_time(start, 'start'), parse_time(end, 'end'), severities)
+
+    def where_clause(self):
+        clauses = []
+        params = []
+        if self.bbox:
+            min_lng, min_lat, max_lng, max_lat = self.bbox
+            clauses.append('latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?')
+            params += [min_lat, max_lat, min_lng, max_lng]
+        # datetime() normalizes the 'T' and ' ' separators both found in stored rows
+        if self.start:
+            clauses.append('datetime(timestamp) >= datetime(?)')
+            params.append(self.start)
+        if self.end:
+            clauses.append('datetime(timestamp) < datetime(?)')
+            params.append(self.end)
+        if self.severities:
+            clauses.append(f"severity IN ({','.join('?' * len(self.severities))})")
+            params += self.severities
+        return clauses, params
+
+
+def _select_list(conn):
+    """Export columns, with NULL for any the database predates"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(potholes)')}
+    return ', '.join(column if column in existing else f'NULL AS {column}' for column in EXPORT_COLUMNS)
+
+
+def iter_chunks(db_path, filters=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of up to ``chunk_size`` pothole rows in id order.
+
+    Pages by primary key (``id > last_id``), each page its own short read,
+    so memory stays flat and a long export never holds a read transaction
+    that would stall writers on the rollback-journal database.
+    """
+    filters = filters or ExportFilters()
+    clauses, params = filters.where_clause()
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        sql = f"SELECT {_select_list(conn)} FROM potholes WHERE {' AND '.join(['id > ?'] + clauses)} ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            rows = conn.execute(sql, [last_id] + params + [chunk_size]).fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+            if len(rows) < chunk_size:
+                break
+    finally:
+        conn.close()
+
+
+def stream_csv(chunks):
+    """CSV with a header row, one encoded block per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_geojsonseq(chunks):
+    """One GeoJSON Point feature per line"""
+    property_columns = [(i, column) for i, column in enumerate(EXPORT_COLUMNS)
+                        if column not in ('latitude', 'longitude')]
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            feature = {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [row[2], row[1]]},
+                'properties': {column: row[i] for i, column in property_columns}
+            }
+            lines.append(json.dumps(feature, separators=(',', ':')))
+        lines.append('')
+        yield '\n'.join(lines).encode('utf-8')
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_parquet(chunks):
+    """Parquet file with one row group per chunk, streamed as it is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('latitude', pa.float64()), ('longitude', pa.float64()),
+        ('severity', pa.string()), ('severity_score', pa.float64()), ('confidence', pa.float64()),
+        ('size', pa.float64()), ('report_count', pa.int64()), ('timestamp', pa.string()),
+        ('last_reported', pa.string()), ('user_id', pa.string())
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_STREAMERS = {
+    'csv': stream_csv,
+    'geojsonseq': stream_geojsonseq,
+    'parquet': stream_parquet
+}
+
+
+def export_potholes(db_path, export_format, filters=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generator of encoded export bytes for ``export_format`` (see EXPORT_FORMATS)"""
+    export_format = FORMAT_ALIASES.get(export_format, export_format)
+    if export_format not in _STREAMERS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return _STREAMERS[export_format](iter_chunks(db_path, filters, chunk_size))
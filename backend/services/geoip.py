@@ -0,0 +1,296 @@
+import os
+import csv
+import mmap
+import struct
+import threading
+import ipaddress
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import CACHE_REQUESTS
+from utils.structured_logging import get_logger
+
+logger = get_logger('geoip')
+
+# IP range table built by build_geoip_db.py
+GEOIP_DB = os.environ.get('GEOIP_DB', 'geoip.bin')
+# Recent lookups kept in memory, including misses
+GEOIP_CACHE_SIZE = int(os.environ.get('GEOIP_CACHE_SIZE', '4096'))
+# Optional online fallback for addresses missing from the table, e.g.
+# 'https://ipapi.co/{ip}/json/'. Empty (the default) never touches the network.
+GEOIP_REMOTE_URL = os.environ.get('GEOIP_REMOTE_URL', '')
+GEOIP_REMOTE_TIMEOUT = float(os.environ.get('GEOIP_REMOTE_TIMEOUT', '3'))
+# Fallback lookups waiting at once; further misses are not looked up
+GEOIP_REMOTE_QUEUE = int(os.environ.get('GEOIP_REMOTE_QUEUE', '64'))
+
+# File layout (little-endian): header, IPv4 ranges sorted by start, IPv6
+# ranges sorted by start, then the place strings the ranges point into.
+# IPv6 addresses are stored big-endian so byte order is numeric order.
+MAGIC = b'PGEO'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHHII')        # magic, version, reserved, IPv4 count, IPv6 count
+_V4_RANGE = struct.Struct('<IIffI')       # start, end, latitude, longitude, place offset
+_V4_START = struct.Struct('<I')
+_V6_RANGE = struct.Struct('<16s16sffI')
+_PLACE_LENGTH = struct.Struct('<H')
+
+
+class GeoIPDatabase:
+    """
+    Read-only IP range table, memory-mapped.
+
+    Lookups binary-search the sorted ranges in place, so opening the file
+    costs nothing and worker processes share its pages through the OS cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{path} is not a GeoIP table")
+        magic, version, _, self.v4_count, self.v6_count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} GeoIP table")
+
+        self._v4_base = _HEADER.size
+        self._v6_base = self._v4_base + self.v4_count * _V4_RANGE.size
+        self._places_base = self._v6_base + self.v6_count * _V6_RANGE.size
+        if len(self._mm) < self._places_base:
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.v4_count + self.v6_count
+
+    def _search(self, key, base, count, record, start_at):
+        # Last range starting at or before the key
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if start_at(base + mid * record.size) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        start, end, latitude, longitude, place = record.unpack_from(self._mm, base + (lo - 1) * record.size)
+        if key > end:
+            return None
+        return latitude, longitude, place
+
+    def _place(self, offset):
+        position = self._places_base + offset
+        length = _PLACE_LENGTH.unpack_from(self._mm, position)[0]
+        position += _PLACE_LENGTH.size
+        city, _, country = self._mm[position:position + length].decode('utf-8').partition('\t')
+        return city, country
+
+    def lookup(self, address):
+        """Location dict for an ``ipaddress`` address object, or None"""
+        mm = self._mm
+        if address.version == 4:
+            found = self._search(int(address), self._v4_base, self.v4_count, _V4_RANGE,
+                                 lambda offset: _V4_START.unpack_from(mm, offset)[0])
+        else:
+            found = self._search(address.packed, self._v6_base, self.v6_count, _V6_RANGE,
+                                 lambda offset: mm[offset:offset + 16])
+        if found is None:
+            return None
+
+        latitude, longitude, place = found
+        city, country = self._place(place)
+        return {
+            'latitude': round(latitude, 4),
+            'longitude': round(longitude, 4),
+            'city': city or 'Unknown',
+            'country': country or 'Unknown',
+            'source': 'geoip_db'
+        }
+
+
+class GeoIPLocator:
+    """
+    Locates client IPs from the local range table, with an LRU cache.
+
+    Never blocks on the network: addresses missing from the table are, when
+    GEOIP_REMOTE_URL is set, looked up on a background thread and answered
+    from the cache on a later request.
+    """
+
+    def __init__(self, db_path=GEOIP_DB, cache_size=GEOIP_CACHE_SIZE, remote_url=GEOIP_REMOTE_URL):
+        self.cache_size = cache_size
+        self.remote_url = remote_url
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = None
+        self.database = None
+
+        if os.path.exists(db_path):
+            try:
+                self.database = GeoIPDatabase(db_path)
+                logger.info("GeoIP table %s loaded with %d ranges", db_path, len(self.database))
+            except (OSError, ValueError) as e:
+                logger.error("Could not load GeoIP table %s: %s", db_path, e)
+        else:
+            logger.warning("GeoIP table %s not found; run build_geoip_db.py to create it", db_path)
+
+    def lookup(self, ip):
+        """Location dict for an IP string, or None when it cannot be located (yet)"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return None
+
+        key = address.packed
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                CACHE_REQUESTS.inc(cache='geoip', result='hit')
+                return self._cache[key]
+        CACHE_REQUESTS.inc(cache='geoip', result='miss')
+
+        location = self.database.lookup(address) if self.database else None
+        if location is None and self.remote_url:
+            self._lookup_remote(address)
+            return None
+        self._remember(key, location)
+        return location
+
+    def _remember(self, key, location):
+        with self._lock:
+            self._cache[key] = location
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup_remote(self, address):
+        with self._lock:
+            if address.packed in self._pending or len(self._pending) >= GEOIP_REMOTE_QUEUE:
+                return
+            self._pending.add(address.packed)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='geoip')
+        self._executor.submit(self._fetch_remote, address)
+
+    def _fetch_remote(self, address):
+        import requests
+
+        try:
+            response = requests.get(self.remote_url.format(ip=address.compressed), timeout=GEOIP_REMOTE_TIMEOUT)
+            if response.status_code == 200:
+                data = response.json()
+                location = None
+                if data.get('latitude') is not None and data.get('longitude') is not None:
+                    location = {
+                        'latitude': data['latitude'],
+                        'longitude': data['longitude'],
+                        'city': data.get('city') or 'Unknown',
+                        'country': data.get('country_name') or data.get('country') or 'Unknown',
+                        'source': 'ip_geolocation'
+                    }
+                self._remember(address.packed, location)
+            else:
+                logger.warning("Geolocation API returned %d for %s", response.status_code, address)
+        except Exception as e:
+            # Not cached, so the address is tried again on a later request
+            logger.warning("Geolocation API error: %s", e)
+        finally:
+            with self._lock:
+                self._pending.discard(address.packed)
+
+    def get_stats(self):
+        """Get locator statistics"""
+        with self._lock:
+            return {
+                'ranges': len(self.database) if self.database else 0,
+                'cached': len(self._cache),
+                'remote_pending': len(self._pending),
+                'remote_fallback': bool(self.remote_url)
+            }
+
+
+def read_ranges(csv_path, locations=None):
+    """
+    Yield (first address, last address, latitude, longitude, city, country)
+    from a CSV of IP ranges.
+
+    Rows give either ``start_ip`` and ``end_ip`` or a CIDR ``network``, plus
+    ``latitude`` and ``longitude`` and optionally ``city`` and ``country``.
+    GeoLite2 City block files work as they are; pass ``locations`` (a dict
+    of geoname_id to (city, country), see read_locations) for their names.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('latitude') or not row.get('longitude'):
+                continue
+            if row.get('network'):
+                network = ipaddress.ip_network(row['network'], strict=False)
+                first, last = network.network_address, network.broadcast_address
+            else:
+                first, last = ipaddress.ip_address(row['start_ip']), ipaddress.ip_address(row['end_ip'])
+
+            city, country = row.get('city', ''), row.get('country', '')
+            if locations and row.get('geoname_id') in locations:
+                city, country = locations[row['geoname_id']]
+            yield first, last, float(row['latitude']), float(row['longitude']), city, country
+
+
+def read_locations(csv_path):
+    """geoname_id -> (city, country code) from a GeoLite2 City locations CSV"""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return {row['geoname_id']: (row.get('city_name', ''), row.get('country_iso_code', ''))
+                for row in csv.DictReader(f)}
+
+
+def write_database(ranges, path):
+    """
+    Write ranges (as yielded by read_ranges) to a GeoIP table file.
+
+    Ranges overlapping an earlier one are dropped. The file is replaced
+    atomically, so running servers keep reading the table they mapped.
+    Returns (IPv4 ranges, IPv6 ranges, dropped ranges).
+    """
+    by_version = {4: [], 6: []}
+    for first, last, latitude, longitude, city, country in ranges:
+        if first.version != last.version or first > last:
+            raise ValueError(f"Invalid range {first} - {last}")
+        by_version[first.version].append((first, last, latitude, longitude, f'{city}\t{country}'))
+
+    places = {}
+    place_data = bytearray()
+    records = {4: bytearray(), 6: bytearray()}
+    counts = {4: 0, 6: 0}
+    dropped = 0
+    for version, entries in by_version.items():
+        entries.sort(key=lambda entry: entry[0])
+        previous_last = None
+        for first, last, latitude, longitude, place in entries:
+            if previous_last is not None and first <= previous_last:
+                dropped += 1
+                continue
+            previous_last = last
+
+            if place not in places:
+                encoded = place.encode('utf-8')[:0xFFFF]
+                places[place] = len(place_data)
+                place_data += _PLACE_LENGTH.pack(len(encoded)) + encoded
+            if version == 4:
+                records[4] += _V4_RANGE.pack(int(first), int(last), latitude, longitude, places[place])
+            else:
+                records[6] += _V6_RANGE.pack(first.packed, last.packed, latitude, longitude, places[place])
+            counts[version] += 1
+
+    partial = f'{path}.tmp'
+    with open(partial, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, counts[4], counts[6]))
+        f.write(records[4])
+        f.write(records[6])
+        f.write(place_data)
+    os.replace(partial, path)
+    return counts[4], counts[6], dropped
@@ -0,0 +1,148 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.metrics import IMAGE_DOWNLOADS, IMAGE_DOWNLOAD_BYTES
+from utils.structured_logging import get_logger
+
+logger = get_logger('image_downloader')
+
+# Largest image body accepted from a URL, in bytes
+IMAGE_DOWNLOAD_MAX_BYTES = int(os.environ.get('IMAGE_DOWNLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+IMAGE_DOWNLOAD_CONNECT_TIMEOUT = float(os.environ.get('IMAGE_DOWNLOAD_CONNECT_TIMEOUT', '5'))
+# Longest wait for the next bytes of a response, not for the whole body
+IMAGE_DOWNLOAD_READ_TIMEOUT = float(os.environ.get('IMAGE_DOWNLOAD_READ_TIMEOUT', '30'))
+# Concurrent downloads in fetch_many; also the connections kept per host
+IMAGE_DOWNLOAD_WORKERS = int(os.environ.get('IMAGE_DOWNLOAD_WORKERS', '8'))
+
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class DownloadError(ValueError):
+    """An image URL could not be downloaded; ``reason`` is its metrics label"""
+
+    def __init__(self, message, reason='error'):
+        super().__init__(message)
+        self.reason = reason
+
+
+def decode_image(data):
+    """BGR image array from encoded image bytes"""
+    import numpy as np
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise DownloadError("Could not decode image", reason='not_image')
+    return image
+
+
+class ImageDownloader:
+    """
+    Downloads images over one pooled HTTP session.
+
+    Responses are streamed and rejected as early as possible: on the status
+    line and headers (non-image Content-Type, Content-Length over the cap),
+    then as soon as the body passes ``max_bytes``, so an oversized or bogus
+    URL never gets buffered whole.
+    """
+
+    def __init__(self, max_bytes=IMAGE_DOWNLOAD_MAX_BYTES, workers=IMAGE_DOWNLOAD_WORKERS,
+                 timeout=(IMAGE_DOWNLOAD_CONNECT_TIMEOUT, IMAGE_DOWNLOAD_READ_TIMEOUT)):
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        # Retry connection failures only; a slow or failing server is not asked twice
+        retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.workers, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def fetch(self, url):
+        """Encoded image body of ``url`` as a bytearray; raises DownloadError"""
+        try:
+            return self._fetch(url)
+        except DownloadError as e:
+            IMAGE_DOWNLOADS.inc(result=e.reason)
+            raise
+        except requests.RequestException as e:
+            IMAGE_DOWNLOADS.inc(result='error')
+            raise DownloadError(f"Failed to download image from URL: {e}")
+
+    def _fetch(self, url):
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                raise DownloadError("URL does not point to an image", reason='not_image')
+
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                raise DownloadError(f"Image is larger than {self.max_bytes} bytes", reason='too_large')
+
+            body = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                body += chunk
+                # Also catches a missing or lying Content-Length and compressed bombs
+                if len(body) > self.max_bytes:
+                    raise DownloadError(f"Image is larger than {self.max_bytes} bytes", reason='too_large')
+
+        if not body:
+            raise DownloadError("URL returned an empty image", reason='not_image')
+        IMAGE_DOWNLOADS.inc(result='ok')
+        IMAGE_DOWNLOAD_BYTES.inc(len(body))
+        return body
+
+    def fetch_image(self, url):
+        """Decoded BGR image array of ``url``; raises DownloadError"""
+        return decode_image(self.fetch(url))
+
+    def _pool(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='download')
+        return self._executor
+
+    def fetch_many(self, urls, decode=False):
+        """
+        Download many URLs concurrently, yielding (url, image, error) in input order.
+
+        ``image`` is the encoded body, or the decoded array with ``decode``;
+        ``error`` is the DownloadError of a failed URL. At most twice the
+        worker count of images are held before the caller takes them.
+        """
+        fetch = self.fetch_image if decode else self.fetch
+        executor = self._pool()
+        window = deque()
+
+        def collect(url, future):
+            try:
+                return url, future.result(), None
+            except DownloadError as e:
+                return url, None, e
+
+        for url in urls:
+            window.append((url, executor.submit(fetch, url)))
+            if len(window) >= 2 * self.workers:
+                yield collect(*window.popleft())
+        while window:
+            yield collect(*window.popleft())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
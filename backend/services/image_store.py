@@ -0,0 +1,308 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import tempfile
+
+from services.metrics import IMAGE_STORE_COLLECTED, IMAGE_STORE_WRITES, SQLITE_QUERY_SECONDS
+from utils.structured_logging import get_logger
+
+logger = get_logger('image_store')
+
+IMAGE_STORE_DIR = os.environ.get('IMAGE_STORE_DIR', 'images')
+# Longest side of the renditions generated when an image is stored
+IMAGE_PREVIEW_SIDE = int(os.environ.get('IMAGE_PREVIEW_SIDE', '1024'))
+IMAGE_THUMBNAIL_SIDE = int(os.environ.get('IMAGE_THUMBNAIL_SIDE', '256'))
+IMAGE_RENDITION_QUALITY = int(os.environ.get('IMAGE_RENDITION_QUALITY', '85'))
+# Seconds an unreferenced image is kept before garbage collection, so an
+# image stored for a detection survives until its potholes are saved
+IMAGE_GC_GRACE = int(os.environ.get('IMAGE_GC_GRACE', '3600'))
+# Images deleted per garbage collection transaction
+IMAGE_GC_BATCH = int(os.environ.get('IMAGE_GC_BATCH', '200'))
+
+RENDITIONS = ('original', 'preview', 'thumbnail')
+# File name after the digest; originals keep their bytes and format as uploaded
+_SUFFIXES = {'original': '', 'preview': '.preview.jpg', 'thumbnail': '.thumb.jpg'}
+MIMETYPES = {'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+def image_digest(data):
+    """Content address of image bytes: hex SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_image_digest(value):
+    return bool(value) and _DIGEST.match(value) is not None
+
+
+def image_relative_path(digest, rendition='original'):
+    """Path of a stored file below the store root, sharded by the digest's leading bytes"""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{_SUFFIXES[rendition]}'
+
+
+class StoredImage:
+    __slots__ = ('digest', 'format', 'width', 'height', 'size', 'created')
+
+    def __init__(self, digest, image_format, width, height, size, created=False):
+        self.digest = digest
+        self.format = image_format
+        self.width = width
+        self.height = height
+        self.size = size
+        self.created = created
+
+    def as_dict(self):
+        return {
+            'digest': self.digest,
+            'format': self.format,
+            'width': self.width,
+            'height': self.height,
+            'size': self.size
+        }
+
+
+class ImageStore:
+    """
+    Original uploads plus preview and thumbnail renditions, addressed by
+    the SHA-256 of the original bytes.
+
+    Files live under ``<root>/<d[0:2]>/<d[2:4]>/<digest>``, so identical
+    uploads are stored once and a stored file never changes. Renditions
+    are generated once, when the image is first written. The images table
+    holds one row per image; potholes reference it through image_digest
+    and SQLite triggers keep its refcount (see migration 7). Images whose
+    refcount has been 0 for longer than the grace period are removed by
+    collect_garbage.
+    """
+
+    def __init__(self, db_path, root=IMAGE_STORE_DIR, preview_side=IMAGE_PREVIEW_SIDE,
+                 thumbnail_side=IMAGE_THUMBNAIL_SIDE, quality=IMAGE_RENDITION_QUALITY):
+        self.db_path = db_path
+        self.root = root
+        self.preview_side = preview_side
+        self.thumbnail_side = thumbnail_side
+        self.quality = quality
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest, rendition='original'):
+        return os.path.join(self.root, image_relative_path(digest, rendition))
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def put(self, data, info=None):
+        """
+        Store encoded image bytes unless an identical image is stored already.
+
+        ``info`` is the ImageInfo from probing the upload, if at hand. A
+        repeat upload only restarts the image's garbage collection grace
+        period. Returns a StoredImage.
+        """
+        from utils.image_ingest import probe_image
+
+        digest = image_digest(data)
+        conn = self._connect()
+        try:
+            # This waits for a running collect_garbage batch, which then has
+            # either deleted the row (so the image is written again) or will
+            # see the image as recently stored
+            refreshed = conn.execute(
+                'UPDATE images SET released_at = CURRENT_TIMESTAMP WHERE digest = ?', (digest,)
+            ).rowcount
+            if refreshed:
+                row = conn.execute('SELECT format, width, height, size FROM images WHERE digest = ?',
+                                   (digest,)).fetchone()
+                if row and os.path.exists(self.path_for(digest, 'thumbnail')):
+                    IMAGE_STORE_WRITES.inc(result='deduplicated')
+                    return StoredImage(digest, *row)
+
+            info = info or probe_image(data)
+            self._write_files(digest, data, info)
+            with SQLITE_QUERY_SECONDS.time(query='store_image'):
+                conn.execute('''
+                    INSERT INTO images (digest, format, width, height, size) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (digest) DO UPDATE SET released_at = CURRENT_TIMESTAMP
+                ''', (digest, info.format, info.width, info.height, len(data)))
+        finally:
+            conn.close()
+
+        IMAGE_STORE_WRITES.inc(result='stored')
+        return StoredImage(digest, info.format, info.width, info.height, len(data), created=True)
+
+    def _write_files(self, digest, data, info):
+        import cv2
+        from utils.image_ingest import decode_for_model
+
+        # One decode at about preview size serves both renditions; JPEGs are
+        # scaled down by libjpeg while decoding
+        image, _ = decode_for_model(data, info, target_side=self.preview_side)
+        preview = self._fit(image, self.preview_side)
+        thumbnail = self._fit(preview, self.thumbnail_side)
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+
+        os.makedirs(os.path.dirname(self.path_for(digest)), exist_ok=True)
+        self._write_atomic(self.path_for(digest), data)
+        self._write_atomic(self.path_for(digest, 'preview'), cv2.imencode('.jpg', preview, params)[1])
+        # Written last: a thumbnail on disk means the whole set is there
+        self._write_atomic(self.path_for(digest, 'thumbnail'), cv2.imencode('.jpg', thumbnail, params)[1])
+
+    @staticmethod
+    def _fit(image, side):
+        import cv2
+
+        longest = max(image.shape[:2])
+        if longest <= side:
+            return image
+        scale = side / longest
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        directory = os.path.dirname(path)
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        except FileNotFoundError:
+            # Garbage collection removed the emptied shard meanwhile
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _remove_files(self, digest):
+        for rendition in RENDITIONS:
+            try:
+                os.unlink(self.path_for(digest, rendition))
+            except FileNotFoundError:
+                pass
+        # Drop the shard directories once empty
+        shard = os.path.dirname(self.path_for(digest))
+        for directory in (shard, os.path.dirname(shard)):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+
+    @SQLITE_QUERY_SECONDS.timed(query='collect_images')
+    def collect_garbage(self, grace_seconds=IMAGE_GC_GRACE, batch_size=IMAGE_GC_BATCH):
+        """
+        Delete images no pothole has referenced for ``grace_seconds``;
+        returns how many were removed.
+
+        Each batch deletes its rows and files inside one write transaction,
+        so a put() of the same image waits and then writes it afresh.
+        """
+        removed = 0
+        conn = self._connect()
+        try:
+            while True:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    digests = [row[0] for row in conn.execute('''
+                        SELECT digest FROM images
+                        WHERE refcount = 0 AND released_at <= datetime('now', ?)
+                        LIMIT ?
+                    ''', (f'-{int(grace_seconds)} seconds', batch_size))]
+                    conn.executemany('DELETE FROM images WHERE digest = ? AND refcount = 0',
+                                     [(digest,) for digest in digests])
+                    for digest in digests:
+                        self._remove_files(digest)
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+                removed += len(digests)
+                if len(digests) < batch_size:
+                    break
+        finally:
+            conn.close()
+
+        IMAGE_STORE_COLLECTED.inc(removed)
+        if removed:
+            logger.info("Collected %d unreferenced images", removed)
+        return removed
+
+    def remove_orphans(self, grace_seconds=IMAGE_GC_GRACE):
+        """
+        Delete files with no images row, left by a crash between writing
+        the files and the row; only files older than ``grace_seconds`` are
+        touched so writes in progress are safe. Returns files removed.
+        """
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        conn = self._connect()
+        try:
+            for directory, _, names in os.walk(self.root):
+                candidates = {}
+                for name in names:
+                    digest = name.lstrip('.').split('.', 1)[0]
+                    path = os.path.join(directory, name)
+                    if name.endswith('.tmp'):
+                        digest = None
+                    elif not is_image_digest(digest):
+                        continue
+                    try:
+                        if os.path.getmtime(path) < cutoff:
+                            candidates.setdefault(digest, []).append(path)
+                    except FileNotFoundError:
+                        pass
+
+                for digest, paths in candidates.items():
+                    if digest is not None and conn.execute(
+                            'SELECT 1 FROM images WHERE digest = ?', (digest,)).fetchone():
+                        continue
+                    for path in paths:
+                        try:
+                            os.unlink(path)
+                            removed += 1
+                        except FileNotFoundError:
+                            pass
+        finally:
+            conn.close()
+        return removed
+
+    def recount(self):
+        """Recompute every refcount from the potholes table; returns rows corrected"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                fixed = conn.execute('''
+                    UPDATE images SET
+                        refcount = (SELECT COUNT(*) FROM potholes WHERE image_digest = images.digest),
+                        released_at = CURRENT_TIMESTAMP
+                    WHERE refcount != (SELECT COUNT(*) FROM potholes WHERE image_digest = images.digest)
+                ''').rowcount
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return fixed
+
+    def get_stats(self):
+        conn = self._connect()
+        try:
+            images, total_bytes, unreferenced = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount = 0), 0) FROM images
+            ''').fetchone()
+        finally:
+            conn.close()
+        return {
+            'root': self.root,
+            'images': images,
+            'original_bytes': total_bytes,
+            'unreferenced': unreferenced,
+            'gc_grace_seconds': IMAGE_GC_GRACE
+        }
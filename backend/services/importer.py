@@ -0,0 +1,379 @@
+import os
+import csv
+import json
+import time
+import sqlite3
+from datetime import datetime, timezone
+
+from services.detection_codec import encode_detection
+from services.migrations import run_migrations
+from services.severity import IMPORTED_SEVERITY_VERSION, SEVERITY_LEVELS
+from services.spatial_index import grid_cell
+from utils.structured_logging import get_logger
+
+logger = get_logger('importer')
+
+IMPORT_FORMATS = ('csv', 'geojson', 'parquet')
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Rows committed per transaction; large transactions keep journal syncs rare.
+# An online import keeps them shorter so the app's writers are not held off
+# for long, an offline one has the database to itself.
+ROWS_PER_TRANSACTION = 20000
+OFFLINE_ROWS_PER_TRANSACTION = 200000
+
+# Accepted source field names for each pothole column, first match wins
+FIELD_ALIASES = {
+    'latitude': ('latitude', 'lat', 'y'),
+    'longitude': ('longitude', 'lon', 'lng', 'long', 'x'),
+    'severity': ('severity', 'severity_level', 'priority'),
+    'confidence': ('confidence', 'score', 'probability'),
+    'size': ('size', 'area', 'size_px'),
+    'timestamp': ('timestamp', 'reported_at', 'date', 'datetime', 'created_at', 'time'),
+    'address': ('address', 'location', 'street'),
+    'external_id': ('id', 'external_id', 'report_id', 'objectid')
+}
+
+# Other agencies' severity vocabularies, mapped onto ours
+SEVERITY_ALIASES = {
+    'low': 'low', 'minor': 'low', 'small': 'low', '1': 'low',
+    'medium': 'medium', 'moderate': 'medium', 'med': 'medium', '2': 'medium',
+    'high': 'high', 'severe': 'high', 'major': 'high', 'critical': 'high', 'large': 'high', '3': 'high'
+}
+
+def detect_format(path):
+    """Import format from a file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.csv', '.txt'):
+        return 'csv'
+    if extension in ('.geojson', '.json', '.geojsonl', '.geojsons', '.ndjson'):
+        return 'geojson'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"Cannot tell the format of {path}; pass one of: {', '.join(IMPORT_FORMATS)}")
+
+
+def _chunked(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_csv(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from _chunked(csv.DictReader(f), chunk_size)
+
+
+def _feature_record(feature):
+    record = dict(feature.get('properties') or {})
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') == 'Point' and len(geometry.get('coordinates') or []) >= 2:
+        record['longitude'], record['latitude'] = geometry['coordinates'][:2]
+    return record
+
+
+def read_geojson(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    GeoJSON records, from line-delimited features (streamed) or a
+    FeatureCollection (which json has to load whole).
+    """
+    with open(path, encoding='utf-8') as f:
+        head = f.read(4096)
+        f.seek(0)
+        if '"FeatureCollection"' in head:
+            features = json.load(f).get('features', [])
+            yield from _chunked((_feature_record(feature) for feature in features), chunk_size)
+            return
+
+        def features():
+            for line in f:
+                line = line.strip().lstrip('\x1e')
+                if line:
+                    yield _feature_record(json.loads(line))
+
+        yield from _chunked(features(), chunk_size)
+
+
+def read_parquet(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+_READERS = {'csv': read_csv, 'geojson': read_geojson, 'parquet': read_parquet}
+
+
+def _resolve_fields(record_keys):
+    """Map our column names to the source's field names"""
+    lowered = {key.lower().strip(): key for key in record_keys}
+    resolved = {}
+    for column, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                resolved[column] = lowered[alias]
+                break
+    return resolved
+
+
+def _parse_timestamp(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)):
+        # Epoch seconds, or milliseconds from JavaScript-based exports
+        seconds = value / 1000 if value > 1e11 else value
+        parsed = datetime.fromtimestamp(seconds, timezone.utc)
+    else:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec='seconds')
+
+
+class ImportReport:
+    """Counts from one import run"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = {}
+        self.severity_counts = {level: 0 for level in SEVERITY_LEVELS}
+        self.seconds = 0.0
+
+    def reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'rejected': sum(self.rejected.values()),
+            'rejected_by_reason': self.rejected,
+            'severity_counts': self.severity_counts,
+            'seconds': round(self.seconds, 2)
+        }
+
+
+class PotholeImporter:
+    """
+    Bulk loader for pothole datasets from other sources.
+
+    Rows are validated and normalized per chunk and inserted with
+    executemany in large transactions. By default the import runs next to
+    a live app: indexes stay in place and writes are synced as usual. With
+    ``offline=True`` it takes an exclusive lock on the database for the
+    whole run, so no other connection can read or write it, drops the
+    potholes indexes for the load and rebuilds them once after it, and
+    skips fsyncs (back the file up first). Imported rows keep their source
+    severity (their box sizes are not in pixels, so the severity engine
+    must not rescore them) and are not merged with nearby reports.
+    """
+
+    def __init__(self, db_path, user_id='import', source=None, chunk_size=DEFAULT_CHUNK_SIZE, offline=False):
+        self.db_path = db_path
+        self.user_id = user_id
+        self.source = source
+        self.chunk_size = chunk_size
+        self.offline = offline
+
+    def normalize(self, records, report):
+        """Validated pothole rows for one chunk of source records"""
+        if not records:
+            return []
+
+        fields = _resolve_fields(records[0].keys())
+        lat_key, lng_key = fields.get('latitude'), fields.get('longitude')
+        if lat_key is None or lng_key is None:
+            report.read += len(records)
+            report.rejected['missing_coordinates'] = report.rejected.get('missing_coordinates', 0) + len(records)
+            return []
+
+        severity_key = fields.get('severity')
+        confidence_key = fields.get('confidence')
+        size_key = fields.get('size')
+        timestamp_key = fields.get('timestamp')
+        address_key = fields.get('address')
+        external_key = fields.get('external_id')
+        imported_at = datetime.now().isoformat(timespec='seconds')
+        image_path = f"import:{self.source}" if self.source else None
+
+        rows = []
+        for record in records:
+            report.read += 1
+            try:
+                latitude = float(record[lat_key])
+                longitude = float(record[lng_key])
+            except (KeyError, TypeError, ValueError):
+                report.reject('invalid_coordinates')
+                continue
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (latitude == 0 and longitude == 0):
+                report.reject('coordinates_out_of_range')
+                continue
+
+            severity = 'medium'
+            if severity_key and record.get(severity_key) not in (None, ''):
+                severity = SEVERITY_ALIASES.get(str(record[severity_key]).strip().lower())
+                if severity is None:
+                    report.reject('unknown_severity')
+                    continue
+
+            try:
+                confidence = float(record[confidence_key]) if confidence_key and record.get(confidence_key) not in (None, '') else 1.0
+                size = float(record[size_key]) if size_key and record.get(size_key) not in (None, '') else 0.0
+                timestamp = _parse_timestamp(record.get(timestamp_key)) if timestamp_key else None
+            except (TypeError, ValueError, OverflowError, OSError):
+                report.reject('invalid_value')
+                continue
+            confidence = min(max(confidence, 0.0), 1.0)
+            timestamp = timestamp or imported_at
+
+            source_data = {'source': self.source, 'external_id': record.get(external_key) if external_key else None}
+            rows.append((
+                self.user_id, latitude, longitude, severity, confidence, size, timestamp,
+                image_path, record.get(address_key) if address_key else None,
+                encode_detection(source_data), IMPORTED_SEVERITY_VERSION,
+                grid_cell(latitude, longitude), confidence, timestamp
+            ))
+            report.severity_counts[severity] += 1
+
+        return rows
+
+    def _drop_indexes(self, conn):
+        """Drop the potholes indexes, returning their SQL for rebuilding"""
+        indexes = conn.execute('''
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = 'potholes' AND sql IS NOT NULL
+        ''').fetchall()
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        return [sql for _, sql in indexes]
+
+    def _attribute_reports(self, conn, after_id, session_id):
+        """pothole_reports rows for the potholes inserted after ``after_id``; returns the new last id"""
+        conn.execute('''
+            INSERT INTO pothole_reports (pothole_id, user_id, session_id, timestamp)
+            SELECT id, user_id, ?, COALESCE(timestamp, CURRENT_TIMESTAMP) FROM potholes WHERE id > ?
+        ''', (session_id, after_id))
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM potholes').fetchone()[0]
+
+    def _update_aggregates(self, conn, report, session_id):
+        """Account for the whole import once: a session row and the importing user's statistics"""
+        weights = {'low': 1, 'medium': 2, 'high': 3}
+        avg_severity = (sum(weights[level] * count for level, count in report.severity_counts.items())
+                        / report.imported) if report.imported else 0
+
+        conn.execute('INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)', (self.user_id, self.user_id))
+        conn.execute('INSERT OR IGNORE INTO user_statistics (user_id) VALUES (?)', (self.user_id,))
+        conn.execute('''
+            INSERT INTO detection_sessions (session_id, user_id, total_potholes, avg_severity, area_coverage)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, self.user_id, report.imported, round(avg_severity, 3), self.source or 'import'))
+        conn.execute('UPDATE users SET total_reports = total_reports + ? WHERE user_id = ?',
+                     (report.imported, self.user_id))
+        conn.execute('''
+            UPDATE user_statistics
+            SET total_reports = total_reports + ?,
+                high_severity_reports = high_severity_reports + ?,
+                medium_severity_reports = medium_severity_reports + ?,
+                low_severity_reports = low_severity_reports + ?,
+                last_activity = ?
+            WHERE user_id = ?
+        ''', (report.imported, report.severity_counts['high'], report.severity_counts['medium'],
+              report.severity_counts['low'], datetime.now(), self.user_id))
+
+    def import_chunks(self, chunks, dry_run=False):
+        """Load chunks of source records (lists of dicts); returns an ImportReport"""
+        report = ImportReport()
+        start = time.perf_counter()
+
+        if dry_run:
+            for records in chunks:
+                report.imported += len(self.normalize(records, report))
+            report.seconds = time.perf_counter() - start
+            return report
+
+        # Bring older databases up to the schema the rows are written for
+        run_migrations(self.db_path)
+
+        # Autocommit mode; transactions are managed explicitly below
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        index_sql = []
+        rows_per_transaction = OFFLINE_ROWS_PER_TRANSACTION if self.offline else ROWS_PER_TRANSACTION
+        try:
+            conn.execute('PRAGMA synchronous = OFF' if self.offline else 'PRAGMA synchronous = NORMAL')
+            conn.execute('PRAGMA temp_store = MEMORY')
+            conn.execute('PRAGMA cache_size = -200000')
+
+            if self.offline:
+                # Held until the connection closes, so nobody sees the table without its indexes
+                conn.execute('PRAGMA locking_mode = EXCLUSIVE')
+                conn.execute('BEGIN EXCLUSIVE')
+                index_sql = self._drop_indexes(conn)
+            else:
+                conn.execute('BEGIN IMMEDIATE')
+            pending = 0
+            session_id = f"import_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM potholes').fetchone()[0]
+
+            for records in chunks:
+                rows = self.normalize(records, report)
+                conn.executemany('''
+                    INSERT INTO potholes
+                    (user_id, latitude, longitude, severity, confidence, size, timestamp,
+                     image_path, address, detection_data, severity_version,
+                     grid_cell, confidence_sum, last_reported)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                last_id = self._attribute_reports(conn, last_id, session_id)
+                report.imported += len(rows)
+                pending += len(rows)
+
+                if pending >= rows_per_transaction:
+                    conn.execute('COMMIT')
+                    conn.execute('BEGIN IMMEDIATE')
+                    pending = 0
+                    logger.info("Imported %d rows so far", report.imported)
+
+            self._update_aggregates(conn, report, session_id)
+            conn.execute('COMMIT')
+            if not index_sql:
+                conn.execute('ANALYZE potholes')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            try:
+                if index_sql:
+                    # Indexes are built once over the loaded table instead of per
+                    # row, and are never left dropped, whether or not the load finished
+                    conn.execute('BEGIN IMMEDIATE')
+                    for sql in index_sql:
+                        conn.execute(sql.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1))
+                    conn.execute('ANALYZE potholes')
+                    conn.execute('COMMIT')
+            finally:
+                conn.close()
+
+        report.seconds = time.perf_counter() - start
+        logger.info("Imported %d potholes (%d rejected) in %.1fs",
+                    report.imported, sum(report.rejected.values()), report.seconds)
+        return report
+
+    def import_file(self, path, file_format=None, dry_run=False):
+        """Import a CSV, GeoJSON (FeatureCollection or line-delimited) or Parquet file"""
+        file_format = file_format or detect_format(path)
+        if file_format not in _READERS:
+            raise ValueError(f"Unsupported import format: {file_format}")
+        if self.source is None:
+            self.source = os.path.basename(path)
+        return self.import_chunks(_READERS[file_format](path, self.chunk_size), dry_run=dry_run)
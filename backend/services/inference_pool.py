@@ -0,0 +1,466 @@
+import os
+import time
+import queue
+import threading
+import itertools
+import atexit
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from concurrent.futures import Future
+
+from services.admission import DeadlineExceeded
+from utils.structured_logging import get_logger, flush_logging, is_log_writer
+
+logger = get_logger('inference_pool')
+
+# A worker that dies within this many seconds of starting is respawned only
+# after a pause that doubles with each such death, up to RESPAWN_MAX_DELAY
+RESPAWN_MIN_UPTIME = 5.0
+RESPAWN_MAX_DELAY = 30.0
+
+# Detector handed to forked workers. Set in the parent right before the workers
+# are started so that the model weights are shared copy-on-write instead of
+# being loaded again by every worker.
+_inherited_detector = None
+
+
+class WorkerDied(RuntimeError):
+    """The worker process running a job exited before returning its result"""
+
+
+def _available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _split_cores(num_workers, cores=None):
+    """Split ``cores`` (default: the CPUs this process may run on) into one contiguous set per worker"""
+    cores = list(cores) if cores else _available_cores()
+
+    if num_workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(num_workers)]
+
+    per_worker = len(cores) // num_workers
+    extra = len(cores) % num_workers
+    groups = []
+    start = 0
+    for i in range(num_workers):
+        size = per_worker + (1 if i < extra else 0)
+        groups.append(cores[start:start + size])
+        start += size
+    return groups
+
+
+def core_share(index, count):
+    """The contiguous range of cores that belongs to pool ``index`` of ``count`` on this machine"""
+    return _split_cores(count)[index % count]
+
+
+def _limit_threads(threads):
+    """Cap the intra-op thread pools of every runtime the worker may use"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except Exception:
+        pass
+
+
+def _worker_main(worker_index, cores, threads, model_path, shm_name, slot_size,
+                 task_conn, result_conn):
+    """Inference worker loop: decode an image from its shared slot and run detection"""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+    _limit_threads(threads)
+
+    import numpy as np
+    from utils.image_ingest import decode_for_model, scale_to_original
+
+    detector = _inherited_detector
+    if detector is None:
+        from model.pothole_detector import PotholeDetector
+        detector = PotholeDetector(model_path)
+
+    # Forked and spawned workers both report to the parent's resource tracker,
+    # so the buffers are unlinked once, by the parent
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        while True:
+            try:
+                task = task_conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+
+            job_id, slot, nbytes, deadline = task
+            if deadline is not None and time.time() >= deadline:
+                # Nobody is waiting for this one any more
+                result_conn.send((job_id, None, 'deadline passed in the inference queue'))
+                continue
+            try:
+                encoded = np.frombuffer(shm.buf, dtype=np.uint8, count=nbytes,
+                                        offset=slot * slot_size)
+                # Decoded at roughly model resolution; boxes are mapped back
+                image, info = decode_for_model(encoded)
+                del encoded
+
+                result = scale_to_original(detector.detect(image), image, info)
+                result_conn.send((job_id, True, result))
+            except Exception as e:
+                result_conn.send((job_id, False, str(e)))
+    finally:
+        shm.close()
+        flush_logging()
+
+
+class _Worker:
+    """A worker process, its task and result pipes and the jobs it holds"""
+
+    def __init__(self, index, cores):
+        self.index = index
+        self.cores = cores
+        self.process = None
+        self.task_conn = None
+        self.result_conn = None
+        self.send_lock = threading.Lock()
+        self.jobs = set()
+        self.alive = False
+        self.started_at = 0.0
+        self.respawn_delay = 0.0
+        self.respawn_at = None
+
+
+class InferencePool:
+    """Pool of inference worker processes fed through shared-memory image buffers.
+
+    Each worker is pinned to its own subset of cores and runs its own
+    torch/ORT thread pool, so pre/post-processing no longer serializes on the
+    web process's GIL. Images are copied once into a fixed-size shared memory
+    slot and decoded by the worker; only the small result dict travels back.
+
+    Every worker has its own task and result pipe, so the pool knows which
+    jobs each one holds and no lock is shared between workers. The
+    collector thread waits on the result pipes and the workers' sentinels
+    together: when a worker dies (OOM kill, crash in native code) its jobs
+    fail with WorkerDied, their slots are freed and the worker is respawned.
+    """
+
+    def __init__(self, detector=None, model_path=None, num_workers=None,
+                 threads_per_worker=None, slot_size=16 * 1024 * 1024, slots_per_worker=2, cores=None):
+        self.detector = detector
+        self.model_path = model_path or getattr(detector, 'model_path', None)
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // 4)
+        self.threads_per_worker = threads_per_worker
+        # Cores the workers are pinned to; several pools on one machine get disjoint ranges
+        self.cores = cores
+        self.slot_size = slot_size
+        self.num_slots = self.num_workers * slots_per_worker
+
+        self.total_detections = 0
+        self.completed_jobs = 0
+        self.failed_jobs = 0
+        self.expired_jobs = 0
+        self.worker_deaths = 0
+
+        self._fork_initial = False
+        self._workers = []
+        self._shm = None
+        self._free_slots = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        self._wake_reader = None
+        self._wake_writer = None
+        self._collector = None
+        self._started = False
+
+    def start(self):
+        """Allocate the shared buffers and spawn the worker processes"""
+        if self._started:
+            return
+
+        # Forking shares the loaded model copy-on-write, but a child forked
+        # while other threads run can inherit a lock one of them holds. So
+        # fork only while the main thread is alone (gunicorn's post_fork) but
+        # for the log writer, which children restart; a lazy start from a
+        # request thread spawns fresh interpreters.
+        self._fork_initial = (
+            'fork' in mp.get_all_start_methods()
+            and threading.current_thread() is threading.main_thread()
+            and all(thread is threading.main_thread() or is_log_writer(thread)
+                    for thread in threading.enumerate())
+        )
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.num_slots)
+        for slot in range(self.num_slots):
+            self._free_slots.put(slot)
+
+        self._workers = [_Worker(index, cores) for index, cores in enumerate(_split_cores(self.num_workers, self.cores))]
+        for worker in self._workers:
+            self._spawn(worker, fork=self._fork_initial)
+
+        self._wake_reader, self._wake_writer = mp.Pipe(duplex=False)
+        self._started = True
+        self._collector = threading.Thread(target=self._collect_results,
+                                           name="inference-results", daemon=True)
+        self._collector.start()
+        atexit.register(self.shutdown)
+        logger.info("Inference pool started: %d workers, %d image slots", self.num_workers, self.num_slots)
+
+    def _spawn(self, worker, fork=False):
+        global _inherited_detector
+
+        ctx = mp.get_context('fork' if fork else 'spawn')
+        task_reader, task_writer = ctx.Pipe(duplex=False)
+        result_reader, result_writer = ctx.Pipe(duplex=False)
+        if fork:
+            _inherited_detector = self.detector
+        try:
+            process = ctx.Process(
+                target=_worker_main,
+                args=(worker.index, worker.cores, self.threads_per_worker or len(worker.cores),
+                      self.model_path, self._shm.name, self.slot_size, task_reader, result_writer),
+                name=f"inference-worker-{worker.index}",
+                daemon=True
+            )
+            process.start()
+        finally:
+            _inherited_detector = None
+        # The worker's ends now live in the worker
+        task_reader.close()
+        result_writer.close()
+
+        with self._pending_lock:
+            worker.process = process
+            worker.task_conn = task_writer
+            worker.result_conn = result_reader
+            worker.started_at = time.monotonic()
+            worker.respawn_at = None
+            worker.alive = True
+
+    def _acquire_slot(self, timeout):
+        try:
+            return self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Inference pool is busy, no free image slot")
+
+    def _dispatch(self, slot, nbytes, deadline=None):
+        future = Future()
+        # Once sent the job cannot be withdrawn, so the Future cannot be cancelled
+        future.set_running_or_notify_cancel()
+        job_id = next(self._job_ids)
+        with self._pending_lock:
+            alive = [worker for worker in self._workers if worker.alive]
+            if not alive:
+                self._free_slots.put(slot)
+                raise RuntimeError("No inference worker is running")
+            # The least busy worker; its pipe is its queue
+            worker = min(alive, key=lambda w: len(w.jobs))
+            worker.jobs.add(job_id)
+            self._pending[job_id] = (future, slot, worker)
+        try:
+            with worker.send_lock:
+                worker.task_conn.send((job_id, slot, nbytes, deadline))
+        except OSError:
+            # Died meanwhile; the collector fails the job with the worker's others
+            pass
+        return future
+
+    def submit_bytes(self, data, timeout=None, deadline=None):
+        """
+        Queue an encoded image held in memory; returns a Future of the result dict.
+
+        A job still queued at ``deadline`` (epoch seconds) is skipped by the
+        worker and its Future fails with DeadlineExceeded.
+        """
+        if len(data) > self.slot_size:
+            raise ValueError(f"Image too large for inference pool ({len(data)} bytes)")
+
+        slot = self._acquire_slot(timeout)
+        start = slot * self.slot_size
+        self._shm.buf[start:start + len(data)] = data
+        return self._dispatch(slot, len(data), deadline)
+
+    def submit_file(self, image_path, timeout=None):
+        """Queue an image file, reading it straight into its shared slot"""
+        nbytes = os.path.getsize(image_path)
+        if nbytes > self.slot_size:
+            raise ValueError(f"Image too large for inference pool ({nbytes} bytes)")
+
+        slot = self._acquire_slot(timeout)
+        start = slot * self.slot_size
+        try:
+            with open(image_path, 'rb') as f:
+                f.readinto(self._shm.buf[start:start + nbytes])
+        except Exception:
+            self._free_slots.put(slot)
+            raise
+        return self._dispatch(slot, nbytes)
+
+    def detect(self, image_path, timeout=None):
+        """Run detection on an image file in the pool and wait for the result"""
+        return self.submit_file(image_path, timeout=timeout).result(timeout=timeout)
+
+    def _collect_results(self):
+        while self._started:
+            with self._pending_lock:
+                workers = list(self._workers)
+            waitables = {self._wake_reader: None}
+            for worker in workers:
+                if worker.alive:
+                    waitables[worker.result_conn] = worker
+                    waitables[worker.process.sentinel] = worker
+
+            due = [worker.respawn_at for worker in workers if worker.respawn_at is not None]
+            timeout = max(0.0, min(due) - time.monotonic()) if due else None
+            for ready in wait(list(waitables), timeout):
+                worker = waitables[ready]
+                if worker is None:
+                    self._wake_reader.recv()
+                elif ready is worker.result_conn:
+                    self._drain(worker)
+                elif worker.alive:
+                    self._worker_died(worker)
+
+            if self._started:
+                now = time.monotonic()
+                for worker in workers:
+                    if worker.respawn_at is not None and worker.respawn_at <= now:
+                        self._respawn(worker)
+
+    def _drain(self, worker):
+        """Handle every result waiting in a worker's pipe"""
+        try:
+            while worker.result_conn.poll():
+                self._handle_result(worker, *worker.result_conn.recv())
+        except (EOFError, OSError):
+            pass
+
+    def _handle_result(self, worker, job_id, ok, payload):
+        with self._pending_lock:
+            future, slot, _ = self._pending.pop(job_id, (None, None, None))
+            worker.jobs.discard(job_id)
+        if slot is not None:
+            self._free_slots.put(slot)
+        if future is None:
+            return
+
+        if ok is None:
+            self.expired_jobs += 1
+            future.set_exception(DeadlineExceeded(payload))
+        elif ok:
+            self.completed_jobs += 1
+            self.total_detections += payload.get('total_detections', 0)
+            payload['inference_worker'] = worker.index
+            future.set_result(payload)
+        else:
+            self.failed_jobs += 1
+            future.set_exception(RuntimeError(payload))
+
+    def _worker_died(self, worker):
+        """Fail a dead worker's jobs, free their slots and schedule its respawn"""
+        # Results it sent before dying are still good
+        self._drain(worker)
+        worker.process.join()
+        with self._pending_lock:
+            worker.alive = False
+            lost = [self._pending.pop(job_id) for job_id in worker.jobs if job_id in self._pending]
+            worker.jobs.clear()
+        worker.task_conn.close()
+        worker.result_conn.close()
+
+        self.worker_deaths += 1
+        self.failed_jobs += len(lost)
+        for future, slot, _ in lost:
+            self._free_slots.put(slot)
+            future.set_exception(WorkerDied(
+                f"Inference worker {worker.index} exited with code {worker.process.exitcode}"))
+
+        # A worker that keeps dying right after starting is retried less and less often
+        if time.monotonic() - worker.started_at < RESPAWN_MIN_UPTIME:
+            worker.respawn_delay = min(RESPAWN_MAX_DELAY, max(1.0, worker.respawn_delay * 2))
+        else:
+            worker.respawn_delay = 0.0
+        worker.respawn_at = time.monotonic() + worker.respawn_delay
+        logger.error("Inference worker %d exited with code %s, %d jobs failed; respawning in %.0fs",
+                     worker.index, worker.process.exitcode, len(lost), worker.respawn_delay)
+
+    def _respawn(self, worker):
+        # Runs on the collector thread, so the replacement is spawned, never
+        # forked, and loads the model from model_path itself
+        try:
+            self._spawn(worker)
+        except Exception:
+            logger.exception("Could not respawn inference worker %d", worker.index)
+            worker.respawn_delay = min(RESPAWN_MAX_DELAY, max(1.0, worker.respawn_delay * 2))
+            worker.respawn_at = time.monotonic() + worker.respawn_delay
+
+    def queue_depth(self):
+        """Number of images dispatched to the pool that have not come back yet"""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def get_stats(self):
+        """Get pool statistics"""
+        return {
+            'workers': self.num_workers,
+            'workers_alive': sum(1 for w in self._workers if w.alive and w.process.is_alive()),
+            'worker_deaths': self.worker_deaths,
+            'image_slots': self.num_slots,
+            'queue_depth': self.queue_depth(),
+            'completed_jobs': self.completed_jobs,
+            'failed_jobs': self.failed_jobs,
+            'expired_jobs': self.expired_jobs,
+            'total_detections': self.total_detections
+        }
+
+    def shutdown(self, timeout=5):
+        """Stop the workers and release the shared buffers"""
+        if not self._started:
+            return
+        self._started = False
+        self._wake_writer.send(None)
+        self._collector.join(timeout)
+
+        for worker in self._workers:
+            if worker.alive:
+                try:
+                    with worker.send_lock:
+                        worker.task_conn.send(None)
+                except OSError:
+                    pass
+        for worker in self._workers:
+            if worker.alive:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                worker.alive = False
+                worker.task_conn.close()
+                worker.result_conn.close()
+        self._workers = []
+
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future, _, _ in pending:
+            future.set_exception(RuntimeError("Inference pool shut down"))
+
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -1,4 +1,3 @@
-import json
 import os
 from datetime import datetime, timedelta
 import sqlite3
@@ -6,6 +5,57 @@ from typing import List, Dict, Any
 import uuid
 import hashlib
 import secrets
+import threading
+
+from services.metrics import SQLITE_QUERY_SECONDS
+from services.detection_codec import decode_detection, encode_detection
+from services.image_store import image_relative_path
+from services.migrations import run_migrations
+from services.session_reaper import trim_user_sessions
+from services.spatial_index import DEDUP_WINDOW_DAYS, grid_cell, neighbour_cells, match_reports
+from utils.structured_logging import get_logger
+
+logger = get_logger('map_service')
+
+# Queries on hot request paths. check_query_plans.py asserts that each is
+# answered from an index rather than a full table scan.
+VALIDATE_SESSION_SQL = '''
+    SELECT us.user_id, us.expires_at, u.username, u.email, u.role
+    FROM user_sessions us
+    JOIN users u ON us.user_id = u.user_id
+    WHERE us.session_token = ? AND us.expires_at > ? AND u.is_active = 1
+'''
+
+# Per-user history comes from pothole_reports: potholes.user_id only names
+# the first reporter of a pothole other users' reports were merged into
+USER_POTHOLES_SQL = '''
+    SELECT p.id, p.latitude, p.longitude, p.severity, p.confidence, p.size, r.timestamp
+    FROM pothole_reports r
+    JOIN potholes p ON p.id = r.pothole_id
+    WHERE r.user_id = ?
+    ORDER BY r.timestamp DESC
+'''
+
+RECENT_POTHOLES_SQL = '''
+    SELECT
+        p.id, p.latitude, p.longitude, p.severity, p.confidence,
+        p.size, p.timestamp, p.user_id, u.total_reports, p.report_count
+    FROM potholes p
+    LEFT JOIN users u ON p.user_id = u.user_id
+    ORDER BY p.timestamp DESC
+    LIMIT ?
+'''
+
+USER_SEVERITY_COUNTS_SQL = '''
+    SELECT
+        COUNT(*) as total,
+        SUM(CASE WHEN p.severity = 'high' THEN 1 ELSE 0 END) as high,
+        SUM(CASE WHEN p.severity = 'medium' THEN 1 ELSE 0 END) as medium,
+        SUM(CASE WHEN p.severity = 'low' THEN 1 ELSE 0 END) as low
+    FROM pothole_reports r
+    JOIN potholes p ON p.id = r.pothole_id
+    WHERE r.user_id = ?
+'''
 
 class PotholeMapService:
     def __init__(self, db_path='pothole_data.db'):
@@ -13,100 +63,15 @@ class PotholeMapService:
         self.init_database()
     
     def init_database(self):
-        """Initialize SQLite database with user authentication - FIXED SCHEMA"""
+        """Bring the schema up to date with the migration runner, then seed test users"""
         os.makedirs('data', exist_ok=True)
         
+        version = run_migrations(self.db_path)
+        logger.info("Database schema at version %d", version)
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Enhanced Users table with authentication - FIXED COLUMNS
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE,
-                username TEXT UNIQUE,
-                password_hash TEXT,
-                salt TEXT,
-                role TEXT DEFAULT 'user',
-                is_active BOOLEAN DEFAULT 1,
-                email_verified BOOLEAN DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_login DATETIME,
-                ip_address TEXT,
-                user_agent TEXT,
-                total_reports INTEGER DEFAULT 0,
-                reputation_points INTEGER DEFAULT 0,  -- FIXED: consistent naming
-                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,  -- ADDED
-                last_active DATETIME DEFAULT CURRENT_TIMESTAMP   -- ADDED
-            )
-        ''')
-        
-        # Sessions table for login sessions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_token TEXT UNIQUE NOT NULL,
-                user_id TEXT NOT NULL,
-                expires_at DATETIME NOT NULL,
-                ip_address TEXT,
-                user_agent TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # Potholes table with proper user association
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS potholes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                severity TEXT NOT NULL,
-                confidence REAL NOT NULL,
-                size REAL NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                image_path TEXT,
-                address TEXT,
-                road_condition TEXT,
-                annotated_image_path TEXT,
-                detection_data TEXT,
-                is_verified BOOLEAN DEFAULT 0,
-                verification_score INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # Detection sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS detection_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                user_id TEXT NOT NULL,
-                total_potholes INTEGER DEFAULT 0,
-                avg_severity REAL DEFAULT 0,
-                area_coverage TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        # User stats table for better analytics - FIXED COLUMNS
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_statistics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT UNIQUE NOT NULL,
-                total_reports INTEGER DEFAULT 0,
-                high_severity_reports INTEGER DEFAULT 0,
-                medium_severity_reports INTEGER DEFAULT 0,
-                low_severity_reports INTEGER DEFAULT 0,
-                reputation_points INTEGER DEFAULT 0,  -- FIXED: consistent naming
-                last_activity DATETIME,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
         # CREATE TEST USERS - ADDED THIS SECTION
         test_users = [
             ('demo@example.com', 'demo', 'demo123'),
@@ -132,11 +97,11 @@ class PotholeMapService:
                     INSERT INTO user_statistics (user_id) VALUES (?)
                 ''', (user_id,))
                 
-                print(f"✅ Created test user: {email}")
+                logger.info("Created test user: %s", email)
         
         conn.commit()
         conn.close()
-        print("✅ Database initialized successfully with test users!")
+        logger.info("Database initialized with test users")
     
     # =========================================================================
     # USER AUTHENTICATION METHODS - FIXED VERSION
@@ -161,6 +126,7 @@ class PotholeMapService:
         test_hash, _ = self.hash_password(password, salt)
         return test_hash == password_hash
     
+    @SQLITE_QUERY_SECONDS.timed(query='create_user')
     def create_user(self, email, username, password, ip_address=None, user_agent=None):
         """Create new user account - FIXED VERSION"""
         conn = sqlite3.connect(self.db_path)
@@ -190,15 +156,16 @@ class PotholeMapService:
             
             conn.commit()
             conn.close()
-            print(f"✅ New user created: {email}")
+            logger.info("New user created: %s", email)
             return user_id, None
             
         except Exception as e:
             conn.rollback()
             conn.close()
-            print(f"❌ Error creating user {email}: {str(e)}")
+            logger.exception("Error creating user %s", email)
             return None, f"Error creating user: {str(e)}"
     
+    @SQLITE_QUERY_SECONDS.timed(query='authenticate_user')
     def authenticate_user(self, email, password, ip_address=None, user_agent=None):
         """Authenticate user and create session - FIXED VERSION"""
         conn = sqlite3.connect(self.db_path)
@@ -213,7 +180,7 @@ class PotholeMapService:
         user = cursor.fetchone()
         if not user:
             conn.close()
-            print(f"❌ User not found: {email}")
+            logger.debug("User not found: %s", email)
             return None, "Invalid email or password"
         
         user_id, stored_hash, salt, username, user_email, is_active = user
@@ -225,7 +192,7 @@ class PotholeMapService:
         # Verify password
         if not self.verify_password(password, stored_hash, salt):
             conn.close()
-            print(f"❌ Invalid password for: {email}")
+            logger.debug("Invalid password for: %s", email)
             return None, "Invalid email or password"
         
         try:
@@ -244,6 +211,9 @@ class PotholeMapService:
                 VALUES (?, ?, ?, ?, ?)
             ''', (session_token, user_id, expires_at, ip_address, user_agent))
             
+            # Keep the session table bounded: drop this user's oldest sessions over the cap
+            trim_user_sessions(cursor, user_id)
+            
             # Get user statistics for response - FIXED QUERY
             cursor.execute('''
                 SELECT total_reports, reputation_points FROM user_statistics WHERE user_id = ?
@@ -264,26 +234,21 @@ class PotholeMapService:
                 }
             }
             
-            print(f"✅ Login successful for: {email}")
             return user_data, None
             
         except Exception as e:
             conn.rollback()
             conn.close()
-            print(f"❌ Authentication error for {email}: {str(e)}")
+            logger.exception("Authentication error for %s", email)
             return None, f"Authentication error: {str(e)}"
     
+    @SQLITE_QUERY_SECONDS.timed(query='validate_session')
     def validate_session(self, session_token):
         """Validate user session"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT us.user_id, us.expires_at, u.username, u.email, u.role
-            FROM user_sessions us
-            JOIN users u ON us.user_id = u.user_id
-            WHERE us.session_token = ? AND us.expires_at > ? AND u.is_active = 1
-        ''', (session_token, datetime.now()))
+        cursor.execute(VALIDATE_SESSION_SQL, (session_token, datetime.now()))
         
         session = cursor.fetchone()
         conn.close()
@@ -297,6 +262,7 @@ class PotholeMapService:
             }
         return None
     
+    @SQLITE_QUERY_SECONDS.timed(query='logout_user')
     def logout_user(self, session_token):
         """Invalidate user session"""
         conn = sqlite3.connect(self.db_path)
@@ -306,14 +272,15 @@ class PotholeMapService:
             cursor.execute('DELETE FROM user_sessions WHERE session_token = ?', (session_token,))
             conn.commit()
             conn.close()
-            print(f"✅ User logged out")
+            logger.debug("User logged out")
             return True
         except Exception as e:
             conn.rollback()
             conn.close()
-            print(f"❌ Error logging out user: {e}")
+            logger.exception("Error logging out user")
             return False
     
+    @SQLITE_QUERY_SECONDS.timed(query='get_user_profile')
     def get_user_profile(self, user_id):
         """Get complete user profile - FIXED VERSION"""
         conn = sqlite3.connect(self.db_path)
@@ -353,6 +320,7 @@ class PotholeMapService:
     # EXISTING METHODS (updated for consistency)
     # =========================================================================
     
+    @SQLITE_QUERY_SECONDS.timed(query='get_or_create_user')
     def get_or_create_user(self, request):
         """Get or create user based on request data"""
         user_id = request.cookies.get('user_id')
@@ -401,14 +369,24 @@ class PotholeMapService:
         conn.close()
         return user_id
     
+    @SQLITE_QUERY_SECONDS.timed(query='save_pothole_data')
     def save_pothole_data(self, detection_data: Dict[str, Any], user_id: str, request=None):
-        """Save pothole detection data to database with user association"""
+        """Save pothole detection data to database with user association
+        
+        A detection within DEDUP_RADIUS_M of a pothole reported in the last
+        DEDUP_WINDOW_DAYS is merged into that row (report count, confidence
+        average, worst severity) instead of adding a new one.
+        """
         session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id}"
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
+            # Take the write lock up front so concurrent reports of the same
+            # pothole cannot both miss each other and insert two rows
+            cursor.execute('BEGIN IMMEDIATE')
+            
             # Save session info
             cursor.execute('''
                 INSERT INTO detection_sessions 
@@ -429,43 +407,145 @@ class PotholeMapService:
                 WHERE user_id = ?
             ''', (datetime.now(), user_id))
             
-            # Save individual potholes
+            saved_at = datetime.now().isoformat()
+            image_size = detection_data.get('image_size') or {}
+            if isinstance(image_size, dict):
+                image_width, image_height = image_size.get('width'), image_size.get('height')
+            else:
+                image_width, image_height = (list(image_size) + [None, None])[:2]
+            severity_version = detection_data.get('severity_version')
+            # Stored original (services/image_store.py) the potholes point at
+            image_digest = (detection_data.get('image') or {}).get('digest')
+            image_path = image_relative_path(image_digest) if image_digest else None
+            
+            reports = []
             for detection in detection_data.get('detections', []):
                 location = detection.get('location') or detection_data.get('location')
                 severity = detection.get('severity', {})
                 
                 if location and 'latitude' in location and 'longitude' in location:
-                    # Store detection data as JSON for full record
-                    detection_json = json.dumps(detection)
+                    # Area is computed with the detections; older payloads only carry the bbox
+                    bbox = detection.get('bbox', [0, 0, 100, 100])
                     
-                    cursor.execute('''
-                        INSERT INTO potholes 
-                        (user_id, latitude, longitude, severity, confidence, size, 
-                         timestamp, image_path, detection_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        user_id,
-                        location['latitude'],
-                        location['longitude'],
-                        severity.get('level', 'medium'),
-                        detection.get('confidence', 0.5),
-                        detection.get('bbox', [0, 0, 100, 100])[2] * detection.get('bbox', [0, 0, 100, 100])[3],
-                        datetime.now().isoformat(),
-                        f"detection_{session_id}.jpg",
-                        detection_json
-                    ))
+                    report = {
+                        'user_id': user_id,
+                        'latitude': location['latitude'],
+                        'longitude': location['longitude'],
+                        'severity': severity.get('level', 'medium'),
+                        'confidence': detection.get('confidence', 0.5),
+                        'size': detection.get('area', bbox[2] * bbox[3]),
+                        'timestamp': saved_at,
+                        'image_path': image_path,
+                        'image_digest': image_digest,
+                        'severity_score': severity.get('score'),
+                        'severity_version': severity_version,
+                        'image_width': image_width or None,
+                        'image_height': image_height or None,
+                        'grid_cell': grid_cell(location['latitude'], location['longitude'])
+                    }
+                    # Full record, minus what the columns above already hold
+                    report['detection_data'] = encode_detection(detection, report)
+                    reports.append(report)
+            
+            new_rows, merged_ids = self._merge_nearby_reports(cursor, reports, saved_at)
+            
+            pothole_ids = list(merged_ids)
+            for row in new_rows:
+                cursor.execute('''
+                    INSERT INTO potholes 
+                    (user_id, latitude, longitude, severity, confidence, size, 
+                     timestamp, image_path, image_digest, detection_data, severity_score,
+                     severity_version, image_width, image_height, grid_cell,
+                     report_count, confidence_sum, last_reported)
+                    VALUES (:user_id, :latitude, :longitude, :severity, :confidence, :size,
+                            :timestamp, :image_path, :image_digest, :detection_data, :severity_score,
+                            :severity_version, :image_width, :image_height, :grid_cell,
+                            1, :confidence, :timestamp)
+                ''', row)
+                pothole_ids.append(cursor.lastrowid)
+            
+            # Attribute every report to its sender, merged or not
+            cursor.executemany('''
+                INSERT INTO pothole_reports (pothole_id, user_id, session_id, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', [(pothole_id, user_id, session_id, saved_at) for pothole_id in pothole_ids])
             
             conn.commit()
             conn.close()
-            print(f"✅ Saved pothole data for user: {user_id}")
+            logger.debug("Saved pothole data for user: %s (%d new, %d merged)",
+                         user_id, len(new_rows), len(merged_ids))
             return session_id
             
         except Exception as e:
             conn.rollback()
             conn.close()
-            print(f"❌ Error saving pothole data: {e}")
+            logger.exception("Error saving pothole data")
             return None
     
+    def _merge_nearby_reports(self, cursor, reports, saved_at):
+        """Fold reports into nearby recent potholes; returns (unmatched reports, ids merged into)"""
+        if not reports:
+            return [], []
+        
+        cells = set()
+        for location in {(r['latitude'], r['longitude']) for r in reports}:
+            cells.update(neighbour_cells(*location))
+        cells = list(cells)
+        cutoff = (datetime.now() - timedelta(days=DEDUP_WINDOW_DAYS)).isoformat()
+        
+        candidates = []
+        # Stay under SQLite's bound-parameter limit for very large radii
+        for start in range(0, len(cells), 500):
+            chunk = cells[start:start + 500]
+            cursor.execute(f'''
+                SELECT id, latitude, longitude FROM potholes
+                WHERE grid_cell IN ({','.join('?' * len(chunk))})
+                AND last_reported >= ?
+            ''', chunk + [cutoff])
+            candidates.extend(cursor.fetchall())
+        
+        matches = match_reports(
+            [(r['latitude'], r['longitude']) for r in reports],
+            [(c[1], c[2]) for c in candidates]
+        )
+        
+        updates = []
+        new_rows = []
+        for report, match in zip(reports, matches):
+            if match is None:
+                new_rows.append(report)
+            else:
+                updates.append(dict(report, id=candidates[match][0], last_reported=saved_at))
+        
+        # The more severe report's details win; counts and confidence accumulate
+        cursor.executemany('''
+            UPDATE potholes SET
+                report_count = COALESCE(report_count, 1) + 1,
+                confidence_sum = COALESCE(confidence_sum, confidence * COALESCE(report_count, 1)) + :confidence,
+                confidence = (COALESCE(confidence_sum, confidence * COALESCE(report_count, 1)) + :confidence)
+                             / (COALESCE(report_count, 1) + 1),
+                last_reported = :last_reported,
+                severity = CASE WHEN :severity_score > COALESCE(severity_score, -1) THEN :severity ELSE severity END,
+                size = CASE WHEN :severity_score > COALESCE(severity_score, -1) THEN :size ELSE size END,
+                detection_data = CASE WHEN :severity_score > COALESCE(severity_score, -1)
+                                 THEN :detection_data ELSE detection_data END,
+                image_width = CASE WHEN :severity_score > COALESCE(severity_score, -1)
+                              THEN :image_width ELSE image_width END,
+                image_height = CASE WHEN :severity_score > COALESCE(severity_score, -1)
+                               THEN :image_height ELSE image_height END,
+                severity_version = CASE WHEN :severity_score > COALESCE(severity_score, -1)
+                                   THEN :severity_version ELSE severity_version END,
+                image_digest = CASE WHEN :severity_score > COALESCE(severity_score, -1)
+                               THEN COALESCE(:image_digest, image_digest) ELSE image_digest END,
+                image_path = CASE WHEN :severity_score > COALESCE(severity_score, -1) AND :image_digest IS NOT NULL
+                             THEN :image_path ELSE image_path END,
+                severity_score = MAX(COALESCE(severity_score, -1), COALESCE(:severity_score, -1))
+            WHERE id = :id
+        ''', updates)
+        
+        return new_rows, [update['id'] for update in updates]
+    
+    @SQLITE_QUERY_SECONDS.timed(query='get_potholes_by_area')
     def get_potholes_by_area(self, ne_lat: float, ne_lng: float, sw_lat: float, sw_lng: float):
         """Get potholes within a bounding box with user info"""
         conn = sqlite3.connect(self.db_path)
@@ -474,7 +554,7 @@ class PotholeMapService:
         cursor.execute('''
             SELECT 
                 p.id, p.latitude, p.longitude, p.severity, p.confidence, 
-                p.size, p.timestamp, p.user_id, u.total_reports,
+                p.size, p.timestamp, p.user_id, u.total_reports, p.report_count,
                 CASE 
                     WHEN p.severity = 'high' THEN 3
                     WHEN p.severity = 'medium' THEN 2
@@ -499,23 +579,36 @@ class PotholeMapService:
                 'timestamp': row[6],
                 'user_id': row[7],
                 'user_reports': row[8],
-                'severity_weight': row[9]
+                'report_count': row[9] or 1,
+                'severity_weight': row[10]
             })
         
         conn.close()
         return potholes
     
+    @SQLITE_QUERY_SECONDS.timed(query='get_detection_data')
+    def get_detection_data(self, pothole_id: int):
+        """Full detection record of one pothole, rebuilt from its compact detection_data"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        
+        row = conn.execute('''
+            SELECT latitude, longitude, confidence, size, timestamp, user_id, detection_data
+            FROM potholes WHERE id = ?
+        ''', (pothole_id,)).fetchone()
+        conn.close()
+        
+        if row is None:
+            return None
+        return decode_detection(row['detection_data'], dict(row))
+    
+    @SQLITE_QUERY_SECONDS.timed(query='get_user_potholes')
     def get_user_potholes(self, user_id: str):
         """Get all potholes reported by a specific user"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT id, latitude, longitude, severity, confidence, size, timestamp
-            FROM potholes 
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-        ''', (user_id,))
+        cursor.execute(USER_POTHOLES_SQL, (user_id,))
         
         potholes = []
         for row in cursor.fetchall():
@@ -532,6 +625,7 @@ class PotholeMapService:
         conn.close()
         return potholes
     
+    @SQLITE_QUERY_SECONDS.timed(query='get_heatmap_data')
     def get_heatmap_data(self):
         """Get data formatted for heatmap visualization"""
         conn = sqlite3.connect(self.db_path)
@@ -559,6 +653,7 @@ class PotholeMapService:
         conn.close()
         return heatmap_data
     
+    @SQLITE_QUERY_SECONDS.timed(query='get_statistics')
     def get_statistics(self):
         """Get overall pothole statistics with user data"""
         conn = sqlite3.connect(self.db_path)
@@ -603,20 +698,13 @@ class PotholeMapService:
             'total_reports': user_stats[1] if user_stats else 0
         }
 
+    @SQLITE_QUERY_SECONDS.timed(query='get_recent_potholes')
     def get_recent_potholes(self, limit: int = 50):
         """Get most recent potholes for map display"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT 
-                p.id, p.latitude, p.longitude, p.severity, p.confidence, 
-                p.size, p.timestamp, p.user_id, u.total_reports
-            FROM potholes p
-            LEFT JOIN users u ON p.user_id = u.user_id
-            ORDER BY p.timestamp DESC
-            LIMIT ?
-        ''', (limit,))
+        cursor.execute(RECENT_POTHOLES_SQL, (limit,))
         
         potholes = []
         for row in cursor.fetchall():
@@ -629,20 +717,23 @@ class PotholeMapService:
                 'size': row[5],
                 'timestamp': row[6],
                 'user_id': row[7],
-                'user_reports': row[8]
+                'user_reports': row[8],
+                'report_count': row[9] or 1
             })
         
         conn.close()
         return potholes
 
+    @SQLITE_QUERY_SECONDS.timed(query='delete_user_data')
     def delete_user_data(self, user_id: str):
         """Delete all data for a specific user (GDPR compliance)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
-            # Delete user's potholes
+            # Delete user's potholes, and their reports merged into other users' potholes
             cursor.execute('DELETE FROM potholes WHERE user_id = ?', (user_id,))
+            cursor.execute('DELETE FROM pothole_reports WHERE user_id = ?', (user_id,))
             # Delete user's sessions
             cursor.execute('DELETE FROM detection_sessions WHERE user_id = ?', (user_id,))
             # Delete user statistics
@@ -656,10 +747,22 @@ class PotholeMapService:
             return True
         except Exception as e:
             conn.rollback()
-            print(f"Error deleting user data: {e}")
+            logger.exception("Error deleting user data")
             return False
         finally:
             conn.close()
 
-# Global instance
-map_service = PotholeMapService()
\ No newline at end of file
+# Global instance, created on first use so that importing this module for its
+# queries or the class never migrates or seeds ./pothole_data.db
+map_service = None
+_map_service_lock = threading.Lock()
+
+
+def get_map_service():
+    """The shared map service over the default database"""
+    global map_service
+    if map_service is None:
+        with _map_service_lock:
+            if map_service is None:
+                map_service = PotholeMapService()
+    return map_service
@@ -0,0 +1,318 @@
+import os
+import time
+import bisect
+import threading
+from functools import wraps
+
+# Default latency buckets in seconds, from sub-millisecond SQLite reads up to
+# slow CPU inference on large images
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricsRegistry:
+    """In-process metrics with Prometheus text exposition.
+
+    Every thread records into its own shard, so the hot path is a dict lookup
+    and an integer add with no lock. Shards are only merged when /api/metrics
+    is scraped. Values are per process; with several gunicorn workers each
+    worker reports its own series.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'values', None)
+        if shard is None:
+            shard = {}
+            self._local.values = shard
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(self, name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, function):
+        """Register a gauge whose value is read from ``function`` at scrape time"""
+        metric = Gauge(name, documentation, function)
+        self._metrics.append(metric)
+        return metric
+
+    @staticmethod
+    def _add(totals, shard):
+        for key, values in list(shard.items()):
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+
+    def _merged(self):
+        with self._shards_lock:
+            # Threads that have exited never write again; fold their shards
+            # into the retired totals so short-lived threads do not pile up
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._add(self._retired, shard)
+            self._shards = live
+            merged = {key: list(values) for key, values in self._retired.items()}
+
+        for _, shard in live:
+            self._add(merged, shard)
+        return merged
+
+    def render(self):
+        """Render all metrics in the Prometheus text format"""
+        merged = self._merged()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, **labels):
+        """Get the child series for one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._child_class(self, key))
+        return child
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _CounterChild:
+    def __init__(self, metric, labelvalues):
+        self._registry = metric.registry
+        self._key = (metric.name, labelvalues)
+
+    def inc(self, amount=1):
+        shard = self._registry._shard()
+        values = shard.get(self._key)
+        if values is None:
+            shard[self._key] = [amount]
+        else:
+            values[0] += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+    _child_class = _CounterChild
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def render(self, merged):
+        lines = self._header()
+        for labelvalues in list(self._children):
+            values = merged.get((self.name, labelvalues))
+            if values is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(values[0])}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, metric, labelvalues):
+        self._registry = metric.registry
+        self._key = (metric.name, labelvalues)
+        self._bounds = metric.buckets
+        # One slot per bucket, one for +Inf, then the running sum
+        self._size = len(metric.buckets) + 2
+
+    def observe(self, value):
+        shard = self._registry._shard()
+        values = shard.get(self._key)
+        if values is None:
+            values = [0] * self._size
+            values[-1] = 0.0
+            shard[self._key] = values
+        values[bisect.bisect_left(self._bounds, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        """Context manager observing the elapsed wall time of its block"""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    _child_class = _HistogramChild
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        return self.labels(**labels).time()
+
+    def timed(self, **labels):
+        """Decorator observing the duration of every call"""
+        def decorator(func):
+            child = self.labels(**labels)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with child.time():
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self, merged):
+        lines = self._header()
+        for labelvalues in list(self._children):
+            values = merged.get((self.name, labelvalues))
+            if values is None:
+                continue
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def render(self, merged):
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(value)}"]
+
+
+def process_rss_bytes():
+    """Resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+# Global registry and the metrics shared across the backend
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', 'HTTP requests by route, method and status',
+    ['route', 'method', 'status'])
+HTTP_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['route', 'method'])
+DETECT_STAGE_SECONDS = metrics.histogram(
+    'detect_stage_duration_seconds', 'Time spent in each stage of the detection pipeline',
+    ['stage'])
+DETECTIONS = metrics.counter(
+    'detections_total', 'Potholes detected')
+CACHE_REQUESTS = metrics.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'])
+SQLITE_QUERY_SECONDS = metrics.histogram(
+    'sqlite_query_duration_seconds', 'SQLite query latency by query',
+    ['query'])
+REPORT_RENDER_SECONDS = metrics.histogram(
+    'report_render_duration_seconds', 'Time spent rendering one PDF report',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+SESSIONS_REAPED = metrics.counter(
+    'sessions_reaped_total', 'Login sessions deleted by the reaper by reason (expired or over_cap)',
+    ['reason'])
+IMAGE_DOWNLOADS = metrics.counter(
+    'image_downloads_total', 'Image URL downloads by result (ok, too_large, not_image or error)',
+    ['result'])
+IMAGE_DOWNLOAD_BYTES = metrics.counter(
+    'image_download_bytes_total', 'Bytes of images downloaded from URLs')
+ADMISSION_DECISIONS = metrics.counter(
+    'admission_decisions_total',
+    'Detection requests by admission result (admitted, rate_limited, overloaded or deadline_exceeded)',
+    ['result'])
+IMAGE_STORE_WRITES = metrics.counter(
+    'image_store_writes_total', 'Images written to the image store by result (stored or deduplicated)',
+    ['result'])
+IMAGE_STORE_COLLECTED = metrics.counter(
+    'image_store_collected_total', 'Unreferenced images deleted from the image store')
+
+metrics.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', process_rss_bytes)
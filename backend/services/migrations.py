@@ -0,0 +1,390 @@
+import json
+import sqlite3
+
+from services.detection_codec import encode_detection
+from services.spatial_index import grid_cell
+from utils.structured_logging import get_logger
+
+logger = get_logger('migrations')
+
+
+def _add_missing_columns(conn, table, columns):
+    """Add any of ``columns`` (name -> SQL type) missing from ``table``"""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, sql_type in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {sql_type}')
+
+
+def _base_schema(conn):
+    """Tables as first shipped by PotholeMapService"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE,
+            username TEXT UNIQUE,
+            password_hash TEXT,
+            salt TEXT,
+            role TEXT DEFAULT 'user',
+            is_active BOOLEAN DEFAULT 1,
+            email_verified BOOLEAN DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_login DATETIME,
+            ip_address TEXT,
+            user_agent TEXT,
+            total_reports INTEGER DEFAULT 0,
+            reputation_points INTEGER DEFAULT 0,
+            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_active DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_token TEXT UNIQUE NOT NULL,
+            user_id TEXT NOT NULL,
+            expires_at DATETIME NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS potholes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            severity TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            size REAL NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            image_path TEXT,
+            address TEXT,
+            road_condition TEXT,
+            annotated_image_path TEXT,
+            detection_data TEXT,
+            is_verified BOOLEAN DEFAULT 0,
+            verification_score INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS detection_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            user_id TEXT NOT NULL,
+            total_potholes INTEGER DEFAULT 0,
+            avg_severity REAL DEFAULT 0,
+            area_coverage TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_statistics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT UNIQUE NOT NULL,
+            total_reports INTEGER DEFAULT 0,
+            high_severity_reports INTEGER DEFAULT 0,
+            medium_severity_reports INTEGER DEFAULT 0,
+            low_severity_reports INTEGER DEFAULT 0,
+            reputation_points INTEGER DEFAULT 0,
+            last_activity DATETIME,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+
+
+def _severity_and_dedup_columns(conn, batch_size=5000):
+    """Severity engine and spatial de-duplication columns, with existing rows put on the grid"""
+    _add_missing_columns(conn, 'potholes', {
+        'severity_score': 'REAL',
+        'severity_version': 'TEXT',
+        'image_width': 'INTEGER',
+        'image_height': 'INTEGER',
+        'grid_cell': 'INTEGER',
+        'report_count': 'INTEGER DEFAULT 1',
+        'confidence_sum': 'REAL',
+        'last_reported': 'DATETIME'
+    })
+
+    while True:
+        rows = conn.execute(
+            'SELECT id, latitude, longitude FROM potholes WHERE grid_cell IS NULL LIMIT ?', (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany('''
+            UPDATE potholes
+            SET grid_cell = ?,
+                last_reported = COALESCE(last_reported, timestamp),
+                confidence_sum = COALESCE(confidence_sum, confidence * COALESCE(report_count, 1))
+            WHERE id = ?
+        ''', [(grid_cell(lat, lng), pothole_id) for pothole_id, lat, lng in rows])
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_grid_cell ON potholes (grid_cell, last_reported)')
+
+
+def _hot_query_indexes(conn):
+    """Indexes for the per-user, recent, bounding-box and session lookups"""
+    # get_user_potholes: WHERE user_id = ? ORDER BY timestamp DESC
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_user_timestamp ON potholes (user_id, timestamp)')
+    # /api/user/stats severity counts, answered from the index alone
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_user_severity ON potholes (user_id, severity)')
+    # get_recent_potholes, time-range exports
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_timestamp ON potholes (timestamp)')
+    # get_potholes_by_area
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_lat_lng ON potholes (latitude, longitude)')
+    # validate_session runs on nearly every request
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_token_expires ON user_sessions (session_token, expires_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_user_expires ON user_sessions (user_id, expires_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_detection_sessions_user ON detection_sessions (user_id)')
+    conn.execute('ANALYZE')
+
+
+def _session_expiry_index(conn):
+    """Index for the expired-session reaper"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at)')
+
+
+def _incremental_auto_vacuum(conn):
+    """
+    Let the session reaper return freed pages to the filesystem a few at a
+    time. Switching an existing database needs a one-off full VACUUM, which
+    cannot run inside a transaction.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+
+
+def _compact_detection_data(conn, batch_size=5000):
+    """Re-encode detection_data JSON text with the compact detection codec"""
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, latitude, longitude, confidence, size, timestamp, user_id, detection_data
+            FROM potholes
+            WHERE id > ? AND typeof(detection_data) = 'text'
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for pothole_id, latitude, longitude, confidence, size, timestamp, user_id, text in rows:
+            try:
+                detection = json.loads(text)
+            except ValueError:
+                continue
+            if not isinstance(detection, dict):
+                continue
+            row = {'latitude': latitude, 'longitude': longitude, 'confidence': confidence,
+                   'size': size, 'timestamp': timestamp, 'user_id': user_id}
+            updates.append((encode_detection(detection, row), pothole_id))
+
+        conn.executemany('UPDATE potholes SET detection_data = ? WHERE id = ?', updates)
+        last_id = rows[-1][0]
+
+
+def _image_store(conn):
+    """
+    Content-addressed image store (services/image_store.py): one row per
+    stored image and potholes.image_digest pointing at it. Triggers keep
+    images.refcount equal to the number of potholes referencing each image
+    whichever code path inserts, deletes or re-points a row, and stamp
+    released_at when an image loses its last reference.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            digest TEXT PRIMARY KEY,
+            format TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            released_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    _add_missing_columns(conn, 'potholes', {'image_digest': 'TEXT'})
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_potholes_image_digest ON potholes (image_digest)')
+    # Garbage collection only ever looks at unreferenced images
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_images_released ON images (released_at) WHERE refcount = 0')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS potholes_image_ref_insert
+        AFTER INSERT ON potholes WHEN NEW.image_digest IS NOT NULL
+        BEGIN
+            UPDATE images SET refcount = refcount + 1 WHERE digest = NEW.image_digest;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS potholes_image_ref_delete
+        AFTER DELETE ON potholes WHEN OLD.image_digest IS NOT NULL
+        BEGIN
+            UPDATE images SET refcount = refcount - 1,
+                released_at = CASE WHEN refcount = 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+            WHERE digest = OLD.image_digest;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS potholes_image_ref_update
+        AFTER UPDATE OF image_digest ON potholes
+        WHEN OLD.image_digest IS NOT NEW.image_digest
+        BEGIN
+            UPDATE images SET refcount = refcount - 1,
+                released_at = CASE WHEN refcount = 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+            WHERE digest = OLD.image_digest;
+            UPDATE images SET refcount = refcount + 1 WHERE digest = NEW.image_digest;
+        END
+    ''')
+
+
+
+def _pothole_reports(conn):
+    """
+    One row per report a user sent, including reports merged into an
+    existing pothole, whose user_id only names its first reporter. Per-user
+    history and counts are read from here. Potholes saved before this table
+    existed are attributed to their first reporter.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pothole_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pothole_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            session_id TEXT,
+            timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (pothole_id) REFERENCES potholes (id),
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+    # get_user_potholes newest first and the /api/user/stats counts
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pothole_reports_user
+        ON pothole_reports (user_id, timestamp, pothole_id)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pothole_reports_pothole ON pothole_reports (pothole_id)')
+    conn.execute('''
+        INSERT INTO pothole_reports (pothole_id, user_id, timestamp)
+        SELECT id, user_id, COALESCE(timestamp, CURRENT_TIMESTAMP) FROM potholes
+        WHERE id NOT IN (SELECT pothole_id FROM pothole_reports)
+    ''')
+    # Whichever code path deletes a pothole, its reports go with it
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS potholes_reports_delete
+        AFTER DELETE ON potholes
+        BEGIN
+            DELETE FROM pothole_reports WHERE pothole_id = OLD.id;
+        END
+    ''')
+    conn.execute('ANALYZE pothole_reports')
+
+
+def _data_generations(conn):
+    """
+    Counters bumped by bulk rewrites that leave row counts and timestamps
+    alone, so caches keyed on the data (area reports) notice them. The
+    severity rescore bumps 'severity' with every chunk it commits.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_generations (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_generations (name, value) VALUES ('severity', 0)")
+
+
+def _locations_generation(conn):
+    """'locations' counter, bumped by the Exif backfill when it moves potholes"""
+    conn.execute("INSERT OR IGNORE INTO data_generations (name, value) VALUES ('locations', 0)")
+
+
+def _job_claims(conn):
+    """
+    Claims on background jobs every web worker would otherwise start at
+    once, such as the rescore after a severity config change. The claimer
+    refreshes ``heartbeat`` as it goes; a stale claim may be taken over.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_claims (
+            name TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+# (version, description, function, transactional). Append only: never edit or
+# reorder a migration that has shipped, add a new one instead. Every step must
+# also be safe on databases that already have its changes, since databases
+# created before this runner existed report version 0.
+MIGRATIONS = [
+    (1, 'base schema', _base_schema, True),
+    (2, 'severity and de-duplication columns', _severity_and_dedup_columns, True),
+    (3, 'indexes for hot queries', _hot_query_indexes, True),
+    (4, 'session expiry index', _session_expiry_index, True),
+    (5, 'incremental auto-vacuum', _incremental_auto_vacuum, False),
+    (6, 'compact detection_data', _compact_detection_data, True),
+    (7, 'content-addressed image store', _image_store, True),
+    (8, 'per-report attribution', _pothole_reports, True),
+    (9, 'data generation counters', _data_generations, True),
+    (10, 'locations generation counter', _locations_generation, True),
+    (11, 'background job claims', _job_claims, True)
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(db_path):
+    """
+    Bring the database at ``db_path`` up to LATEST_VERSION.
+
+    The version lives in SQLite's ``user_version`` header field. Each
+    transactional migration runs in its own IMMEDIATE transaction together
+    with the version bump, so a failed step leaves the database at the
+    previous version and concurrent starters apply every step exactly once.
+    Non-transactional steps (VACUUM) must be idempotent, as two starters may
+    both run them. Returns the resulting version.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for version, description, migrate, transactional in MIGRATIONS:
+            if schema_version(conn) >= version:
+                continue
+
+            if not transactional:
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                logger.info("Applied migration %d: %s", version, description)
+                continue
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Another process may have applied it while we waited for the lock
+                if schema_version(conn) >= version:
+                    conn.execute('ROLLBACK')
+                    continue
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            logger.info("Applied migration %d: %s", version, description)
+
+        return schema_version(conn)
+    finally:
+        conn.close()
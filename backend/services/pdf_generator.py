@@ -1,5 +1,5 @@
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
@@ -10,102 +10,271 @@ from datetime import datetime
 import json
 from io import BytesIO
 import base64
-import tempfile
+from collections import Counter
+from functools import lru_cache
+
+from utils.structured_logging import get_logger
+
+logger = get_logger('pdf_generator')
+
+SEVERITY_COLORS = {
+    'high': '#e74c3c',
+    'medium': '#f39c12',
+    'low': '#27ae60'
+}
+
+# Detail rows per table in area reports; one table fills about one page
+AREA_REPORT_ROWS_PER_TABLE = 50
+# Area reports list at most this many potholes individually
+AREA_REPORT_MAX_DETAIL_ROWS = int(os.environ.get('AREA_REPORT_MAX_DETAIL_ROWS', '100000'))
+
+DETAIL_HEADER = ['ID', 'Latitude', 'Longitude', 'Severity', 'Score', 'Confidence', 'Reports', 'Last reported']
+DETAIL_COL_WIDTHS = [0.7*inch, 0.95*inch, 0.95*inch, 0.75*inch, 0.6*inch, 0.8*inch, 0.6*inch, 1.35*inch]
+DETAIL_ROW_HEIGHT = 12
+
+
+@lru_cache(maxsize=1)
+def report_styles():
+    """Paragraph and table styles shared by every report, built once per process"""
+    styles = getSampleStyleSheet()
+    return {
+        'normal': styles['Normal'],
+        'italic': styles['Italic'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=20,
+            spaceAfter=30,
+            alignment=1,
+            textColor=colors.HexColor('#2c3e50'),
+            fontName='Helvetica-Bold'
+        ),
+        'meta': ParagraphStyle(
+            'Meta',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.gray,
+            alignment=1
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=12,
+            spaceBefore=20,
+            textColor=colors.HexColor('#34495e'),
+            fontName='Helvetica-Bold'
+        ),
+        'pothole_title': ParagraphStyle(
+            'PotholeTitle',
+            parent=styles['Heading3'],
+            fontSize=12,
+            textColor=colors.black,
+            spaceAfter=6
+        ),
+        'summary_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#e74c3c')),
+            ('BACKGROUND', (0, 2), (0, 2), colors.HexColor('#f39c12')),
+            ('BACKGROUND', (0, 3), (0, 3), colors.HexColor('#27ae60')),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+        'pothole_table': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+        'detail_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f4f6f7')]),
+            ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey)
+        ])
+    }
+
+
+class _LazyStory(list):
+    """
+    Story that pulls flowables from an iterable as reportlab consumes them.
+
+    BaseDocTemplate.build only looks at, deletes and re-inserts flowables at
+    the front of the list, so a few buffered flowables are enough and the
+    rest of a long report is never held in memory at once.
+    """
+
+    def __init__(self, flowables, lookahead=4):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+def _severity_chart(high_severity, medium_severity, low_severity):
+    drawing = Drawing(400, 200)
+    chart = VerticalBarChart()
+    chart.x = 50
+    chart.y = 50
+    chart.height = 125
+    chart.width = 300
+    chart.data = [[high_severity, medium_severity, low_severity]]
+    chart.categoryAxis.categoryNames = ['High', 'Medium', 'Low']
+    chart.bars[0].fillColor = colors.HexColor(SEVERITY_COLORS['high'])
+    chart.bars[1].fillColor = colors.HexColor(SEVERITY_COLORS['medium'])
+    chart.bars[2].fillColor = colors.HexColor(SEVERITY_COLORS['low'])
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = max([high_severity, medium_severity, low_severity]) + 1
+    drawing.add(chart)
+    return drawing
+
+
+def _summary_table(high_severity, medium_severity, low_severity):
+    summary_data = [
+        ['Severity Level', 'Count', 'Priority'],
+        ['High', str(high_severity), 'Immediate'],
+        ['Medium', str(medium_severity), 'High'],
+        ['Low', str(low_severity), 'Medium']
+    ]
+    summary_table = Table(summary_data, colWidths=[2*inch, 1*inch, 1.5*inch])
+    summary_table.setStyle(report_styles()['summary_table'])
+    return summary_table
+
+
+def _recommendations(high_severity, medium_severity, low_severity):
+    recommendations = []
+    if high_severity > 0:
+        recommendations.append(
+            f"🚨 <b>Immediate Action Required:</b> {high_severity} high-severity potholes need urgent repair."
+        )
+    if medium_severity > 0:
+        recommendations.append(
+            f"⚠️ <b>Schedule Repairs:</b> {medium_severity} medium-severity potholes should be addressed soon."
+        )
+    if low_severity > 0:
+        recommendations.append(
+            f"📝 <b>Monitor:</b> {low_severity} low-severity potholes should be regularly monitored."
+        )
+    return recommendations
+
+
+def _format_detail_row(row):
+    pothole_id, latitude, longitude, severity, score, confidence, report_count, last_reported = row
+    return [
+        str(pothole_id),
+        f"{latitude:.6f}",
+        f"{longitude:.6f}",
+        (severity or '').upper(),
+        f"{score * 100:.0f}" if score is not None else '-',
+        f"{confidence * 100:.1f}%" if confidence is not None else '-',
+        str(report_count or 1),
+        str(last_reported or '')[:16].replace('T', ' ')
+    ]
+
+
+def _detail_table(rows):
+    """One page of detail rows; fixed sizes spare reportlab from measuring every cell"""
+    table = Table(
+        [DETAIL_HEADER] + [_format_detail_row(row) for row in rows],
+        colWidths=DETAIL_COL_WIDTHS,
+        rowHeights=DETAIL_ROW_HEIGHT,
+        repeatRows=1
+    )
+    table.setStyle(report_styles()['detail_table'])
+    return table
+
+
+def describe_filters(filters):
+    """Human-readable area and time range of an area report"""
+    if filters is None:
+        return 'All potholes'
+    parts = []
+    if filters.bbox:
+        min_lng, min_lat, max_lng, max_lat = filters.bbox
+        parts.append(f"Area {min_lat:.5f}, {min_lng:.5f} to {max_lat:.5f}, {max_lng:.5f}")
+    if filters.start or filters.end:
+        parts.append(f"From {filters.start or 'the first report'} to {filters.end or 'now'}")
+    if filters.severities:
+        parts.append(f"Severity {', '.join(filters.severities)}")
+    return ' · '.join(parts) or 'All potholes'
+
 
 class PDFReportGenerator:
-    def __init__(self):
-        self.output_dir = 'reports'
+    def __init__(self, output_dir='reports'):
+        self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
-    
+
+    def _output_path(self, output_path, prefix='pothole_report'):
+        if output_path:
+            return output_path
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.output_dir, f"{prefix}_{timestamp}.pdf")
+
     def generate_report(self, detection_data, annotated_image_data=None, output_path=None):
         """Generate comprehensive PDF report for pothole detection"""
-        temp_files = []  # Track temporary files for cleanup
-        
         try:
-            if not output_path:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_path = os.path.join(self.output_dir, f"pothole_report_{timestamp}.pdf")
-            
+            output_path = self._output_path(output_path)
+
             # Create PDF document
             doc = SimpleDocTemplate(output_path, pagesize=A4, topMargin=0.5*inch)
             story = []
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=20,
-                spaceAfter=30,
-                alignment=1,
-                textColor=colors.HexColor('#2c3e50'),
-                fontName='Helvetica-Bold'
-            )
-            
+            styles = report_styles()
+            heading_style = styles['heading']
+
             # Title Section
-            story.append(Paragraph("POTHOLE DETECTION REPORT", title_style))
-            
+            story.append(Paragraph("POTHOLE DETECTION REPORT", styles['title']))
+
             # Report metadata
-            meta_style = ParagraphStyle(
-                'Meta',
-                parent=styles['Normal'],
-                fontSize=10,
-                textColor=colors.gray,
-                alignment=1
-            )
-            story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}", meta_style))
+            story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}", styles['meta']))
             story.append(Spacer(1, 20))
-            
+
             # Executive Summary
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                spaceAfter=12,
-                spaceBefore=20,
-                textColor=colors.HexColor('#34495e'),
-                fontName='Helvetica-Bold'
-            )
-            
             story.append(Paragraph("Executive Summary", heading_style))
-            
-            total_potholes = len(detection_data.get('detections', []))
-            high_severity = len([d for d in detection_data.get('detections', []) if d.get('severity', {}).get('level') == 'high'])
-            medium_severity = len([d for d in detection_data.get('detections', []) if d.get('severity', {}).get('level') == 'medium'])
-            low_severity = len([d for d in detection_data.get('detections', []) if d.get('severity', {}).get('level') == 'low'])
-            
+
+            detections = detection_data.get('detections', [])
+            total_potholes = len(detections)
+            severity_counts = Counter(d.get('severity', {}).get('level') for d in detections)
+            high_severity = severity_counts['high']
+            medium_severity = severity_counts['medium']
+            low_severity = severity_counts['low']
+
             summary_text = f"""
-            This report summarizes the pothole detection analysis conducted on {datetime.now().strftime('%B %d, %Y')}. 
+            This report summarizes the pothole detection analysis conducted on {datetime.now().strftime('%B %d, %Y')}.
             The AI-powered detection system identified <b>{total_potholes}</b> potholes with varying severity levels.
             """
-            story.append(Paragraph(summary_text, styles['Normal']))
+            story.append(Paragraph(summary_text, styles['normal']))
             story.append(Spacer(1, 10))
-            
+
             # Severity Summary Table
-            summary_data = [
-                ['Severity Level', 'Count', 'Priority'],
-                ['High', str(high_severity), 'Immediate'],
-                ['Medium', str(medium_severity), 'High'],
-                ['Low', str(low_severity), 'Medium']
-            ]
-            
-            summary_table = Table(summary_data, colWidths=[2*inch, 1*inch, 1.5*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#e74c3c')),
-                ('BACKGROUND', (0, 2), (0, 2), colors.HexColor('#f39c12')),
-                ('BACKGROUND', (0, 3), (0, 3), colors.HexColor('#27ae60')),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(summary_table)
+            story.append(_summary_table(high_severity, medium_severity, low_severity))
             story.append(Spacer(1, 20))
-            
+
             # Location Information
             if detection_data.get('location'):
                 story.append(Paragraph("Location Information", heading_style))
@@ -113,9 +282,9 @@ class PDFReportGenerator:
                 location_text = f"""
                 <b>GPS Coordinates:</b> {location.get('latitude', 'N/A'):.6f}, {location.get('longitude', 'N/A'):.6f}
                 """
-                story.append(Paragraph(location_text, styles['Normal']))
+                story.append(Paragraph(location_text, styles['normal']))
                 story.append(Spacer(1, 15))
-            
+
             # Annotated Image - FIXED VERSION
             if annotated_image_data:
                 story.append(Paragraph("Detection Results", heading_style))
@@ -123,78 +292,41 @@ class PDFReportGenerator:
                     # Handle base64 image
                     if ',' in annotated_image_data:
                         annotated_image_data = annotated_image_data.split(',')[1]
-                    
+
                     image_data = base64.b64decode(annotated_image_data)
-                    
-                    # Use a proper temporary file that won't be deleted too early
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                        temp_file.write(image_data)
-                        temp_file_path = temp_file.name
-                        temp_files.append(temp_file_path)  # Track for cleanup
-                    
-                    print(f"🖼️ Temporary image created: {temp_file_path}")
-                    
-                    # Add image to PDF
-                    img = Image(temp_file_path, width=5*inch, height=3.5*inch)
+
+                    # reportlab reads the image straight from memory
+                    img = Image(BytesIO(image_data), width=5*inch, height=3.5*inch)
                     img.hAlign = 'CENTER'
                     story.append(img)
                     story.append(Spacer(1, 15))
-                    
+
                 except Exception as e:
-                    print(f"❌ Error adding image to PDF: {e}")
-                    story.append(Paragraph("<i>Annotated image unavailable for PDF generation</i>", styles['Italic']))
-            
+                    logger.warning("Error adding image to PDF: %s", e)
+                    story.append(Paragraph("<i>Annotated image unavailable for PDF generation</i>", styles['italic']))
+
             # Severity Distribution
             if total_potholes > 0:
                 story.append(Paragraph("Severity Distribution", heading_style))
-                
-                # Create bar chart
-                drawing = Drawing(400, 200)
-                chart = VerticalBarChart()
-                chart.x = 50
-                chart.y = 50
-                chart.height = 125
-                chart.width = 300
-                chart.data = [[high_severity, medium_severity, low_severity]]
-                chart.categoryAxis.categoryNames = ['High', 'Medium', 'Low']
-                chart.bars[0].fillColor = colors.HexColor('#e74c3c')
-                chart.bars[1].fillColor = colors.HexColor('#f39c12')
-                chart.bars[2].fillColor = colors.HexColor('#27ae60')
-                chart.valueAxis.valueMin = 0
-                chart.valueAxis.valueMax = max([high_severity, medium_severity, low_severity]) + 1
-                drawing.add(chart)
-                story.append(drawing)
+                story.append(_severity_chart(high_severity, medium_severity, low_severity))
                 story.append(Spacer(1, 20))
-            
+
             # Detailed Findings
             if total_potholes > 0:
                 story.append(Paragraph("Detailed Findings", heading_style))
-                
-                for i, detection in enumerate(detection_data.get('detections', []), 1):
+
+                for i, detection in enumerate(detections, 1):
                     severity = detection.get('severity', {})
                     bbox = detection.get('bbox', [0, 0, 0, 0])
                     area = bbox[2] * bbox[3] if len(bbox) >= 4 else 0
-                    
-                    # Severity color mapping
-                    severity_colors = {
-                        'high': '#e74c3c',
-                        'medium': '#f39c12',
-                        'low': '#27ae60'
-                    }
-                    
+
                     severity_level = severity.get('level', 'medium')
                     pothole_title = Paragraph(
-                        f"Pothole #{i} - <font color='{severity_colors.get(severity_level, '#f39c12')}'>{severity_level.upper()} SEVERITY</font>",
-                        ParagraphStyle(
-                            'PotholeTitle',
-                            parent=styles['Heading3'],
-                            fontSize=12,
-                            textColor=colors.black,
-                            spaceAfter=6
-                        )
+                        f"Pothole #{i} - <font color='{SEVERITY_COLORS.get(severity_level, '#f39c12')}'>{severity_level.upper()} SEVERITY</font>",
+                        styles['pothole_title']
                     )
                     story.append(pothole_title)
-                    
+
                     pothole_data = [
                         ['Confidence', f"{detection.get('confidence', 0)*100:.1f}%"],
                         ['Size', f"{bbox[2]} × {bbox[3]} pixels" if len(bbox) >= 4 else 'Unknown'],
@@ -202,66 +334,124 @@ class PDFReportGenerator:
                         ['Severity Score', f"{severity.get('score', 0)*100:.1f}/100"],
                         ['Description', severity.get('description', 'No description available')]
                     ]
-                    
+
                     if detection.get('location'):
                         loc = detection['location']
                         pothole_data.append([
-                            'Location', 
+                            'Location',
                             f"Lat: {loc.get('latitude', 'N/A'):.6f}<br/>Lon: {loc.get('longitude', 'N/A'):.6f}"
                         ])
-                    
+
                     pothole_table = Table(pothole_data, colWidths=[1.5*inch, 4*inch])
-                    pothole_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 9),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ]))
+                    pothole_table.setStyle(styles['pothole_table'])
                     story.append(pothole_table)
                     story.append(Spacer(1, 15))
-            
+
             # Recommendations
             story.append(Paragraph("Recommendations", heading_style))
-            
-            recommendations = []
-            if high_severity > 0:
-                recommendations.append(
-                    f"🚨 <b>Immediate Action Required:</b> {high_severity} high-severity potholes need urgent repair."
-                )
-            if medium_severity > 0:
-                recommendations.append(
-                    f"⚠️ <b>Schedule Repairs:</b> {medium_severity} medium-severity potholes should be addressed soon."
-                )
-            if low_severity > 0:
-                recommendations.append(
-                    f"📝 <b>Monitor:</b> {low_severity} low-severity potholes should be regularly monitored."
-                )
-            
-            for rec in recommendations:
-                story.append(Paragraph(rec, styles['Normal']))
+
+            for rec in _recommendations(high_severity, medium_severity, low_severity):
+                story.append(Paragraph(rec, styles['normal']))
                 story.append(Spacer(1, 5))
-            
+
             # Build PDF
-            print("🔄 Building PDF document...")
             doc.build(story)
-            print("✅ PDF build completed")
-            
+            logger.debug("PDF build completed: %s", output_path)
+
             return output_path
-            
+
         except Exception as e:
-            print(f"❌ Error in PDF generation: {str(e)}")
+            logger.exception("Error in PDF generation")
             raise e
-        finally:
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-                        print(f"🧹 Cleaned up temporary file: {temp_file}")
-                except Exception as e:
-                    print(f"⚠️ Could not clean up {temp_file}: {e}")
 
-# Global instance
-pdf_generator = PDFReportGenerator()
\ No newline at end of file
+    def generate_area_report(self, db_path, filters=None, output_path=None, top_n=50,
+                             include_details=True, max_detail_rows=AREA_REPORT_MAX_DETAIL_ROWS):
+        """
+        PDF report of every stored pothole matching ``filters`` (an
+        ExportFilters: bounding box, time range, severities).
+
+        Counts come from SQL aggregates and the worst ``top_n`` potholes from
+        one ordered query. Detail rows are streamed from the database a page
+        at a time, so memory stays flat however many potholes match.
+        """
+        from services.report_aggregates import area_summary, iter_detail_rows, severity_by_day, worst_potholes
+
+        output_path = self._output_path(output_path, prefix='pothole_area_report')
+        summary = area_summary(db_path, filters)
+
+        def story():
+            styles = report_styles()
+            heading_style = styles['heading']
+            total = summary['total_potholes']
+            high, medium, low = summary['high_severity'], summary['medium_severity'], summary['low_severity']
+
+            yield Paragraph("POTHOLE AREA REPORT", styles['title'])
+            yield Paragraph(describe_filters(filters), styles['meta'])
+            yield Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}", styles['meta'])
+            yield Spacer(1, 20)
+
+            yield Paragraph("Executive Summary", heading_style)
+            avg_confidence = summary['avg_confidence']
+            yield Paragraph(f"""
+            <b>{total:,}</b> potholes from <b>{summary['total_reports']:,}</b> reports by
+            <b>{summary['reporters']:,}</b> users, first reported {summary['first_reported'] or 'N/A'}
+            and last reported {summary['last_reported'] or 'N/A'}. Average detection confidence
+            {f'{avg_confidence * 100:.1f}%' if avg_confidence is not None else 'N/A'}.
+            """, styles['normal'])
+            yield Spacer(1, 10)
+            yield _summary_table(high, medium, low)
+            yield Spacer(1, 20)
+
+            if total == 0:
+                return
+
+            yield Paragraph("Severity Distribution", heading_style)
+            yield _severity_chart(high, medium, low)
+
+            days = severity_by_day(db_path, filters)
+            if len(days) > 1:
+                yield Paragraph("New Potholes per Day", heading_style)
+                for start in range(0, len(days), AREA_REPORT_ROWS_PER_TABLE):
+                    table = Table(
+                        [['Day', 'High', 'Medium', 'Low']] + [[str(d) for d in day] for day in days[start:start + AREA_REPORT_ROWS_PER_TABLE]],
+                        colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch],
+                        rowHeights=DETAIL_ROW_HEIGHT,
+                        repeatRows=1
+                    )
+                    table.setStyle(styles['detail_table'])
+                    yield table
+
+            yield Paragraph("Recommendations", heading_style)
+            for rec in _recommendations(high, medium, low):
+                yield Paragraph(rec, styles['normal'])
+                yield Spacer(1, 5)
+
+            worst = worst_potholes(db_path, filters, top_n)
+            if worst:
+                yield PageBreak()
+                yield Paragraph(f"Top {len(worst)} Most Severe Potholes", heading_style)
+                yield _detail_table(worst)
+
+            if include_details:
+                yield PageBreak()
+                shown = min(total, max_detail_rows)
+                yield Paragraph(f"All Potholes ({total:,})", heading_style)
+                if shown < total:
+                    yield Paragraph(f"<i>The first {shown:,} by id are listed; use the export for the full data set.</i>",
+                                    styles['italic'])
+                listed = 0
+                for rows in iter_detail_rows(db_path, filters, chunk_size=AREA_REPORT_ROWS_PER_TABLE):
+                    rows = rows[:shown - listed]
+                    if not rows:
+                        break
+                    listed += len(rows)
+                    yield _detail_table(rows)
+
+        try:
+            doc = SimpleDocTemplate(output_path, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+            doc.build(_LazyStory(story()))
+            logger.debug("Area report completed: %s (%d potholes)", output_path, summary['total_potholes'])
+            return output_path
+        except Exception:
+            logger.exception("Error in area report generation")
+            raise
@@ -0,0 +1,509 @@
+import os
+import sys
+import time
+import pstats
+import marshal
+import cProfile
+import inspect
+import functools
+import itertools
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils.structured_logging import get_logger
+
+logger = get_logger('profiling')
+
+# Seconds between stack samples while the sampler runs
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.01'))
+# Longest a sampler run may last; it stops itself so it cannot be left on by mistake
+PROFILE_MAX_SAMPLE_SECONDS = float(os.environ.get('PROFILE_MAX_SAMPLE_SECONDS', '600'))
+# Distinct stacks the sampler keeps; samples of any further stack are counted
+# under one placeholder frame, which bounds its memory
+PROFILE_MAX_STACKS = int(os.environ.get('PROFILE_MAX_STACKS', '20000'))
+PROFILE_MAX_DEPTH = int(os.environ.get('PROFILE_MAX_DEPTH', '128'))
+# Per-request captures kept for /api/admin/profiling
+PROFILE_KEEP_CAPTURES = int(os.environ.get('PROFILE_KEEP_CAPTURES', '20'))
+# Functions and allocation sites listed in a capture
+PROFILE_TOP_ENTRIES = int(os.environ.get('PROFILE_TOP_ENTRIES', '30'))
+# Frames tracemalloc records per allocation while a memory capture runs
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES', '1'))
+
+CAPTURE_MODES = ('cpu', 'memory')
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_OTHER_STACKS = '[other stacks]'
+_TRUNCATED = '[truncated]'
+
+# (route, capture, thread id) of the request being served in this context;
+# copied along with the context onto the event loop thread of async views
+_request_state = contextvars.ContextVar('profiling_request', default=None)
+
+
+def _short_path(path):
+    """Source path relative to the backend or site-packages, to keep frame names readable"""
+    if path.startswith(_BACKEND_ROOT + os.sep):
+        return path[len(_BACKEND_ROOT) + 1:]
+    marker = path.rfind('site-packages' + os.sep)
+    if marker >= 0:
+        return path[marker + len('site-packages') + 1:]
+    return os.path.basename(path)
+
+
+def _frame_label(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def parse_modes(value):
+    """Capture modes from an ``X-Profile`` header: 'cpu', 'memory', both comma-separated, or '1'/'all'"""
+    value = (value or '').strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return ('cpu',)
+    if value == 'all':
+        return CAPTURE_MODES
+    return tuple(mode for mode in CAPTURE_MODES if mode in {part.strip() for part in value.split(',')})
+
+
+class StackSampler:
+    """
+    Sampling profiler aggregating the stacks of threads serving requests.
+
+    While running, a daemon thread wakes every ``interval`` seconds, reads
+    every thread's current frame with sys._current_frames() and counts the
+    stack of each thread tagged with a route (or of every thread, with
+    ``all_threads``). Samples are grouped under their route, so the output
+    of collapsed() is one flame graph per route. Untagged requests and a
+    stopped sampler cost nothing.
+    """
+
+    def __init__(self, max_stacks=PROFILE_MAX_STACKS, max_depth=PROFILE_MAX_DEPTH):
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.interval = PROFILE_SAMPLE_INTERVAL
+        self.all_threads = False
+        self.running = False
+        self._stacks = Counter()
+        self._labels = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._until = 0.0
+
+        self.samples = 0
+        self.dropped = 0
+        self.sampling_seconds = 0.0
+        self.started_at = None
+
+    def start(self, interval=PROFILE_SAMPLE_INTERVAL, seconds=60, all_threads=False):
+        """Start sampling for ``seconds``; a running sampler takes the new settings"""
+        with self._lock:
+            self.interval = interval
+            self.all_threads = all_threads
+            self._until = time.monotonic() + min(seconds, PROFILE_MAX_SAMPLE_SECONDS)
+            if self.running:
+                return
+            self._stop.clear()
+            self.running = True
+            self.started_at = datetime.now().isoformat()
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+        logger.info("Stack sampler started: every %.1f ms for %.0f s", interval * 1000, seconds)
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self.running = False
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        self._threads.clear()
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+            self.dropped = 0
+            self.sampling_seconds = 0.0
+
+    def tag(self, route, thread_id=None):
+        """Sample the calling thread (or ``thread_id``) under ``route`` until untagged"""
+        if self.running:
+            self._threads[thread_id or threading.get_ident()] = route
+
+    def untag(self, thread_id=None):
+        self._threads.pop(thread_id or threading.get_ident(), None)
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while True:
+            while not self._stop.wait(self.interval) and time.monotonic() < self._until:
+                started = time.perf_counter()
+                self._sample(own_thread)
+                self.sampling_seconds += time.perf_counter() - started
+
+            with self._lock:
+                if self._thread is not threading.current_thread():
+                    return
+                if not self._stop.is_set() and time.monotonic() < self._until:
+                    # start() extended the run while this one was timing out
+                    continue
+                self._thread = None
+                self.running = False
+                self._threads.clear()
+            logger.info("Stack sampler stopped after %d samples", self.samples)
+            return
+
+    def _sample(self, own_thread):
+        frames = sys._current_frames()
+        targets = dict(self._threads)
+        if self.all_threads:
+            for thread in threading.enumerate():
+                if thread.ident not in targets:
+                    targets[thread.ident] = f'[thread {thread.name}]'
+        targets.pop(own_thread, None)
+
+        labels = self._labels
+        with self._lock:
+            for thread_id, root in targets.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    if len(stack) >= self.max_depth:
+                        stack.append(_TRUNCATED)
+                        break
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(root)
+                key = tuple(reversed(stack))
+
+                if key not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    key = (root, _OTHER_STACKS)
+                    self.dropped += 1
+                self._stacks[key] += 1
+                self.samples += 1
+
+    def collapsed(self, route=None):
+        """
+        Aggregated stacks in the collapsed format read by flamegraph.pl and
+        speedscope: one ``route;outer;...;inner count`` line per stack.
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = [f"{';'.join(stack)} {count}" for stack, count in stacks
+                 if route is None or stack[0] == route]
+        lines.sort()
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def get_stats(self):
+        seconds_left = max(0.0, self._until - time.monotonic()) if self.running else 0.0
+        return {
+            'running': self.running,
+            'interval_ms': round(self.interval * 1000, 2),
+            'all_threads': self.all_threads,
+            'started_at': self.started_at,
+            'seconds_left': round(seconds_left, 1),
+            'samples': self.samples,
+            'stacks': len(self._stacks),
+            'dropped_samples': self.dropped,
+            'sampling_seconds': round(self.sampling_seconds, 3),
+            'threads_tagged': len(self._threads)
+        }
+
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            # Leave tracing alone if something else (PYTHONTRACEMALLOC) started it
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+
+
+def _function_label(function):
+    filename, line, name = function
+    if filename == '~':
+        return name
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+class RequestCapture:
+    """
+    cProfile and/or tracemalloc capture of one request.
+
+    The cpu mode profiles the request thread, plus the event loop and I/O
+    threads the request's work is handed to (see Profiler.propagate), one
+    cProfile.Profile per thread merged when the request ends; inference
+    runs in pool processes and only shows as time waited. The memory mode
+    compares tracemalloc snapshots taken at the start and the end of the
+    request. Tracing is process-wide, so allocations of requests served at
+    the same time are included.
+    """
+
+    def __init__(self, capture_id, modes, method, path, route):
+        self.id = capture_id
+        self.modes = modes
+        self.method = method
+        self.path = path
+        self.route = route
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.now().isoformat()
+        self.status = None
+        self.seconds = None
+        self.functions = None
+        self.memory = None
+        self.errors = []
+        self._profiles = []
+        self._request_profile = None
+        self._snapshot = None
+        self._raw_stats = None
+        self._started = time.perf_counter()
+
+    def start(self):
+        if 'memory' in self.modes:
+            _start_tracing()
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+        if 'cpu' in self.modes:
+            self._request_profile = self.enable_profile()
+        self._started = time.perf_counter()
+
+    def enable_profile(self):
+        """Start a profiler for the calling thread; returns it, or None when one cannot run"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one active profiler per process
+            self.errors.append(f"cpu: {e}")
+            return None
+        self._profiles.append(profile)
+        return profile
+
+    def finish(self, status):
+        """Stop capturing and summarize; later calls are ignored"""
+        if self.seconds is not None:
+            return
+        self.seconds = time.perf_counter() - self._started
+        self.status = status
+        if self._request_profile is not None:
+            self._request_profile.disable()
+        # Memory first, so building the cpu summary is not counted as the request's allocations
+        if 'memory' in self.modes:
+            try:
+                self._summarize_memory()
+            finally:
+                _stop_tracing()
+        if 'cpu' in self.modes:
+            self._summarize_profiles()
+
+    def _summarize_profiles(self):
+        if not self._profiles:
+            return
+        stats = pstats.Stats(*self._profiles)
+        self._profiles = []
+        self._raw_stats = marshal.dumps(stats.stats)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_ENTRIES]
+        self.functions = [{
+            'function': _function_label(function),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'own_seconds': round(own_time, 6),
+            'cumulative_seconds': round(cumulative_time, 6)
+        } for function, (primitive_calls, calls, own_time, cumulative_time, _) in top]
+
+    def _summarize_memory(self):
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+        differences = snapshot.compare_to(self._snapshot, 'lineno')[:PROFILE_TOP_ENTRIES]
+        self._snapshot = None
+        self.memory = {
+            'peak_traced_bytes': peak,
+            'allocations': [{
+                'location': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'retained_bytes': stat.size
+            } for stat in differences]
+        }
+
+    def pstats_bytes(self):
+        """The merged profile in the marshal format of pstats.Stats.dump_stats, or None"""
+        return self._raw_stats
+
+    def as_dict(self, detail=False):
+        result = {
+            'id': self.id,
+            'modes': list(self.modes),
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status': self.status,
+            'started_at': self.started_at,
+            'ms': round(self.seconds * 1000, 2) if self.seconds is not None else None
+        }
+        if self.errors:
+            result['errors'] = self.errors
+        if detail:
+            result['functions'] = self.functions
+            result['memory'] = self.memory
+        return result
+
+
+class Profiler:
+    """
+    Opt-in profiling of the requests served by this process.
+
+    Requests are captured individually (RequestCapture) when they carry an
+    admin's ``X-Profile`` header or match a route armed with arm(); the
+    StackSampler aggregates the stacks of all requests while it runs.
+    ``active`` is False unless one of them is in use, and the request
+    hooks do nothing else then.
+    """
+
+    def __init__(self, keep_captures=PROFILE_KEEP_CAPTURES):
+        self.sampler = StackSampler()
+        self.captures = deque(maxlen=keep_captures)
+        self._armed = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def active(self):
+        return self.sampler.running or bool(self._armed)
+
+    def arm(self, route, count, modes):
+        """Capture the next ``count`` requests to ``route`` (None for any route); count 0 disarms"""
+        with self._lock:
+            if count > 0:
+                self._armed[route] = [count, tuple(modes)]
+            else:
+                self._armed.pop(route, None)
+
+    def _take_armed(self, route):
+        if not self._armed:
+            return ()
+        with self._lock:
+            for key in (route, None):
+                armed = self._armed.get(key)
+                if armed:
+                    armed[0] -= 1
+                    if armed[0] <= 0:
+                        del self._armed[key]
+                    return armed[1]
+        return ()
+
+    def begin_request(self, method, path, route, modes=()):
+        """Start profiling the request served by the calling thread; returns its capture or None"""
+        self.sampler.tag(route)
+        modes = modes or self._take_armed(route)
+        capture = None
+        if modes:
+            capture = RequestCapture(f'p{next(self._ids)}', modes, method, path, route)
+            capture.start()
+        _request_state.set((route, capture, threading.get_ident()))
+        return capture
+
+    def current_capture(self):
+        """Capture of the request served in this context, or None"""
+        state = _request_state.get()
+        return state[1] if state is not None else None
+
+    def end_request(self, status=None):
+        """Untag the calling thread and keep the request's capture, finished with ``status`` if still running"""
+        state = _request_state.get()
+        if state is None:
+            return
+        _request_state.set(None)
+        self.sampler.untag()
+        capture = state[1]
+        if capture is None:
+            return
+        capture.finish(status)
+        self.captures.append(capture)
+        logger.info("Profiled %s %s: %d in %.1f ms (capture %s)", capture.method, capture.path,
+                    capture.status or 0, capture.seconds * 1000, capture.id)
+
+    @contextmanager
+    def _on_thread(self, route, capture, request_thread):
+        thread_id = threading.get_ident()
+        if thread_id == request_thread:
+            yield
+            return
+        self.sampler.tag(route, thread_id)
+        profile = capture.enable_profile() if capture is not None and 'cpu' in capture.modes else None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self.sampler.untag(thread_id)
+
+    def propagate(self, func):
+        """
+        ``func`` wrapped to be profiled as part of the current request on
+        whichever thread runs it, e.g. an executor or the event loop of an
+        async view. Returned unchanged when the request is not profiled.
+        """
+        state = _request_state.get()
+        if state is None:
+            return func
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self._on_thread(*state):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._on_thread(*state):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def get_capture(self, capture_id):
+        for capture in list(self.captures):
+            if capture.id == capture_id:
+                return capture
+        return None
+
+    def get_stats(self):
+        with self._lock:
+            armed = [{'route': route, 'remaining': count, 'modes': list(modes)}
+                     for route, (count, modes) in self._armed.items()]
+        return {
+            'sampler': self.sampler.get_stats(),
+            'armed': armed,
+            'captures': len(self.captures)
+        }
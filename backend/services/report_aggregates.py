@@ -0,0 +1,114 @@
+import sqlite3
+
+from services.exporter import EXPORT_COLUMNS, ExportFilters, iter_chunks
+
+SEVERITY_RANK_SQL = "CASE severity WHEN 'high' THEN 3 WHEN 'medium' THEN 2 WHEN 'low' THEN 1 ELSE 0 END"
+
+# Columns of the worst-potholes and detail tables, in order
+DETAIL_COLUMNS = ('id', 'latitude', 'longitude', 'severity', 'severity_score',
+                  'confidence', 'report_count', 'last_reported')
+
+
+def _connect(db_path):
+    return sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+
+
+def _where(filters):
+    clauses, params = (filters or ExportFilters()).where_clause()
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+
+def data_fingerprint(db_path):
+    """Changes whenever potholes are added, merged, rescored or relocated; part of an area report's cache key"""
+    conn = _connect(db_path)
+    try:
+        return list(conn.execute('''
+            SELECT COUNT(*), MAX(id), MAX(last_reported),
+                   (SELECT SUM(value) FROM data_generations)
+            FROM potholes
+        ''').fetchone())
+    finally:
+        conn.close()
+
+
+def area_summary(db_path, filters=None):
+    """Totals for the filtered potholes from one aggregate query"""
+    where, params = _where(filters)
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(f'''
+            SELECT
+                COUNT(*),
+                SUM(CASE WHEN severity = 'high' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN severity = 'medium' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN severity = 'low' THEN 1 ELSE 0 END),
+                SUM(COALESCE(report_count, 1)),
+                AVG(confidence),
+                AVG(severity_score),
+                COUNT(DISTINCT user_id),
+                MIN(timestamp),
+                MAX(COALESCE(last_reported, timestamp))
+            FROM potholes {where}
+        ''', params).fetchone()
+    finally:
+        conn.close()
+
+    total, high, medium, low, reports, avg_confidence, avg_score, reporters, first, last = row
+    return {
+        'total_potholes': total or 0,
+        'high_severity': high or 0,
+        'medium_severity': medium or 0,
+        'low_severity': low or 0,
+        'total_reports': reports or 0,
+        'avg_confidence': avg_confidence,
+        'avg_severity_score': avg_score,
+        'reporters': reporters or 0,
+        'first_reported': first,
+        'last_reported': last
+    }
+
+
+def severity_by_day(db_path, filters=None):
+    """(day, high, medium, low) for every day with new potholes, oldest first"""
+    where, params = _where(filters)
+    conn = _connect(db_path)
+    try:
+        return conn.execute(f'''
+            SELECT
+                date(timestamp) AS day,
+                SUM(CASE WHEN severity = 'high' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN severity = 'medium' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN severity = 'low' THEN 1 ELSE 0 END)
+            FROM potholes {where}
+            GROUP BY day
+            ORDER BY day
+        ''', params).fetchall()
+    finally:
+        conn.close()
+
+
+def worst_potholes(db_path, filters=None, limit=50):
+    """The ``limit`` most severe potholes (DETAIL_COLUMNS rows), most reported first on ties"""
+    where, params = _where(filters)
+    conn = _connect(db_path)
+    try:
+        return conn.execute(f'''
+            SELECT id, latitude, longitude, severity, severity_score, confidence,
+                   COALESCE(report_count, 1), COALESCE(last_reported, timestamp)
+            FROM potholes {where}
+            ORDER BY {SEVERITY_RANK_SQL} DESC, severity_score DESC, report_count DESC
+            LIMIT ?
+        ''', params + [limit]).fetchall()
+    finally:
+        conn.close()
+
+
+def iter_detail_rows(db_path, filters=None, chunk_size=1000):
+    """DETAIL_COLUMNS rows for every filtered pothole in id order, in chunks"""
+    # The exporter's keyset pagination keeps memory flat and never holds a
+    # long read transaction; pick this report's columns out of its rows
+    picks = [EXPORT_COLUMNS.index(column) for column in DETAIL_COLUMNS[:-1]]
+    last_reported = EXPORT_COLUMNS.index('last_reported')
+    timestamp = EXPORT_COLUMNS.index('timestamp')
+    for rows in iter_chunks(db_path, filters, chunk_size):
+        yield [tuple(row[i] for i in picks) + (row[last_reported] or row[timestamp],) for row in rows]
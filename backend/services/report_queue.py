@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import CACHE_REQUESTS, REPORT_RENDER_SECONDS
+from utils.structured_logging import get_logger
+
+logger = get_logger('report_queue')
+
+REPORT_DIR = os.environ.get('REPORT_DIR', 'reports')
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+# Finished jobs remembered for status lookups; their PDFs stay on disk
+REPORT_JOB_HISTORY = int(os.environ.get('REPORT_JOB_HISTORY', '1000'))
+# A pending marker older than this (seconds) belongs to a render that died
+REPORT_PENDING_TIMEOUT = float(os.environ.get('REPORT_PENDING_TIMEOUT', '600'))
+
+# Part of every report id; bump it when the PDF layout changes so cached
+# reports are rendered again
+REPORT_LAYOUT_VERSION = 1
+
+_REPORT_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+def report_id(detection_data, annotated_image=None):
+    """Content address of a report: SHA-256 of the canonical payload"""
+    digest = hashlib.sha256()
+    digest.update(f'layout:{REPORT_LAYOUT_VERSION}\n'.encode('utf-8'))
+    digest.update(json.dumps(detection_data, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+    if annotated_image:
+        # The base64 text identifies the image as well as its bytes would
+        digest.update(b'\nimage:')
+        digest.update(annotated_image.split(',', 1)[-1].encode('ascii', 'ignore'))
+    return digest.hexdigest()
+
+
+def is_report_id(value):
+    return bool(value) and _REPORT_ID.match(value) is not None
+
+
+class ReportJob:
+    __slots__ = ('id', 'status', 'error', 'created_at', 'finished_at', 'future')
+
+    def __init__(self, job_id, status='queued'):
+        self.id = job_id
+        self.status = status
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = self.created_at if status == 'done' else None
+        self.future = None
+
+    def as_dict(self):
+        return {
+            'report_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ReportQueue:
+    """
+    Renders PDF reports on a small thread pool, off the request threads.
+
+    Reports are stored content-addressed as ``<REPORT_DIR>/<report_id>.pdf``,
+    so a payload that was rendered before is served from disk, and identical
+    requests arriving while it renders share one job.
+    """
+
+    def __init__(self, output_dir=REPORT_DIR, workers=REPORT_WORKERS, history=REPORT_JOB_HISTORY):
+        self.output_dir = output_dir
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='report')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path_for(self, job_id):
+        return os.path.join(self.output_dir, f'{job_id}.pdf')
+
+    def _pending_marker(self, job_id):
+        # Tells other worker processes that this report is being rendered
+        return self.path_for(job_id) + '.pending'
+
+    def submit(self, detection_data, annotated_image=None):
+        """Queue a report unless it is cached or already rendering; returns its job"""
+        def render(generator, output_path):
+            generator.generate_report(
+                detection_data=detection_data,
+                annotated_image_data=annotated_image,
+                output_path=output_path
+            )
+        return self._submit(report_id(detection_data, annotated_image), render)
+
+    def submit_area(self, db_path, filters=None, top_n=50, include_details=True):
+        """
+        Queue an area/time-range report over the stored potholes.
+
+        Its id also covers a fingerprint of the potholes table, so the cached
+        PDF is reused only until potholes are added or merged.
+        """
+        from services.report_aggregates import data_fingerprint
+
+        key = {
+            'report': 'area',
+            'bbox': filters.bbox if filters else None,
+            'start': filters.start if filters else None,
+            'end': filters.end if filters else None,
+            'severities': filters.severities if filters else None,
+            'top_n': top_n,
+            'details': include_details,
+            'data': data_fingerprint(db_path)
+        }
+
+        def render(generator, output_path):
+            generator.generate_area_report(db_path, filters, output_path=output_path,
+                                           top_n=top_n, include_details=include_details)
+        return self._submit(report_id(key), render)
+
+    def _submit(self, job_id, render):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ('queued', 'running', 'done'):
+                if job.status == 'done' and not os.path.exists(self.path_for(job_id)):
+                    job = None
+                else:
+                    CACHE_REQUESTS.inc(cache='report', result='hit')
+                    return job
+
+            if os.path.exists(self.path_for(job_id)):
+                CACHE_REQUESTS.inc(cache='report', result='hit')
+                return self._remember(ReportJob(job_id, status='done'))
+
+            CACHE_REQUESTS.inc(cache='report', result='miss')
+            job = self._remember(ReportJob(job_id))
+            with open(self._pending_marker(job_id), 'w') as f:
+                f.write(str(os.getpid()))
+            job.future = self._executor.submit(self._render, job, render)
+            return job
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ('queued', 'running'):
+                break
+            del self._jobs[oldest_id]
+        return job
+
+    def _render(self, job, render):
+        from services.pdf_generator import PDFReportGenerator
+
+        job.status = 'running'
+        path = self.path_for(job.id)
+        partial = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with REPORT_RENDER_SECONDS.time():
+                render(PDFReportGenerator(self.output_dir), partial)
+            # Readers only ever see complete files
+            os.replace(partial, path)
+            job.status = 'done'
+            logger.debug("Report %s rendered", job.id)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.exception("Report %s failed", job.id)
+            if os.path.exists(partial):
+                os.remove(partial)
+        finally:
+            job.finished_at = time.time()
+            try:
+                os.remove(self._pending_marker(job.id))
+            except OSError:
+                pass
+        return path
+
+    def get(self, job_id):
+        """Job for a report id, or None. Also sees reports rendered or rendering in other processes."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not is_report_id(job_id):
+            return job
+
+        if os.path.exists(self.path_for(job_id)):
+            return ReportJob(job_id, status='done')
+        try:
+            if time.time() - os.path.getmtime(self._pending_marker(job_id)) < REPORT_PENDING_TIMEOUT:
+                return ReportJob(job_id, status='running')
+        except OSError:
+            pass
+        return None
+
+    def wait(self, job, timeout=None):
+        """Block until ``job`` finishes; returns the PDF path, or raises on failure"""
+        if job.future is not None:
+            job.future.result(timeout)
+        if job.status != 'done':
+            raise RuntimeError(job.error or f"Report {job.id} is {job.status}")
+        return self.path_for(job.id)
+
+    def get_stats(self):
+        """Get queue statistics"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running', 'done', 'failed')}
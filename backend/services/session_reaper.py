@@ -0,0 +1,175 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from datetime import datetime
+
+from services.metrics import SESSIONS_REAPED, SQLITE_QUERY_SECONDS
+from utils.structured_logging import get_logger
+
+logger = get_logger('session_reaper')
+
+# Seconds between sweeps; 0 disables the reaper
+SESSION_REAP_INTERVAL = float(os.environ.get('SESSION_REAP_INTERVAL', '300'))
+# Rows deleted per transaction, so logins are never blocked for long
+SESSION_REAP_BATCH = int(os.environ.get('SESSION_REAP_BATCH', '500'))
+# Live sessions kept per user; older ones are dropped, oldest first
+MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', '10'))
+# Free pages returned to the filesystem per sweep
+SESSION_VACUUM_PAGES = int(os.environ.get('SESSION_VACUUM_PAGES', '256'))
+
+
+def trim_user_sessions(cursor, user_id, keep=MAX_SESSIONS_PER_USER):
+    """Delete all but the ``keep`` longest-lived sessions of one user; returns the number deleted"""
+    cursor.execute('''
+        DELETE FROM user_sessions WHERE id IN (
+            SELECT id FROM user_sessions
+            WHERE user_id = ?
+            ORDER BY expires_at DESC
+            LIMIT -1 OFFSET ?
+        )
+    ''', (user_id, keep))
+    return cursor.rowcount
+
+
+class SessionReaper:
+    """
+    Background thread that keeps the user_sessions table bounded.
+
+    Every sweep deletes expired sessions in small batches, each its own
+    transaction, trims users holding more than ``max_per_user`` sessions,
+    and runs an incremental vacuum so the file shrinks as well. Sweeps are
+    jittered so several worker processes do not all wake at once.
+    """
+
+    def __init__(self, db_path, interval=SESSION_REAP_INTERVAL, batch_size=SESSION_REAP_BATCH,
+                 max_per_user=MAX_SESSIONS_PER_USER, vacuum_pages=SESSION_VACUUM_PAGES):
+        self.db_path = db_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_per_user = max_per_user
+        self.vacuum_pages = vacuum_pages
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.sweeps = 0
+        self.failed_sweeps = 0
+        self.expired_deleted = 0
+        self.over_cap_deleted = 0
+        self.pages_vacuumed = 0
+        self.last_sweep = None
+        self.last_sweep_ms = None
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='session-reaper', daemon=True)
+        self._thread.start()
+        logger.info("Session reaper started (every %ss, %d sessions per user)", self.interval, self.max_per_user)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # Spread the first sweep so workers started together do not sweep together
+        delay = self.interval * random.uniform(0.5, 1.0)
+        while not self._stop.wait(delay):
+            try:
+                self.sweep()
+            except Exception:
+                self.failed_sweeps += 1
+                logger.exception("Session sweep failed")
+            delay = self.interval * random.uniform(0.9, 1.1)
+
+    def _delete_in_batches(self, conn, select_sql, params):
+        """Delete the ids selected by ``select_sql`` one batch per transaction"""
+        deleted = 0
+        while not self._stop.is_set():
+            with conn:
+                cursor = conn.execute(
+                    f'DELETE FROM user_sessions WHERE id IN ({select_sql} LIMIT ?)',
+                    params + (self.batch_size,)
+                )
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.batch_size:
+                break
+        return deleted
+
+    def reap_expired(self, conn):
+        deleted = self._delete_in_batches(
+            conn, 'SELECT id FROM user_sessions WHERE expires_at <= ?', (datetime.now(),)
+        )
+        SESSIONS_REAPED.inc(deleted, reason='expired')
+        return deleted
+
+    def enforce_cap(self, conn):
+        users = [row[0] for row in conn.execute('''
+            SELECT user_id FROM user_sessions GROUP BY user_id HAVING COUNT(*) > ?
+        ''', (self.max_per_user,))]
+
+        deleted = 0
+        for user_id in users:
+            if self._stop.is_set():
+                break
+            with conn:
+                deleted += trim_user_sessions(conn.cursor(), user_id, self.max_per_user)
+        SESSIONS_REAPED.inc(deleted, reason='over_cap')
+        return deleted
+
+    def vacuum(self, conn):
+        """Release up to ``vacuum_pages`` free pages; a no-op unless auto_vacuum is INCREMENTAL"""
+        if self.vacuum_pages <= 0 or conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 0
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free_pages:
+            return 0
+        # execute() steps the pragma only once (one page); executescript runs it to completion
+        conn.executescript(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})')
+        return free_pages - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    @SQLITE_QUERY_SECONDS.timed(query='reap_sessions')
+    def sweep(self):
+        """Run one cleanup pass now; returns what it did"""
+        with self._lock:
+            start = time.perf_counter()
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            try:
+                expired = self.reap_expired(conn)
+                over_cap = self.enforce_cap(conn)
+                pages = self.vacuum(conn)
+            finally:
+                conn.close()
+
+            self.sweeps += 1
+            self.expired_deleted += expired
+            self.over_cap_deleted += over_cap
+            self.pages_vacuumed += pages
+            self.last_sweep = datetime.now().isoformat()
+            self.last_sweep_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if expired or over_cap:
+            logger.info("Reaped %d expired and %d over-cap sessions, vacuumed %d pages",
+                        expired, over_cap, pages)
+        return {'expired': expired, 'over_cap': over_cap, 'pages_vacuumed': pages}
+
+    def get_stats(self):
+        """Get reaper statistics"""
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval_seconds': self.interval,
+            'max_sessions_per_user': self.max_per_user,
+            'sweeps': self.sweeps,
+            'failed_sweeps': self.failed_sweeps,
+            'expired_deleted': self.expired_deleted,
+            'over_cap_deleted': self.over_cap_deleted,
+            'pages_vacuumed': self.pages_vacuumed,
+            'last_sweep': self.last_sweep,
+            'last_sweep_ms': self.last_sweep_ms
+        }
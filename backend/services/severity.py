@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+from services.metrics import SQLITE_QUERY_SECONDS
+from utils.structured_logging import get_logger
+
+logger = get_logger('severity')
+
+# Ordered from least to most severe; a score above a level's threshold
+# promotes the detection to that level
+SEVERITY_LEVELS = ('low', 'medium', 'high')
+
+# severity_version of rows bulk-imported from other sources; they keep their
+# source severity because their sizes are not comparable pixel areas
+IMPORTED_SEVERITY_VERSION = 'imported'
+
+# A rescore claim not refreshed for this long belongs to a process that died
+# or was recycled, and the next rescore to the same version takes it over
+RESCORE_CLAIM_STALE_SECONDS = 60
+
+DEFAULT_CONFIG = {
+    # Blend of normalized size and model confidence
+    'size_weight': 0.7,
+    'confidence_weight': 0.3,
+    # Box area, as a fraction of the image area, that earns the full size
+    # score. 0.03 is roughly the old fixed 100x100px cap on a 640x480 frame
+    'full_size_fraction': 0.03,
+    # Image size assumed for detections stored without one
+    'default_image_size': [640, 480],
+    'thresholds': {'medium': 0.4, 'high': 0.7},
+    'descriptions': {
+        'low': 'Small pothole - monitor condition',
+        'medium': 'Medium pothole - schedule repair',
+        'high': 'Large pothole - immediate attention needed'
+    }
+}
+
+
+def _merge_config(overrides):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+def _validate_config(config):
+    for key in ('size_weight', 'confidence_weight', 'full_size_fraction'):
+        if not isinstance(config[key], (int, float)) or config[key] < 0:
+            raise ValueError(f"Severity config '{key}' must be a non-negative number")
+    if config['full_size_fraction'] <= 0:
+        raise ValueError("Severity config 'full_size_fraction' must be positive")
+    if config['thresholds']['medium'] > config['thresholds']['high']:
+        raise ValueError("Severity threshold 'medium' must not exceed 'high'")
+
+
+class SeverityEngine:
+    """
+    Scores detections by size relative to the image and model confidence.
+
+    Weights and thresholds come from a JSON file (SEVERITY_CONFIG, default
+    severity_config.json) merged over DEFAULT_CONFIG. The file is re-read
+    when its mtime changes, checked at most every ``check_interval``
+    seconds, and listeners are told so stored rows can be rescored. Every
+    config has a short ``version`` hash that is stored with scored rows.
+    """
+
+    def __init__(self, config_path=None, check_interval=2.0):
+        self.config_path = config_path or os.environ.get('SEVERITY_CONFIG', 'severity_config.json')
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._mtime = None
+        self._next_check = 0.0
+        self._apply(_merge_config(None))
+        self.reload()
+
+    def _apply(self, config):
+        _validate_config(config)
+        thresholds = config['thresholds']
+        self._config = config
+        self._bins = np.array([thresholds['medium'], thresholds['high']], dtype=np.float64)
+        self._descriptions = [config['descriptions'][level] for level in SEVERITY_LEVELS]
+        canonical = json.dumps(config, sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha1(canonical).hexdigest()[:12]
+
+    def add_listener(self, callback):
+        """Call ``callback(engine)`` after every config change"""
+        self._listeners.append(callback)
+
+    def reload(self, force=False):
+        """Re-read the config file if it changed; returns True when the config changed"""
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            if mtime == self._mtime and not force:
+                return False
+
+            previous = self.version
+            try:
+                overrides = None
+                if mtime is not None:
+                    with open(self.config_path) as f:
+                        overrides = json.load(f)
+                self._apply(_merge_config(overrides))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep scoring with the last good config
+                logger.error("Invalid severity config %s: %s", self.config_path, e)
+                return False
+            finally:
+                self._mtime = mtime
+
+            changed = self.version != previous
+
+        if changed:
+            logger.info("Severity config %s loaded (version %s)", self.config_path, self.version)
+            for callback in self._listeners:
+                try:
+                    callback(self)
+                except Exception:
+                    logger.exception("Severity config listener failed")
+        return changed
+
+    @property
+    def config(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._config
+
+    def score(self, areas, confidences, image_areas):
+        """
+        Score whole arrays at once.
+
+        Returns (scores, level_indexes) where level_indexes index
+        SEVERITY_LEVELS. ``image_areas`` may be a scalar for one image.
+        """
+        config = self.config
+        areas = np.asarray(areas, dtype=np.float64)
+        confidences = np.asarray(confidences, dtype=np.float64)
+        image_areas = np.maximum(np.asarray(image_areas, dtype=np.float64), 1.0)
+
+        size_score = np.minimum(areas / (image_areas * config['full_size_fraction']), 1.0)
+        scores = size_score * config['size_weight'] + confidences * config['confidence_weight']
+        levels = np.digitize(scores, self._bins, right=True)
+        return scores, levels
+
+    def image_area(self, image_size):
+        """Pixel area from a detector image_size ({'width', 'height'} or [w, h])"""
+        if isinstance(image_size, dict):
+            width, height = image_size.get('width', 0), image_size.get('height', 0)
+        elif image_size:
+            width, height = image_size[0], image_size[1]
+        else:
+            width = height = 0
+        if not width or not height:
+            width, height = self.config['default_image_size']
+        return float(width) * float(height)
+
+    def score_detections(self, detections, image_size):
+        """Severity dicts for a DetectionResult from one image"""
+        scores, levels = self.score(detections.areas(), detections.confidences, self.image_area(image_size))
+        descriptions = self._descriptions
+        return [
+            {'level': SEVERITY_LEVELS[level], 'score': score, 'description': descriptions[level]}
+            for level, score in zip(levels.tolist(), np.round(scores, 3).tolist())
+        ]
+
+    @staticmethod
+    def _claim_rescore(conn, name):
+        """Compare-and-set the job claim; True when this process got it"""
+        now = time.time()
+        claimed = conn.execute('INSERT OR IGNORE INTO job_claims (name, heartbeat) VALUES (?, ?)',
+                               (name, now)).rowcount
+        if not claimed:
+            claimed = conn.execute('UPDATE job_claims SET heartbeat = ? WHERE name = ? AND heartbeat < ?',
+                                   (now, name, now - RESCORE_CLAIM_STALE_SECONDS)).rowcount
+        conn.commit()
+        return bool(claimed)
+
+    @SQLITE_QUERY_SECONDS.timed(query='rescore_potholes')
+    def rescore_database(self, db_path, batch_size=5000):
+        """
+        Rescore stored potholes that were scored with another config version.
+        Bulk-imported rows are left alone.
+
+        Uses the stored size, confidence and image dimensions, so no
+        inference is re-run. Works in id-ordered chunks, each committed on
+        its own, so writers are never blocked for long and an interrupted
+        run simply resumes. Every web worker sees a config change, so the
+        rescore to a version is claimed in job_claims first: one process
+        does the work and the others only keep the reloaded config. A claim
+        left by a process that died is taken over once it is stale. Returns
+        the number of rows updated.
+        """
+        version = self.version
+        default_area = float(np.prod(self.config['default_image_size']))
+        updated = 0
+        last_id = 0
+        claim = f'severity_rescore:{version}'
+
+        conn = sqlite3.connect(db_path)
+        try:
+            if not self._claim_rescore(conn, claim):
+                logger.info("Severity rescore to %s is running in another process", version)
+                return 0
+
+            while True:
+                rows = conn.execute('''
+                    SELECT id, size, confidence, image_width, image_height
+                    FROM potholes
+                    WHERE id > ? AND (severity_version IS NULL OR severity_version NOT IN (?, ?))
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, version, IMPORTED_SEVERITY_VERSION, batch_size)).fetchall()
+                if not rows:
+                    break
+
+                columns = np.array(rows, dtype=np.float64).reshape(-1, 5)
+                ids = columns[:, 0].astype(np.int64)
+                image_areas = columns[:, 3] * columns[:, 4]
+                image_areas = np.where(np.isnan(image_areas) | (image_areas <= 0), default_area, image_areas)
+                sizes = np.nan_to_num(columns[:, 1])
+                confidences = np.nan_to_num(columns[:, 2], nan=0.5)
+
+                scores, levels = self.score(sizes, confidences, image_areas)
+                level_names = np.array(SEVERITY_LEVELS)[levels]
+
+                conn.executemany(
+                    'UPDATE potholes SET severity = ?, severity_score = ?, severity_version = ? WHERE id = ?',
+                    zip(level_names.tolist(), np.round(scores, 3).tolist(), [version] * len(ids), ids.tolist())
+                )
+                # Invalidates cached area reports (report_aggregates.data_fingerprint)
+                conn.execute("UPDATE data_generations SET value = value + 1 WHERE name = 'severity'")
+                conn.execute('UPDATE job_claims SET heartbeat = ? WHERE name = ?', (time.time(), claim))
+                conn.commit()
+
+                updated += len(rows)
+                last_id = int(ids[-1])
+
+            # A later change back to this version must be able to claim it again
+            conn.execute('DELETE FROM job_claims WHERE name = ?', (claim,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        logger.info("Rescored %d potholes with severity config %s", updated, version)
+        return updated
+
+
+# Global instance
+severity_engine = SeverityEngine()
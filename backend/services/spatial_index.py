@@ -0,0 +1,86 @@
+import os
+import math
+
+# Reports of the same pothole closer than this (metres) and within the time
+# window (days) are merged into one row
+DEDUP_RADIUS_M = float(os.environ.get('DEDUP_RADIUS_M', '15'))
+DEDUP_WINDOW_DAYS = float(os.environ.get('DEDUP_WINDOW_DAYS', '30'))
+
+# Fixed grid of GRID_CELL_DEG x GRID_CELL_DEG cells (~22 m north-south).
+# Stored cell ids stay valid when the radius changes; a larger radius just
+# searches more neighbouring cells.
+GRID_CELL_DEG = 0.0002
+
+METERS_PER_DEGREE = 111320.0
+EARTH_RADIUS_M = 6371000.0
+
+# Row/column offsets keep cell ids non-negative so they pack into one integer
+_ROW_OFFSET = int(90 / GRID_CELL_DEG) + 1
+_COL_OFFSET = int(180 / GRID_CELL_DEG) + 1
+_COL_SPAN = 2 * _COL_OFFSET + 1
+
+
+def _row_col(latitude, longitude):
+    return math.floor(latitude / GRID_CELL_DEG), math.floor(longitude / GRID_CELL_DEG)
+
+
+def _cell_id(row, col):
+    # Wrap columns across the antimeridian
+    col = (col + _COL_OFFSET) % _COL_SPAN
+    return (row + _ROW_OFFSET) * _COL_SPAN + col
+
+
+def grid_cell(latitude, longitude):
+    """Integer id of the grid cell containing a coordinate"""
+    return _cell_id(*_row_col(latitude, longitude))
+
+
+def neighbour_cells(latitude, longitude, radius_m=None):
+    """Ids of every cell that may hold a point within ``radius_m`` of the coordinate"""
+    radius_m = DEDUP_RADIUS_M if radius_m is None else radius_m
+    row, col = _row_col(latitude, longitude)
+
+    lat_span = math.ceil(radius_m / METERS_PER_DEGREE / GRID_CELL_DEG)
+    # Longitude degrees shrink towards the poles, so more columns are needed
+    cos_lat = max(math.cos(math.radians(min(abs(latitude) + GRID_CELL_DEG * lat_span, 90.0))), 1e-6)
+    lon_span = min(math.ceil(radius_m / (METERS_PER_DEGREE * cos_lat) / GRID_CELL_DEG), _COL_OFFSET)
+
+    return [_cell_id(r, c)
+            for r in range(row - lat_span, row + lat_span + 1)
+            for c in range(col - lon_span, col + lon_span + 1)]
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def match_reports(reports, candidates, radius_m=None):
+    """
+    Pair new reports with existing potholes, nearest first.
+
+    ``reports`` and ``candidates`` are sequences of (latitude, longitude)
+    pairs. Each candidate is used at most once, so several potholes seen in
+    one photo (which share its coordinates) do not collapse into one.
+    Returns a list with the matched candidate index, or None, per report.
+    """
+    radius_m = DEDUP_RADIUS_M if radius_m is None else radius_m
+    pairs = []
+    for i, (lat, lon) in enumerate(reports):
+        for j, (cand_lat, cand_lon) in enumerate(candidates):
+            distance = distance_m(lat, lon, cand_lat, cand_lon)
+            if distance <= radius_m:
+                pairs.append((distance, i, j))
+    pairs.sort()
+
+    matches = [None] * len(reports)
+    used = set()
+    for _, i, j in pairs:
+        if matches[i] is None and j not in used:
+            matches[i] = j
+            used.add(j)
+    return matches
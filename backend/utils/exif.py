@@ -0,0 +1,203 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+# JPEG bytes scanned for the APP1 segment; it must come before the image data
+# and is at most 64 KB, so this is enough unless large segments precede it
+EXIF_SCAN_BYTES = 256 * 1024
+
+_EXIF_HEADER = b'Exif\0\0'
+_APP1 = 0xE1
+_SOS = 0xDA
+_EOI = 0xD9
+# Markers without a length field
+_STANDALONE_MARKERS = frozenset([0x01, 0xD8] + list(range(0xD0, 0xD8)))
+
+# IFD0 pointers to the sub-IFDs read here
+_EXIF_IFD_POINTER = 0x8769
+_GPS_IFD_POINTER = 0x8825
+_DATE_TIME = 0x0132
+# Exif IFD
+_DATE_TIME_ORIGINAL = 0x9003
+_OFFSET_TIME_ORIGINAL = 0x9011
+# GPS IFD
+_GPS_LATITUDE_REF = 0x0001
+_GPS_LATITUDE = 0x0002
+_GPS_LONGITUDE_REF = 0x0003
+_GPS_LONGITUDE = 0x0004
+
+# Entry type: size in bytes of one value
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+_ASCII, _SHORT, _LONG, _RATIONAL = 2, 3, 4, 5
+
+# More entries than any real IFD holds; guards against garbage counts
+_MAX_IFD_ENTRIES = 512
+
+
+def find_exif_segment(data):
+    """
+    TIFF block of a JPEG's APP1 Exif segment, or None.
+
+    Walks the marker segments from the start of the file by their length
+    fields and stops at the first Exif APP1 or at the start of the image
+    data, so no pixels are touched whatever the file size.
+    """
+    data = memoryview(data)[:EXIF_SCAN_BYTES]
+    if bytes(data[:2]) != b'\xff\xd8':
+        return None
+
+    position = 2
+    end = len(data)
+    while position + 4 <= end:
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in (_SOS, _EOI):
+            return None
+
+        length = (data[position + 2] << 8) | data[position + 3]
+        if length < 2:
+            return None
+        segment_end = position + 2 + length
+        if marker == _APP1 and bytes(data[position + 4:position + 10]) == _EXIF_HEADER:
+            return bytes(data[position + 10:min(segment_end, end)])
+        position = segment_end
+    return None
+
+
+class _TiffReader:
+    """Bounds-checked reads of IFD entries from a TIFF block"""
+
+    def __init__(self, tiff):
+        if len(tiff) < 8 or tiff[:2] not in (b'II', b'MM'):
+            raise ValueError("not a TIFF header")
+        self.tiff = tiff
+        self.order = '<' if tiff[:2] == b'II' else '>'
+        self._count = struct.Struct(self.order + 'H')
+        # tag, type, count, value or offset
+        self._entry = struct.Struct(self.order + 'HHII')
+        magic, self.first_ifd = struct.unpack_from(self.order + 'HI', tiff, 2)
+        if magic != 42:
+            raise ValueError("bad TIFF magic")
+
+    def entries(self, offset, wanted):
+        """{tag: value} for the tags in ``wanted`` found in the IFD at ``offset``"""
+        if offset + 2 > len(self.tiff):
+            raise ValueError("IFD outside the Exif block")
+        count = self._count.unpack_from(self.tiff, offset)[0]
+        if count > _MAX_IFD_ENTRIES:
+            raise ValueError("implausible IFD entry count")
+        count = min(count, (len(self.tiff) - offset - 2) // 12)
+
+        values = {}
+        for tag, value_type, value_count, value_offset in self._entry.iter_unpack(
+                self.tiff[offset + 2:offset + 2 + 12 * count]):
+            if tag not in wanted:
+                continue
+            try:
+                values[tag] = self._value(value_type, value_count, value_offset)
+            except (ValueError, struct.error, UnicodeDecodeError):
+                continue
+        return values
+
+    def _value(self, value_type, count, value_offset):
+        size = _TYPE_SIZES.get(value_type)
+        if size is None or count == 0 or count > 64:
+            raise ValueError("unsupported entry")
+        if size * count <= 4:
+            # Values of up to 4 bytes are stored in the entry itself
+            raw = struct.pack(self.order + 'I', value_offset)
+        else:
+            raw = self.tiff[value_offset:value_offset + size * count]
+            if len(raw) < size * count:
+                raise ValueError("value outside the Exif block")
+
+        if value_type == _ASCII:
+            return raw[:count].split(b'\0', 1)[0].decode('ascii').strip()
+        if value_type == _SHORT:
+            values = struct.unpack_from(f'{self.order}{count}H', raw)
+        elif value_type == _LONG:
+            values = struct.unpack_from(f'{self.order}{count}I', raw)
+        elif value_type == _RATIONAL:
+            parts = struct.unpack_from(f'{self.order}{2 * count}I', raw)
+            if 0 in parts[1::2]:
+                raise ValueError("zero denominator")
+            values = [numerator / denominator for numerator, denominator in zip(parts[::2], parts[1::2])]
+        else:
+            raise ValueError("unsupported entry")
+        return values[0] if count == 1 else list(values)
+
+
+def _coordinate(degrees_minutes_seconds, ref, negative_ref, limit):
+    # The ref must be ASCII 'N'/'S'/'E'/'W'; other types are corrupt tags
+    if not isinstance(degrees_minutes_seconds, list) or not isinstance(ref, str) or not ref:
+        return None
+    degrees, minutes, seconds = (list(degrees_minutes_seconds) + [0.0, 0.0])[:3]
+    value = degrees + minutes / 60 + seconds / 3600
+    if ref.upper() == negative_ref:
+        value = -value
+    return round(value, 7) if abs(value) <= limit else None
+
+
+def _capture_time(text, offset=None):
+    # 'YYYY:MM:DD HH:MM:SS'; sliced by hand, strptime costs more than the rest of the parse
+    if not isinstance(text, str) or len(text) < 19 or text[4] != ':' or text[10] != ' ':
+        return None
+    try:
+        captured = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                            int(text[11:13]), int(text[14:16]), int(text[17:19]))
+    except ValueError:
+        return None
+    if isinstance(offset, str) and len(offset) == 6 and offset[0] in '+-' and offset[3] == ':':
+        try:
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+        except ValueError:
+            return captured
+        captured = captured.replace(tzinfo=timezone(-delta if offset[0] == '-' else delta))
+    return captured
+
+
+def read_photo_metadata(data):
+    """
+    GPS position and capture time from a JPEG's Exif block.
+
+    Returns a dict with ``latitude`` and ``longitude`` when the photo has a
+    usable GPS fix (0, 0 is what cameras write without one) and
+    ``captured_at`` (a datetime, aware when the offset is recorded); empty
+    when there is no Exif block or it cannot be read. Never raises: photos
+    come from clients, and a corrupt block is treated as a missing one.
+    """
+    metadata = {}
+    try:
+        tiff = find_exif_segment(data)
+        if not tiff:
+            return metadata
+        reader = _TiffReader(tiff)
+        ifd0 = reader.entries(reader.first_ifd, {_EXIF_IFD_POINTER, _GPS_IFD_POINTER, _DATE_TIME})
+
+        if isinstance(ifd0.get(_GPS_IFD_POINTER), int):
+            gps = reader.entries(ifd0[_GPS_IFD_POINTER], {_GPS_LATITUDE_REF, _GPS_LATITUDE,
+                                                          _GPS_LONGITUDE_REF, _GPS_LONGITUDE})
+            latitude = _coordinate(gps.get(_GPS_LATITUDE), gps.get(_GPS_LATITUDE_REF), 'S', 90)
+            longitude = _coordinate(gps.get(_GPS_LONGITUDE), gps.get(_GPS_LONGITUDE_REF), 'W', 180)
+            if latitude is not None and longitude is not None and (latitude, longitude) != (0, 0):
+                metadata['latitude'] = latitude
+                metadata['longitude'] = longitude
+
+        captured_at = None
+        if isinstance(ifd0.get(_EXIF_IFD_POINTER), int):
+            exif = reader.entries(ifd0[_EXIF_IFD_POINTER], {_DATE_TIME_ORIGINAL, _OFFSET_TIME_ORIGINAL})
+            captured_at = _capture_time(exif.get(_DATE_TIME_ORIGINAL), exif.get(_OFFSET_TIME_ORIGINAL))
+        captured_at = captured_at or _capture_time(ifd0.get(_DATE_TIME))
+        if captured_at:
+            metadata['captured_at'] = captured_at
+    except Exception:
+        # Whatever was read before the block went bad is kept
+        pass
+    return metadata
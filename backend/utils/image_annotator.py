@@ -1,59 +1,183 @@
-from PIL import Image, ImageDraw, ImageFont
 import os
 import uuid
+from functools import lru_cache
+
+import cv2
+
+# Preview defaults, overridable per deployment
+ANNOTATION_FORMAT = os.environ.get('ANNOTATION_FORMAT', 'jpeg').lower()
+ANNOTATION_QUALITY = int(os.environ.get('ANNOTATION_QUALITY', '80'))
+ANNOTATION_MAX_SIDE = int(os.environ.get('ANNOTATION_MAX_SIDE', '1280'))
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_BOX_COLOR = (0, 160, 0)       # BGR green
+_TEXT_COLOR = (255, 255, 255)
+
+# cv2.IMREAD_REDUCED_* flags by downscale factor, largest first
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+@lru_cache(maxsize=4096)
+def _label_size(label, font_scale, thickness):
+    """Rendered (width, height, baseline) of a label; labels repeat, so measure once"""
+    (width, height), baseline = cv2.getTextSize(label, _FONT, font_scale, thickness)
+    return width, height, baseline
+
 
 class ImageAnnotator:
-    def __init__(self):
-        self.output_dir = 'annotated_results'
-        os.makedirs(self.output_dir, exist_ok=True)
-    
+    """
+    Draw detections onto decoded BGR arrays and encode previews in memory.
+
+    Uses OpenCV's built-in Hershey font, so there is no font file to find
+    or load; label sizes are measured once and cached.
+    """
+
+    def __init__(self, output_dir='annotated_results', font_scale=0.6, thickness=2):
+        self.output_dir = output_dir
+        self.font_scale = font_scale
+        self.thickness = thickness
+
+    def draw(self, image, detections, scale=1.0):
+        """Draw boxes and labels onto ``image`` in place and return it.
+
+        ``scale`` maps detection coordinates onto the array, for drawing on a
+        downscaled copy of the image the detections were made on.
+        """
+        height, width = image.shape[:2]
+        text_thickness = max(1, self.thickness - 1)
+
+        for detection in detections:
+            x, y, w, h = detection['bbox']
+            x1 = int(round(x * scale))
+            y1 = int(round(y * scale))
+            x2 = int(round((x + w) * scale))
+            y2 = int(round((y + h) * scale))
+            cv2.rectangle(image, (x1, y1), (x2, y2), _BOX_COLOR, self.thickness)
+
+            label = f"Pothole: {detection['confidence']:.1%}"
+            label_width, label_height, baseline = _label_size(label, self.font_scale, text_thickness)
+            label_height += baseline + 6
+
+            # Keep the label inside the image when the box touches the top edge
+            top = y1 - label_height if y1 - label_height >= 0 else min(y1, height - label_height)
+            left = min(max(x1, 0), max(width - label_width - 10, 0))
+            cv2.rectangle(image, (left, top), (left + label_width + 10, top + label_height), _BOX_COLOR, -1)
+            cv2.putText(image, label, (left + 5, top + label_height - baseline - 3), _FONT,
+                        self.font_scale, _TEXT_COLOR, text_thickness, cv2.LINE_AA)
+
+        return image
+
+    def encode(self, image, image_format=None, quality=None):
+        """Encode a BGR array to JPEG or WebP bytes"""
+        image_format = (image_format or ANNOTATION_FORMAT).lower()
+        quality = int(quality or ANNOTATION_QUALITY)
+
+        if image_format == 'webp':
+            ok, encoded = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        elif image_format in ('jpeg', 'jpg'):
+            ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        else:
+            raise ValueError(f"Unsupported annotation format: {image_format}")
+
+        if not ok:
+            raise ValueError("Error encoding annotated image")
+        return encoded.tobytes()
+
+    def render_preview(self, image, detections, image_format=None, quality=None, max_side=None):
+        """
+        Annotated, size-capped preview of a decoded image as encoded bytes.
+
+        The image is shrunk to ``max_side`` before drawing so the labels stay
+        legible and only the preview-sized pixels are encoded. ``image`` is
+        not modified.
+        """
+        max_side = ANNOTATION_MAX_SIDE if max_side is None else max_side
+        height, width = image.shape[:2]
+        scale = 1.0
+
+        if max_side and max(height, width) > max_side:
+            scale = max_side / max(height, width)
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            canvas = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        else:
+            canvas = image.copy()
+
+        self.draw(canvas, detections, scale)
+        return self.encode(canvas, image_format, quality)
+
+    def render_preview_from_file(self, image_path, detections, image_size=None, image_format=None,
+                                 quality=None, max_side=None):
+        """
+        Preview for an image on disk, decoding at reduced resolution when
+        the preview would be downscaled anyway.
+
+        ``image_size`` is the detector's {'width', 'height'} (or a (width,
+        height) pair) so the reduced decode factor can be chosen without
+        reading the header again.
+        """
+        return self._render_reduced(lambda flag: cv2.imread(image_path, flag), image_path,
+                                    detections, image_size, image_format, quality, max_side)
+
+    def render_preview_from_bytes(self, data, detections, image_size=None, image_format=None,
+                                  quality=None, max_side=None):
+        """Same as render_preview_from_file for an encoded image held in memory"""
+        import numpy as np
+
+        encoded = np.frombuffer(data, dtype=np.uint8)
+        return self._render_reduced(lambda flag: cv2.imdecode(encoded, flag), 'image data',
+                                    detections, image_size, image_format, quality, max_side)
+
+    def _render_reduced(self, decode, name, detections, image_size, image_format, quality, max_side):
+        max_side = ANNOTATION_MAX_SIDE if max_side is None else max_side
+        flag = cv2.IMREAD_COLOR
+        original_side = None
+
+        if image_size and max_side:
+            if isinstance(image_size, dict):
+                original_side = max(image_size.get('width', 0), image_size.get('height', 0))
+            else:
+                original_side = max(image_size)
+            for factor, reduced_flag in _REDUCED_FLAGS:
+                if original_side // factor >= max_side:
+                    flag = reduced_flag
+                    break
+
+        image = decode(flag)
+        if image is None:
+            raise ValueError(f"Could not read image: {name}")
+
+        # Detections are in original pixels; draw on whatever we decoded
+        decoded_side = max(image.shape[:2])
+        scale = decoded_side / original_side if original_side else 1.0
+        if max_side and decoded_side > max_side:
+            target = max_side / decoded_side
+            image = cv2.resize(image, None, fx=target, fy=target, interpolation=cv2.INTER_AREA)
+            scale *= target
+
+        self.draw(image, detections, scale)
+        return self.encode(image, image_format, quality)
+
     def annotate_image(self, image_path, detections, output_path=None):
-        """Annotate image with detection bounding boxes"""
+        """Annotate image with detection bounding boxes and write it to disk"""
         try:
-            # Open the image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Create drawing context
-                draw = ImageDraw.Draw(img)
-                
-                # Try to load a font
-                try:
-                    font = ImageFont.truetype("arial.ttf", 20)
-                except:
-                    font = ImageFont.load_default()
-                
-                # Draw each detection
-                for detection in detections:
-                    bbox = detection['bbox']
-                    confidence = detection['confidence']
-                    
-                    # Draw bounding box
-                    x, y, w, h = bbox
-                    draw.rectangle([x, y, x + w, y + h], outline="green", width=3)
-                    
-                    # Draw label background
-                    label = f"Pothole: {confidence:.1%}"
-                    label_bbox = draw.textbbox((x, y), label, font=font)
-                    label_width = label_bbox[2] - label_bbox[0] + 10
-                    label_height = label_bbox[3] - label_bbox[1] + 10
-                    
-                    draw.rectangle([x, y - label_height, x + label_width, y], fill="green")
-                    
-                    # Draw label text
-                    draw.text((x + 5, y - label_height + 5), label, fill="white", font=font)
-                
-                # Save the annotated image
-                if not output_path:
-                    output_path = os.path.join(self.output_dir, f"annotated_{uuid.uuid4()}.jpg")
-                
-                img.save(output_path)
-                return output_path
-                
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not read image: {image_path}")
+
+            self.draw(image, detections)
+
+            if not output_path:
+                os.makedirs(self.output_dir, exist_ok=True)
+                output_path = os.path.join(self.output_dir, f"annotated_{uuid.uuid4()}.jpg")
+
+            image_format = 'webp' if output_path.lower().endswith('.webp') else 'jpeg'
+            with open(output_path, 'wb') as f:
+                f.write(self.encode(image, image_format))
+            return output_path
+
         except Exception as e:
             raise ValueError(f"Error annotating image: {str(e)}")
 
 # Global annotator instance
-annotator = ImageAnnotator()
\ No newline at end of file
+annotator = ImageAnnotator()
@@ -0,0 +1,165 @@
+import os
+import warnings
+from io import BytesIO
+
+from utils.upload_stream import UploadTooLarge, sniff_image_format
+
+# Images are decoded at the largest reduction that keeps the longer side at
+# least this long; the model letterboxes to 640 px anyway
+INGEST_TARGET_SIDE = int(os.environ.get('INGEST_TARGET_SIDE', '640'))
+# Images with more pixels are refused as decompression bombs
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', str(100_000_000)))
+
+# Header bytes handed to PIL when probing; enough for all but huge EXIF/ICC blocks
+PROBE_BYTES = 256 * 1024
+REDUCTION_FACTORS = (8, 4, 2)
+
+# EXIF orientations that swap width and height once applied
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+_EXIF_ORIENTATION = 0x0112
+
+
+_pil_configured = False
+
+
+def _pil_image():
+    """PIL.Image, with its own decompression bomb guard set to MAX_IMAGE_PIXELS and raising"""
+    global _pil_configured
+    from PIL import Image
+
+    if not _pil_configured:
+        Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        _pil_configured = True
+    return Image
+
+
+class ImageInfo:
+    """Format and displayed size of an encoded image, read from its header"""
+
+    __slots__ = ('format', 'width', 'height', 'orientation')
+
+    def __init__(self, image_format, width, height, orientation=1):
+        self.format = image_format
+        self.width = width
+        self.height = height
+        self.orientation = orientation
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    def as_dict(self):
+        return {'width': self.width, 'height': self.height}
+
+
+def _open_header(data, head_only):
+    Image = _pil_image()
+    image = Image.open(BytesIO(bytes(data[:PROBE_BYTES]) if head_only else bytes(data)))
+    try:
+        width, height = image.size
+        orientation = image.getexif().get(_EXIF_ORIENTATION, 1) if image.format == 'JPEG' else 1
+    finally:
+        image.close()
+    return width, height, orientation
+
+
+def probe_image(data, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    ImageInfo for encoded image bytes, without decoding any pixels.
+
+    Raises ValueError for anything but a readable JPEG, PNG, GIF or WebP
+    and UploadTooLarge for more than ``max_pixels`` pixels.
+    """
+    Image = _pil_image()
+    image_format = sniff_image_format(data)
+    if image_format is None:
+        raise ValueError("Upload is not a JPEG, PNG, GIF or WebP image")
+
+    try:
+        try:
+            width, height, orientation = _open_header(data, head_only=True)
+        except (OSError, SyntaxError):
+            if len(data) <= PROBE_BYTES:
+                raise
+            width, height, orientation = _open_header(data, head_only=False)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise UploadTooLarge(f"Image has more than {max_pixels} pixels")
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ValueError(f"Could not read image header: {e}")
+
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    if width <= 0 or height <= 0:
+        raise ValueError("Image has no pixels")
+    info = ImageInfo(image_format, width, height, orientation)
+    if info.pixels > max_pixels:
+        raise UploadTooLarge(f"Image is {width}x{height}, more than {max_pixels} pixels")
+    return info
+
+
+def reduction_factor(info, target_side=INGEST_TARGET_SIDE):
+    """Largest of 8, 4, 2 that keeps the longer side at least ``target_side``, else 1"""
+    side = max(info.width, info.height)
+    for factor in REDUCTION_FACTORS:
+        if side // factor >= target_side:
+            return factor
+    return 1
+
+
+def _decode_with_pil(data, factor):
+    # Formats OpenCV cannot read (e.g. GIF); JPEG draft mode scales in the DCT
+    import numpy as np
+    from PIL import ImageOps
+
+    with _pil_image().open(BytesIO(bytes(data))) as image:
+        if factor > 1:
+            if image.format == 'JPEG':
+                image.draft('RGB', (image.width // factor, image.height // factor))
+            else:
+                image = image.reduce(factor)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+
+
+def decode_for_model(data, info=None, target_side=INGEST_TARGET_SIDE):
+    """
+    BGR array of encoded image bytes, decoded at roughly model resolution.
+
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale by libjpeg, so a
+    40 MP photo never exists at full size in memory. Returns (image, info);
+    the image may be smaller than ``info`` says, see scale_to_original.
+    """
+    import numpy as np
+    import cv2
+
+    info = info or probe_image(data)
+    factor = reduction_factor(info, target_side)
+    flag = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[factor]
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        try:
+            image = _decode_with_pil(data, factor)
+        except (OSError, SyntaxError, ValueError) as e:
+            raise ValueError(f"Could not decode image: {e}")
+    return image, info
+
+
+def scale_to_original(result, image, info):
+    """Map a detector result for a reduced decode back to the original image's pixels"""
+    import numpy as np
+    from model.detection_result import DetectionResult
+
+    detections = result.get('detections')
+    if not isinstance(detections, DetectionResult):
+        return result
+
+    height, width = image.shape[:2]
+    if (width, height) != (info.width, info.height):
+        scale = np.array([info.width / width, info.height / height] * 2, dtype=np.float32)
+        result['detections'] = DetectionResult(detections.boxes * scale, detections.confidences,
+                                               detections.class_ids)
+    result['image_size'] = info.as_dict()
+    return result
@@ -1,74 +1,167 @@
-from PIL import Image, ImageDraw, ImageFont
 import numpy as np
+import cv2
 import os
+import threading
+
+# Padding colour used by YOLO letterboxing (114/255 grey)
+LETTERBOX_PAD_VALUE = 114 / 255.0
+
+
+class LetterboxBatcher:
+    """
+    Letterbox images into a reusable float32 NCHW batch buffer.
+
+    The buffer is allocated once per target size and grown only when a
+    larger batch arrives, so steady-state preprocessing performs no float
+    allocations. Returned batches are views into that buffer and are
+    overwritten by the next call.
+    """
+
+    def __init__(self, target_size=(640, 640), pad_value=LETTERBOX_PAD_VALUE):
+        self.target_width, self.target_height = target_size
+        self.pad_value = np.float32(pad_value)
+        self._buffer = None
+
+    def _batch_buffer(self, batch_size):
+        if self._buffer is None or self._buffer.shape[0] < batch_size:
+            self._buffer = np.empty(
+                (batch_size, 3, self.target_height, self.target_width), dtype=np.float32
+            )
+        return self._buffer[:batch_size]
+
+    def _fill(self, out, image):
+        """Letterbox one BGR uint8 image into ``out`` (3, H, W) as RGB in [0, 1]"""
+        height, width = image.shape[:2]
+        scale = min(self.target_width / width, self.target_height / height)
+        new_width = max(1, int(round(width * scale)))
+        new_height = max(1, int(round(height * scale)))
+        pad_x = (self.target_width - new_width) // 2
+        pad_y = (self.target_height - new_height) // 2
+
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+        # Only the borders need the pad colour, the rest is overwritten below
+        out[:, :pad_y, :] = self.pad_value
+        out[:, pad_y + new_height:, :] = self.pad_value
+        out[:, pad_y:pad_y + new_height, :pad_x] = self.pad_value
+        out[:, pad_y:pad_y + new_height, pad_x + new_width:] = self.pad_value
+
+        # HWC BGR uint8 -> CHW RGB float32, scaled straight into the batch
+        region = out[:, pad_y:pad_y + new_height, pad_x:pad_x + new_width]
+        np.multiply(resized.transpose(2, 0, 1)[::-1], np.float32(1 / 255.0), out=region)
+
+        return {
+            'scale': scale,
+            'pad': (pad_x, pad_y),
+            'original_size': (width, height)
+        }
+
+    def __call__(self, images):
+        """
+        Preprocess a list of images (file paths or BGR uint8 arrays).
+
+        Returns ``(batch, metadata)`` where batch is a float32 array of shape
+        (N, 3, H, W) and metadata holds each image's scale, padding and
+        original size for mapping boxes back with ``scale_boxes_to_original``.
+        """
+        batch = self._batch_buffer(len(images))
+        metadata = []
+
+        for i, image in enumerate(images):
+            if isinstance(image, str):
+                path = image
+                image = cv2.imread(path, cv2.IMREAD_COLOR)
+                if image is None:
+                    raise ValueError(f"Could not read image: {path}")
+            elif image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            elif image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+
+            metadata.append(self._fill(batch[i], image))
+
+        return batch, metadata
+
+
+# Batchers are cached per thread and target size, so repeated calls reuse
+# their buffers without two threads ever writing into the same one
+_local = threading.local()
+
+
+def preprocess_images_for_model(images, target_size=(416, 416)):
+    """
+    Letterbox a batch of images into a float32 NCHW array for the model.
+
+    ``images`` are file paths or BGR uint8 arrays. Returns ``(batch,
+    metadata)``; the batch is a view into a buffer reused by the calling
+    thread's next call with the same target size, so copy it if it must
+    outlive that call.
+    """
+    batchers = getattr(_local, 'batchers', None)
+    if batchers is None:
+        batchers = _local.batchers = {}
+    batcher = batchers.get(target_size)
+    if batcher is None:
+        batcher = batchers[target_size] = LetterboxBatcher(target_size)
+    return batcher(images)
+
 
 def preprocess_image_for_model(image_path, target_size=(416, 416)):
     """
-    Preprocess image for ML model using Pillow
+    Preprocess a single image for the model.
+
+    Returns a float32 (1, H, W, 3) RGB array in [0, 1], letterboxed, and
+    owned by the caller; use ``preprocess_images_for_model`` for NCHW
+    batches with the scale/pad metadata.
     """
-    with Image.open(image_path) as img:
-        # Convert to RGB
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize
-        img_resized = img.resize(target_size)
-        
-        # Convert to numpy array and normalize
-        img_array = np.array(img_resized) / 255.0
-        
-        # Add batch dimension
-        img_batch = np.expand_dims(img_array, axis=0)
-    
-    return img_batch
+    batch, _ = preprocess_images_for_model([image_path], target_size)
+    return np.ascontiguousarray(batch.transpose(0, 2, 3, 1))
+
+
+def scale_boxes_to_original(boxes, metadata):
+    """
+    Map [x1, y1, x2, y2] boxes from letterboxed model space back to the
+    original image, clipped to its bounds.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    pad_x, pad_y = metadata['pad']
+    width, height = metadata['original_size']
+
+    scaled = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / metadata['scale']
+    np.clip(scaled[:, 0::2], 0, width, out=scaled[:, 0::2])
+    np.clip(scaled[:, 1::2], 0, height, out=scaled[:, 1::2])
+    return scaled
 
 def visualize_detections(image_path, detections, output_path=None):
     """
-    Draw bounding boxes on image using Pillow
+    Draw bounding boxes on image using the shared OpenCV annotator.
+
+    Writes to ``output_path`` when given, otherwise returns the annotated
+    BGR array.
     """
-    with Image.open(image_path) as img:
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a font
-        try:
-            font = ImageFont.truetype("arial.ttf", 16)
-        except:
-            # Fallback to default font
-            font = ImageFont.load_default()
-        
-        for detection in detections:
-            x, y, w, h = detection['bbox']
-            confidence = detection['confidence']
-            
-            # Draw bounding box
-            draw.rectangle([x, y, x+w, y+h], outline='green', width=3)
-            
-            # Draw label background
-            label = f"Pothole: {confidence:.1%}"
-            draw.rectangle([x, y-25, x+120, y], fill='green')
-            
-            # Draw label text
-            draw.text((x+5, y-20), label, fill='white', font=font)
-        
-        # Save or return the image
-        if output_path:
-            img.save(output_path)
-            return output_path
-        else:
-            return img
+    from utils.image_annotator import annotator
+
+    if output_path:
+        return annotator.annotate_image(image_path, detections, output_path)
+
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    return annotator.draw(image, detections)
 
 def save_detection_result(original_image_path, detections, output_dir='results'):
     """
     Save detection results as a new image with bounding boxes
     """
     os.makedirs(output_dir, exist_ok=True)
-    
+
     # Generate output filename
     original_name = os.path.basename(original_image_path)
     name, ext = os.path.splitext(original_name)
     output_path = os.path.join(output_dir, f"{name}_detected{ext}")
-    
+
     # Create and save visualization
     visualize_detections(original_image_path, detections, output_path)
-    
-    return output_path
\ No newline at end of file
+
+    return output_path
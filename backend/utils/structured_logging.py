@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import itertools
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_handler = None
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with ``extra`` fields merged in"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves all formatting to the listener thread.
+
+    The stock QueueHandler renders the message on the calling thread so that
+    records can be pickled; ours never leave the process, so the request
+    thread only pays for building the record and a queue put.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep one in ``rate`` DEBUG records per call site, let everything else through"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate == 1:
+            return True
+
+        key = (record.pathname, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+def configure_logging(level=None, json_output=None, debug_sample_rate=None, stream=None):
+    """Route the backend's loggers through a queue to a background writer thread.
+
+    Defaults come from LOG_LEVEL (INFO), LOG_FORMAT (json or text, default
+    json) and LOG_DEBUG_SAMPLE_RATE (keep 1 in N debug lines per call site,
+    default 1). Safe to call more than once; only the first call takes effect.
+    """
+    global _listener, _handler
+
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        level = level or os.environ.get('LOG_LEVEL', 'INFO')
+        if json_output is None:
+            json_output = os.environ.get('LOG_FORMAT', 'json').lower() == 'json'
+        if debug_sample_rate is None:
+            debug_sample_rate = int(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1'))
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if json_output:
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(name)s: %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        _handler = DeferredQueueHandler(log_queue)
+        _handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+        root = logging.getLogger('pothole')
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def _restart_listener_in_child():
+    """Forked processes (gunicorn workers, inference workers) need their own writer thread.
+
+    The queue is replaced too, otherwise records the parent had not written
+    yet at fork time would be written a second time by the child.
+    """
+    if _listener is not None:
+        log_queue = queue.SimpleQueue()
+        _handler.queue = log_queue
+        _listener.queue = log_queue
+        _listener._thread = None
+        _listener.start()
+
+
+def flush_logging():
+    """Write out everything still queued; for processes that exit without atexit hooks"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+        atexit.unregister(_listener.stop)
+
+
+def is_log_writer(thread):
+    """Whether ``thread`` is the log writer, which forked children restart for themselves"""
+    return _listener is not None and thread is _listener._thread
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def get_logger(name):
+    """Get a backend logger, configuring the queue-backed output on first use"""
+    configure_logging()
+    return logging.getLogger(f'pothole.{name}')
@@ -0,0 +1,193 @@
+import os
+import binascii
+
+# Largest decoded image accepted from an upload, in bytes
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', str(16 * 1024 * 1024)))
+
+# Base64 characters decoded per step
+BASE64_CHUNK_CHARS = 64 * 1024
+# Raw body bytes read per step
+BODY_CHUNK_BYTES = 64 * 1024
+
+# Leading bytes of the image formats /api/detect accepts
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+# Bytes needed before the format can be told
+SNIFF_BYTES = 12
+
+_WHITESPACE = b' \t\r\n'
+
+
+class UploadTooLarge(ValueError):
+    """The decoded image would be larger than the limit"""
+
+
+def sniff_image_format(head):
+    """'jpeg', 'png', 'gif' or 'webp' from the first SNIFF_BYTES of a file, else None"""
+    head = bytes(head[:SNIFF_BYTES])
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class ImageBuffer:
+    """
+    Bytes of one uploaded image, written in chunks into a buffer allocated
+    once at ``capacity`` when the final size is known or estimated.
+
+    The format is checked as soon as the first bytes arrive and the size
+    on every write, so a bogus or oversized upload is refused before the
+    rest of it is read or decoded.
+    """
+
+    def __init__(self, max_bytes=MAX_IMAGE_BYTES, capacity=None):
+        self.max_bytes = max_bytes
+        self.buffer = bytearray(min(capacity or 0, max_bytes))
+        self.size = 0
+        self.image_format = None
+
+    def write(self, data):
+        end = self.size + len(data)
+        if end > self.max_bytes:
+            raise UploadTooLarge(f"Image is larger than {self.max_bytes} bytes")
+        if end <= len(self.buffer):
+            self.buffer[self.size:end] = data
+        else:
+            del self.buffer[self.size:]
+            self.buffer += data
+        self.size = end
+
+        if self.image_format is None and self.size >= SNIFF_BYTES:
+            self._check_format()
+
+    def _check_format(self):
+        self.image_format = sniff_image_format(self.buffer[:SNIFF_BYTES])
+        if self.image_format is None:
+            raise ValueError("Upload is not a JPEG, PNG, GIF or WebP image")
+
+    def getbuffer(self):
+        """The image bytes; the buffer is trimmed in place, not copied"""
+        if not self.size:
+            raise ValueError("Upload is empty")
+        if self.image_format is None:
+            self._check_format()
+        del self.buffer[self.size:]
+        return self.buffer
+
+
+def _payload_start(head):
+    """Offset of the base64 payload after an optional data URL prefix"""
+    if head[:5].lower() != 'data:':
+        return 0
+    comma = head.find(',')
+    if comma < 0:
+        raise ValueError("Invalid base64 image: data URL has no payload")
+    media_type = head[5:comma].lower()
+    if not media_type.startswith('image/') or not media_type.endswith(';base64'):
+        raise ValueError("Invalid base64 image: data URL is not a base64 image")
+    return comma + 1
+
+
+class Base64StreamDecoder:
+    """
+    Incremental base64 decoder for text arriving in chunks of any size.
+
+    Carries partial 4-character groups between chunks, skips line breaks
+    and an optional data URL prefix, and writes into an ImageBuffer.
+    ``capacity`` is the expected decoded size, if known.
+    """
+
+    def __init__(self, max_bytes=MAX_IMAGE_BYTES, capacity=None):
+        self.image = ImageBuffer(max_bytes, capacity)
+        self._carry = b''
+        self._started = False
+
+    def feed(self, chunk):
+        data = self._carry + chunk if self._carry else chunk
+        if not self._started:
+            # Wait for the whole prefix, however short the first reads are
+            if len(data) < 256 and b'data:'.startswith(data[:5].lower()) and b',' not in data:
+                self._carry = data
+                return
+            data = data[_payload_start(data[:256].decode('ascii', 'replace')):]
+            self._started = True
+        if any(c in data for c in _WHITESPACE):
+            data = data.translate(None, _WHITESPACE)
+
+        usable = len(data) - len(data) % 4
+        self._carry = data[usable:]
+        if usable:
+            try:
+                self.image.write(binascii.a2b_base64(data[:usable]))
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 image: {e}")
+
+    def finish(self):
+        """The decoded image bytes"""
+        if not self._started and self._carry:
+            # A payload shorter than 'data:' that happened to start like it
+            self._started = True
+            data, self._carry = self._carry, b''
+            self.feed(data)
+        if self._carry.strip(b'='):
+            raise ValueError("Invalid base64 image: truncated payload")
+        return self.image.getbuffer()
+
+
+def decode_base64_image(text, max_bytes=MAX_IMAGE_BYTES):
+    """
+    Decode a base64 image (optionally a data URL) from a string in memory.
+
+    Decodes fixed-size slices straight into a buffer of the final size,
+    without splitting or copying the whole string first. A string too long
+    for the limit is refused before decoding, a non-image after the first
+    slice. Returns a bytearray.
+    """
+    if not isinstance(text, str):
+        raise ValueError("Invalid base64 image: expected a string")
+
+    payload = len(text) - _payload_start(text[:256])
+    size = (payload * 3) // 4 - text.endswith('=') - text.endswith('==')
+    # Line breaks make the estimate too high; only trust it without them
+    if size > max_bytes and '\n' not in text:
+        raise UploadTooLarge(f"Image is larger than {max_bytes} bytes")
+
+    decoder = Base64StreamDecoder(max_bytes, capacity=size)
+    try:
+        for offset in range(0, len(text), BASE64_CHUNK_CHARS):
+            decoder.feed(text[offset:offset + BASE64_CHUNK_CHARS].encode('ascii'))
+    except UnicodeEncodeError:
+        raise ValueError("Invalid base64 image: non-ASCII characters")
+    return decoder.finish()
+
+
+def read_image_body(stream, content_length=None, max_bytes=MAX_IMAGE_BYTES, base64_encoded=False):
+    """
+    Read an image request body chunk by chunk; returns its bytes.
+
+    Raw bodies are read into a buffer of their Content-Length, base64
+    bodies are decoded as they arrive. A raw Content-Length over the limit
+    is refused before anything is read.
+    """
+    if base64_encoded:
+        decoder = Base64StreamDecoder(max_bytes, capacity=(content_length or 0) * 3 // 4)
+        write, finish = decoder.feed, decoder.finish
+    else:
+        if content_length and content_length > max_bytes:
+            raise UploadTooLarge(f"Image is larger than {max_bytes} bytes")
+        image = ImageBuffer(max_bytes, capacity=content_length)
+        write, finish = image.write, image.getbuffer
+
+    while True:
+        chunk = stream.read(BODY_CHUNK_BYTES)
+        if not chunk:
+            break
+        write(chunk)
+    return finish()
@@ -0,0 +1,12 @@
+"""WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+With ``preload_app`` the master imports this module once, so the model and
+map service are loaded a single time and shared copy-on-write by every forked
+worker. Inference pools are started per worker in gunicorn.conf.py.
+"""
+
+from app import create_app
+
+application = create_app(start_pool=False)
@@ -2,12 +2,17 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:5000/api';
 
+const REQUEST_TIMEOUT_MS = 30000; // 30 seconds timeout
+
 const api = axios.create({
   baseURL: API_BASE_URL,
-  timeout: 30000, // 30 seconds timeout
+  timeout: REQUEST_TIMEOUT_MS,
   withCredentials: true,  // Enable cookies
 });
 
+// Lets the backend drop a detection we will have stopped waiting for
+const deadlineHeaders = () => ({ 'X-Request-Timeout': String(REQUEST_TIMEOUT_MS) });
+
 export const detectPotholes = async (uploadData) => {
   const formData = new FormData();
   formData.append('image', uploadData.file);
@@ -26,6 +31,7 @@ export const detectPotholes = async (uploadData) => {
     const response = await api.post('/detect', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
+        ...deadlineHeaders(),
       },
     });
 
@@ -49,6 +55,8 @@ export const detectPotholesFromUrl = async (imageUrl) => {
   try {
     const response = await api.post('/detect/url', {
       url: imageUrl
+    }, {
+      headers: deadlineHeaders(),
     });
 
     if (response.data.success) {
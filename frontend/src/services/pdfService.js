@@ -1,29 +1,50 @@
 import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:5000/api';
+const SERVER_URL = 'http://localhost:5000';
+
+// Status polling starts fast and backs off; past the limit the user gets an error
+const POLL_INITIAL_MS = 500;
+const POLL_MAX_INTERVAL_MS = 5000;
+const POLL_BACKOFF = 1.5;
+const POLL_MAX_WAIT_MS = 120000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 export const generatePDFReport = async (detectionData, annotatedImageData) => {
   try {
-    const response = await axios.post(`${API_BASE_URL}/generate-report`, {
+    // Queue the report; an identical earlier report comes back already done
+    let { data: report } = await axios.post(`${API_BASE_URL}/reports`, {
       detection_data: detectionData,
       annotated_image: annotatedImageData
     });
 
-    if (response.data.success) {
-      // Download the PDF
-      const link = document.createElement('a');
-      link.href = response.data.pdf_data;
-      link.download = response.data.filename;
-      document.body.appendChild(link);
-      link.click();
-      document.body.removeChild(link);
-      
-      return true;
-    } else {
-      throw new Error(response.data.error || 'PDF generation failed');
+    const giveUpAt = Date.now() + POLL_MAX_WAIT_MS;
+    let interval = POLL_INITIAL_MS;
+    while (report.status === 'queued' || report.status === 'running') {
+      if (Date.now() + interval > giveUpAt) {
+        throw new Error('The report is taking too long to generate, please try again later');
+      }
+      await sleep(interval);
+      interval = Math.min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL_MS);
+      ({ data: report } = await axios.get(`${SERVER_URL}${report.status_url}`));
+    }
+
+    if (report.status !== 'done') {
+      throw new Error(report.error || 'PDF generation failed');
     }
+
+    // Download the PDF straight from the server
+    const link = document.createElement('a');
+    link.href = `${SERVER_URL}${report.download_url}`;
+    link.download = `pothole_report_${report.report_id.slice(0, 12)}.pdf`;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+
+    return true;
   } catch (error) {
     console.error('PDF generation error:', error);
-    throw new Error(error.response?.data?.error || 'Failed to generate PDF report');
+    throw new Error(error.response?.data?.error || error.message || 'Failed to generate PDF report');
   }
-};
\ No newline at end of file
+};